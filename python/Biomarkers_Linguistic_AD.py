@@ -1,9 +1,14 @@
 import pandas as pd
 import numpy as np
-from sklearn.linear_model import LogisticRegression
+import argparse
 import json
 import pickle
 
+from drift import training_stats
+from ensemble import build_ensembles, fit_served_models, ENSEMBLE_PATH
+from incremental import retrain_incremental, training_state
+from model_registry import publish_bundle, BUNDLE_FILES, BUNDLE_MODELS
+
 BIOMARKERS = [
     { "key": "tTau_AB42Ratio", "label": "CSF1" },
     { "key": "AB42_AB40Ratio", "label": "CSF2" },
@@ -26,32 +31,50 @@ def load_data():
     df["y"] = df["DX1"].map(LABEL_MAP)
     return df
 
-def train_model(df):
-    feature_cols = BIOMARKER_KEYS + LINGUISTIC
-    X = df[feature_cols].values
-    y = df["y"].values
-
-    model = LogisticRegression(multi_class="multinomial", solver="lbfgs", max_iter=2000)
-    model.fit(X, y)
-
-    return model
-
-if __name__ == "__main__":
+def train_full():
+    """
+    Train on all of data.csv and publish the bundle.
+    """
     df = load_data()
-    model = train_model(df)
 
-    pickle.dump(model, open("model.pkl", "wb"))
+    # all three served models, fit from the same specs as their ensembles
+    for name, model in fit_served_models(df).items():
+        pickle.dump(model, open(BUNDLE_FILES[BUNDLE_MODELS[name]], "wb"))
 
     # save metadata (needed by server)
     metadata = {
         "biomarkers": BIOMARKER_KEYS,
         "linguistic": LINGUISTIC,
         "label_map": LABEL_MAP,
-        "feature_means": {col: float(df[col].mean()) for col in BIOMARKER_KEYS + LINGUISTIC}
+        "feature_means": {col: float(df[col].mean()) for col in BIOMARKER_KEYS + LINGUISTIC},
+        # every pickle takes raw feature values (see model_registry.py)
+        "input_scalers": {},
+        # reference distributions the server measures input drift against
+        "feature_stats": training_stats(df, BIOMARKER_KEYS + LINGUISTIC + ["tokens(participant)"]),
+        # running statistics incremental retraining continues from
+        "training_state": training_state(df)
     }
 
     with open("metadata.json", "w") as f:
         json.dump(metadata, f, indent=2)
 
+    # bootstrap ensembles give the server its uncertainty bands
+    build_ensembles(df)
+
     print("Training finished.")
-    print("Saved model.pkl and metadata.json")
\ No newline at end of file
+    print(f"Saved the three models, metadata.json and {ENSEMBLE_PATH}")
+
+    # immutable registry version the server picks up without a restart
+    version = publish_bundle()
+    print(f"Published model version {version}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the AD status model")
+    parser.add_argument("--incremental", action="store_true",
+                        help="retrain from the served bundle when new participants were added")
+    args = parser.parse_args()
+    if args.incremental:
+        retrain_incremental()
+    else:
+        train_full()
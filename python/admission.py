@@ -0,0 +1,180 @@
+"""
+Admission control for server endpoints
+======================================
+Every controlled endpoint has a lane: a priority, a cap on requests it may
+run at once and a bounded queue of requests waiting to run. All lanes
+share one pool of slots, handed out highest priority first (FIFO within a
+priority), so a burst of heavy requests cannot starve cheap ones.
+
+A request is rejected instead of queued without bound:
+
+- 429 when its lane's queue is already full,
+- 503 when it waited longer than its lane's max_wait for a slot,
+
+both with a Retry-After estimated from the lane's recent service times.
+Everything runs on the event loop, so no locks are needed.
+"""
+
+import asyncio
+import bisect
+import itertools
+import math
+import time
+
+from batching import Histogram
+
+ADMISSION_SLOTS = 64
+WAIT_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+MAX_RETRY_AFTER = 30
+# weight of the newest request in the running service time average
+SERVICE_TIME_DECAY = 0.1
+
+
+class Rejected(Exception):
+    def __init__(self, status_code, retry_after, message):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class Lane:
+    def __init__(self, name, priority=0, concurrency=8, queue_size=32, max_wait=1.0):
+        self.name = name
+        self.priority = priority
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+
+        self.active = 0
+        self.waiting = 0
+        self.service_time = 0.05
+        self.admitted = 0
+        self.rejected = {429: 0, 503: 0}
+        self.wait_ms = Histogram(WAIT_BUCKETS_MS)
+
+    def retry_after(self):
+        """
+        Seconds until the queue ahead is likely to have drained.
+        """
+        backlog = (self.waiting + self.active) * self.service_time / max(self.concurrency, 1)
+        return int(min(max(math.ceil(backlog), 1), MAX_RETRY_AFTER))
+
+    def stats(self):
+        return {
+            "priority": self.priority,
+            "concurrency": self.concurrency,
+            "queue_size": self.queue_size,
+            "max_wait": self.max_wait,
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "service_time_ms": self.service_time * 1000.0,
+            "wait_ms": self.wait_ms.snapshot(),
+        }
+
+
+class AdmissionController:
+    def __init__(self, lanes, slots=ADMISSION_SLOTS):
+        self.lanes = {lane.name: lane for lane in lanes}
+        self.slots = slots
+        self.in_use = 0
+        # (priority, arrival, lane, future), kept sorted
+        self.queue = []
+        self._arrivals = itertools.count()
+
+    def _can_run(self, lane):
+        return self.in_use < self.slots and lane.active < lane.concurrency
+
+    def _ahead(self, lane):
+        """
+        Whether a request of equal or higher priority is waiting and could
+        run now; waiters held back only by their own lane's cap are not.
+        """
+        for priority, _, other, future in self.queue:
+            if priority > lane.priority:
+                return False
+            if not future.done() and other.active < other.concurrency:
+                return True
+        return False
+
+    def _grant(self, lane):
+        self.in_use += 1
+        lane.active += 1
+        lane.admitted += 1
+
+    def _dispatch(self):
+        """
+        Hand free slots to waiting requests in priority order, skipping
+        lanes that are at their own concurrency cap.
+        """
+        i = 0
+        while i < len(self.queue) and self.in_use < self.slots:
+            _, _, lane, future = self.queue[i]
+            if future.done():
+                self.queue.pop(i)
+            elif lane.active < lane.concurrency:
+                self.queue.pop(i)
+                lane.waiting -= 1
+                self._grant(lane)
+                future.set_result(None)
+            else:
+                i += 1
+
+    async def acquire(self, lane):
+        """
+        Wait for a slot in the lane, or raise Rejected.
+        """
+        start = time.perf_counter()
+        while self.queue and self.queue[0][3].done():
+            self.queue.pop(0)
+        # nobody of equal or higher priority could take the slot: run straight away
+        if self._can_run(lane) and not self._ahead(lane):
+            self._grant(lane)
+            lane.wait_ms.observe(0.0)
+            return
+
+        if lane.waiting >= lane.queue_size:
+            lane.rejected[429] += 1
+            raise Rejected(429, lane.retry_after(), f"Too many queued '{lane.name}' requests.")
+
+        future = asyncio.get_running_loop().create_future()
+        bisect.insort(self.queue, (lane.priority, next(self._arrivals), lane, future),
+                      key=lambda entry: entry[:2])
+        lane.waiting += 1
+        # a free slot may go to this request, or to one queued ahead of it
+        self._dispatch()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), lane.max_wait)
+        except asyncio.TimeoutError:
+            if not future.done():
+                future.cancel()
+                lane.waiting -= 1
+                lane.rejected[503] += 1
+                raise Rejected(503, lane.retry_after(), f"Server busy, '{lane.name}' request timed out in queue.")
+        except asyncio.CancelledError:
+            # client went away: give up the place in the queue, or the slot
+            if future.done():
+                self._free(lane)
+            else:
+                future.cancel()
+                lane.waiting -= 1
+            raise
+        lane.wait_ms.observe((time.perf_counter() - start) * 1000.0)
+
+    def _free(self, lane):
+        lane.active -= 1
+        self.in_use -= 1
+        self._dispatch()
+
+    def release(self, lane, seconds):
+        lane.service_time += SERVICE_TIME_DECAY * (seconds - lane.service_time)
+        self._free(lane)
+
+    def stats(self):
+        return {
+            "slots": self.slots,
+            "in_use": self.in_use,
+            "queued": sum(not f.done() for *_, f in self.queue),
+            "lanes": {name: lane.stats() for name, lane in self.lanes.items()},
+        }
@@ -0,0 +1,192 @@
+"""
+Prediction audit log
+====================
+Every prediction the server returns is recorded (time, route, cohort,
+model and version, the full input vector, class probabilities, the
+predicted class and latency) in compressed Parquet segments:
+
+    audit_log/
+        audit-20260101T120000Z-0000.parquet     finished segments
+        audit-20260101T130000Z-0001.parquet.inprogress
+
+Handlers only append a dict to an in-memory deque (append and popleft are
+atomic, so no lock is taken on the request path). A background thread
+drains it in batches, writes each batch as a row group, and starts a new
+segment after SEGMENT_MAX_ROWS rows or SEGMENT_MAX_SECONDS. A segment is
+renamed to .parquet once closed, so readers never see a partial file.
+
+Drop policy: the queue holds at most AUDIT_QUEUE_SIZE records. When the
+writer falls that far behind, appending drops the oldest unwritten record
+rather than blocking a request or growing memory. Drops are counted, and
+every row carries the count at the time it was written (dropped_total), so
+gaps in the log can be located.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+AUDIT_DIR = "audit_log"
+AUDIT_QUEUE_SIZE = 10000
+AUDIT_BATCH_ROWS = 1000
+AUDIT_FLUSH_SECONDS = 1.0
+SEGMENT_MAX_ROWS = 500000
+SEGMENT_MAX_SECONDS = 3600
+AUDIT_COMPRESSION = "zstd"
+
+SCHEMA = pa.schema([
+    ("timestamp", pa.timestamp("us", tz="UTC")),
+    ("route", pa.string()),
+    ("cohort", pa.string()),
+    ("model", pa.string()),
+    ("model_version", pa.string()),
+    ("inputs", pa.map_(pa.string(), pa.float64())),
+    ("probabilities", pa.map_(pa.string(), pa.float64())),
+    ("prediction", pa.string()),
+    ("latency_ms", pa.float64()),
+    ("dropped_total", pa.int64()),
+])
+
+
+class AuditLog:
+    def __init__(self, directory=AUDIT_DIR, queue_size=AUDIT_QUEUE_SIZE,
+                 batch_rows=AUDIT_BATCH_ROWS, flush_seconds=AUDIT_FLUSH_SECONDS,
+                 segment_rows=SEGMENT_MAX_ROWS, segment_seconds=SEGMENT_MAX_SECONDS,
+                 compression=AUDIT_COMPRESSION):
+        self.directory = directory
+        self.queue = deque(maxlen=queue_size)
+        self.batch_rows = batch_rows
+        self.flush_seconds = flush_seconds
+        self.segment_rows = segment_rows
+        self.segment_seconds = segment_seconds
+        self.compression = compression
+
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.thread = None
+        self.writer = None
+        self.segment_path = None
+        self.segment_started = 0.0
+        self.segment_written = 0
+        self.sequence = 0
+
+        # counters are only approximate under concurrent appends
+        self.logged = 0
+        self.dropped = 0
+        self.written = 0
+        self.segments = 0
+        self.last_error = None
+
+    def log(self, route, cohort, model, model_version, inputs, probabilities, latency_ms):
+        """
+        Queue one prediction. Never blocks; see the drop policy above.
+        """
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+        self.queue.append({
+            "timestamp": time.time_ns() // 1000,
+            "route": route,
+            "cohort": cohort,
+            "model": model,
+            "model_version": model_version,
+            "inputs": inputs,
+            "probabilities": probabilities,
+            "prediction": max(probabilities, key=probabilities.get) if probabilities else None,
+            "latency_ms": latency_ms,
+        })
+        self.logged += 1
+        if len(self.queue) >= self.batch_rows:
+            self.wakeup.set()
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self.thread.start()
+        return self
+
+    def close(self):
+        """
+        Write what is queued and close the open segment.
+        """
+        self.stopping.set()
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def _run(self):
+        while not self.stopping.is_set():
+            self.wakeup.wait(self.flush_seconds)
+            self.wakeup.clear()
+            self._flush()
+            if self.writer is not None and time.time() - self.segment_started >= self.segment_seconds:
+                self._close_segment()
+        self._flush()
+        self._close_segment()
+
+    def _drain(self):
+        records = []
+        while len(records) < self.batch_rows:
+            try:
+                records.append(self.queue.popleft())
+            except IndexError:
+                break
+        return records
+
+    def _flush(self):
+        while True:
+            records = self._drain()
+            if not records:
+                return
+            for record in records:
+                record["dropped_total"] = self.dropped
+            try:
+                self._write(pa.Table.from_pylist(records, schema=SCHEMA))
+            except Exception as e:
+                # a bad batch is lost, but the writer keeps going
+                self.last_error = f"{type(e).__name__}: {e}"
+                self.dropped += len(records)
+
+    def _write(self, table):
+        if self.writer is None:
+            self._open_segment()
+        self.writer.write_table(table)
+        self.written += table.num_rows
+        self.segment_written += table.num_rows
+        if self.segment_written >= self.segment_rows:
+            self._close_segment()
+
+    def _open_segment(self):
+        name = f"audit-{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}-{self.sequence:04d}.parquet"
+        self.sequence += 1
+        self.segment_path = os.path.join(self.directory, name)
+        self.writer = pq.ParquetWriter(self.segment_path + ".inprogress", SCHEMA,
+                                       compression=self.compression)
+        self.segment_started = time.time()
+        self.segment_written = 0
+
+    def _close_segment(self):
+        if self.writer is None:
+            return
+        self.writer.close()
+        os.replace(self.segment_path + ".inprogress", self.segment_path)
+        self.writer = None
+        self.segments += 1
+
+    def stats(self):
+        return {
+            "directory": self.directory,
+            "running": self.thread is not None and self.thread.is_alive(),
+            "queued": len(self.queue),
+            "queue_size": self.queue.maxlen,
+            "logged": self.logged,
+            "written": self.written,
+            "dropped": self.dropped,
+            "segments": self.segments,
+            "open_segment": self.segment_path if self.writer is not None else None,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,114 @@
+"""
+Micro-batching for prediction endpoints
+=======================================
+Concurrent requests for the same model are gathered for at most a short
+window (or until a batch is full), stacked into one matrix, evaluated with
+a single call and the results scattered back to each caller. The fixed
+per-call overhead of predict_proba and the ensemble einsum is then paid
+once per batch instead of once per request.
+
+Batch sizes and the time requests spent waiting for their batch are
+recorded in histograms exposed through stats().
+"""
+
+import asyncio
+import time
+
+import numpy as np
+
+BATCH_WINDOW_MS = 2.0
+BATCH_MAX_SIZE = 32
+WAIT_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100)
+
+
+class Histogram:
+    """
+    Counts of observations per bucket; bucket i holds values up to
+    bounds[i], the last one everything larger.
+    """
+
+    def __init__(self, bounds):
+        self.bounds = np.asarray(bounds, dtype=float)
+        self.counts = np.zeros(len(bounds) + 1, dtype=np.int64)
+        self.total = 0.0
+
+    def observe(self, values):
+        values = np.atleast_1d(np.asarray(values, dtype=float))
+        np.add.at(self.counts, np.searchsorted(self.bounds, values, side="left"), 1)
+        self.total += float(values.sum())
+
+    def snapshot(self):
+        labels = [f"<={b:g}" for b in self.bounds] + [f">{self.bounds[-1]:g}"]
+        n = int(self.counts.sum())
+        return {
+            "count": n,
+            "mean": self.total / n if n else None,
+            "buckets": dict(zip(labels, self.counts.tolist())),
+        }
+
+
+class MicroBatcher:
+    """
+    Batches rows submitted under the same key and evaluates them together.
+
+    evaluate(X) gets the stacked (batch, features) matrix and returns one
+    result per row (any sequence of length batch).
+    """
+
+    def __init__(self, window_ms=BATCH_WINDOW_MS, max_batch=BATCH_MAX_SIZE):
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        # key -> (evaluate, [(row, future, enqueued at)], flush timer)
+        self.pending = {}
+        # powers of two up to max_batch
+        self.batch_sizes = Histogram(sorted({2 ** i for i in range(max_batch.bit_length())} | {max_batch}))
+        self.wait_ms = Histogram(WAIT_BUCKETS_MS)
+        self.batches = 0
+
+    async def submit(self, key, row, evaluate):
+        """
+        Evaluate one row as part of a batch and return its result.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        if key not in self.pending:
+            timer = loop.call_later(self.window, self._flush, key)
+            self.pending[key] = (evaluate, [], timer)
+        _, items, _ = self.pending[key]
+        items.append((np.asarray(row, dtype=float), future, time.perf_counter()))
+
+        if len(items) >= self.max_batch:
+            self._flush(key)
+        return await future
+
+    def _flush(self, key):
+        if key not in self.pending:
+            return
+        evaluate, items, timer = self.pending.pop(key)
+        timer.cancel()
+
+        now = time.perf_counter()
+        self.batches += 1
+        self.batch_sizes.observe(len(items))
+        self.wait_ms.observe([(now - t) * 1000.0 for _, _, t in items])
+
+        try:
+            results = evaluate(np.vstack([row for row, _, _ in items]))
+        except Exception as e:
+            for _, future, _ in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future, _), result in zip(items, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self):
+        return {
+            "window_ms": self.window * 1000.0,
+            "max_batch": self.max_batch,
+            "batches": self.batches,
+            "batch_size": self.batch_sizes.snapshot(),
+            "wait_ms": self.wait_ms.snapshot(),
+        }
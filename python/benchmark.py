@@ -0,0 +1,349 @@
+"""
+Offline pipeline benchmarks
+===========================
+Times every stage of wordcloud_analysis.py and feature_analysis.py on
+synthetic cohorts (see synthetic_cohort.py) of growing size and records
+the peak RSS reached while each stage runs.
+
+    python benchmark.py --sizes 100 1000 10000 100000
+    python benchmark.py --baseline benchmark_baseline.json
+
+Writes the results as JSON (usable as the next baseline), fits a scaling
+exponent per stage (seconds ~ n^b on a log-log fit), plots the scaling
+curves, and with --baseline reports stages that got slower than the
+tolerance allows (exit code 1 when any did).
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import threading
+import time
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+import feature_analysis as fa
+import text_features
+import wordcloud_analysis as wa
+from synthetic_cohort import generate_cohort, load_templates, write_cohort
+
+SIZES = [100, 1000, 10000]
+OUTPUT_PATH = "benchmark_results.json"
+PLOT_PATH = "benchmark_scaling.png"
+SAMPLE_INTERVAL = 0.005
+# a stage only counts as regressed when it is both relatively and
+# absolutely slower than the baseline
+TOLERANCE = 0.25
+MIN_REGRESSION_SECONDS = 0.05
+# stages slower than this at one size are skipped for larger sizes
+MAX_STAGE_SECONDS = 600
+
+
+class PeakRSS:
+    """
+    Peak resident set size while the block runs, sampled by a background
+    thread. Without psutil it falls back to the process-wide high-water
+    mark, which cannot go down between stages.
+    """
+
+    def __enter__(self):
+        self.start = self.peak = self._rss()
+        if psutil is not None:
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if psutil is not None:
+            self._stop.set()
+            self._thread.join()
+        self.peak = max(self.peak, self._rss())
+
+    def _sample(self):
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            self.peak = max(self.peak, self._rss())
+
+    @staticmethod
+    def _rss():
+        if psutil is not None:
+            return psutil.Process().memory_info().rss
+        # ru_maxrss is in KB on Linux and bytes on macOS
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+# ============================================================================
+# STAGES
+# ============================================================================
+# Each stage takes the shared context dict, runs one pipeline function and
+# returns the artifacts later stages need.
+
+def stage_preprocess_text(ctx):
+    return {"corpus_df": wa.prepare_corpus(ctx["utterance"].copy())}
+
+
+def stage_word_frequencies(ctx):
+    return {"freq_results": wa.analyze_word_frequencies(ctx["corpus_df"])}
+
+
+def stage_tfidf(ctx):
+    return {"tfidf_results": wa.compute_tfidf(ctx["corpus_df"])}
+
+
+def stage_wordclouds(ctx):
+    wa.generate_wordclouds(ctx["freq_results"], ctx["tfidf_results"])
+
+
+def stage_differential_vocabulary(ctx):
+    wa.differential_vocabulary_analysis(ctx["corpus_df"])
+
+
+def stage_topic_modeling(ctx):
+    lda, vectorizer = wa.perform_topic_modeling(ctx["corpus_df"])
+    return {"lda": lda, "vectorizer": vectorizer}
+
+
+def stage_topic_trajectories(ctx):
+    wa.compute_topic_trajectories(ctx["lda"], ctx["vectorizer"])
+
+
+def stage_token_statistics(ctx):
+    for text in ctx["data"]["utterance"]:
+        text_features.transcript_features(text)
+
+
+def stage_merge(ctx):
+    data_dict = {name: ctx.get(name) for name in ("demographic", "full_data", "linguistic", "utterance")}
+    return {"merged_data": fa.merge_and_prepare_data(data_dict)}
+
+
+def stage_prepare_features(ctx):
+    X, y = fa.prepare_features(ctx["merged_data"])
+    return {"X": X, "y": y}
+
+
+def stage_top_features(ctx):
+    top_features, _ = fa.identify_top_features(ctx["X"], ctx["y"])
+    return {"top_features": top_features}
+
+
+def stage_correlation_matrix(ctx):
+    fa.compute_correlation_matrix(ctx["X"], ctx["top_features"])
+
+
+def stage_top_correlations(ctx):
+    fa.compute_top_correlations(ctx["X"])
+
+
+def stage_train_models(ctx):
+    fa.train_ml_models(ctx["X"], ctx["y"], ctx["top_features"])
+
+
+# (name, stage, stages it needs), in run order
+STAGES = [
+    ("preprocess_text", stage_preprocess_text, []),
+    ("analyze_word_frequencies", stage_word_frequencies, ["preprocess_text"]),
+    ("compute_tfidf", stage_tfidf, ["preprocess_text"]),
+    ("generate_wordclouds", stage_wordclouds, ["analyze_word_frequencies", "compute_tfidf"]),
+    ("differential_vocabulary_analysis", stage_differential_vocabulary, ["preprocess_text"]),
+    ("perform_topic_modeling", stage_topic_modeling, ["preprocess_text"]),
+    ("compute_topic_trajectories", stage_topic_trajectories, ["perform_topic_modeling"]),
+    ("transcript_features", stage_token_statistics, []),
+    ("merge_and_prepare_data", stage_merge, []),
+    ("prepare_features", stage_prepare_features, ["merge_and_prepare_data"]),
+    ("identify_top_features", stage_top_features, ["prepare_features"]),
+    ("compute_correlation_matrix", stage_correlation_matrix, ["identify_top_features"]),
+    ("compute_top_correlations", stage_top_correlations, ["prepare_features"]),
+    ("train_ml_models", stage_train_models, ["identify_top_features"]),
+]
+
+
+def required_stages(selected):
+    """
+    The selected stages plus every stage they depend on.
+    """
+    needs = {name: deps for name, _, deps in STAGES}
+    required = set()
+    pending = list(selected)
+    while pending:
+        name = pending.pop()
+        if name not in needs:
+            raise ValueError(f"Unknown stage '{name}'")
+        if name not in required:
+            required.add(name)
+            pending.extend(needs[name])
+    return required
+
+
+# ============================================================================
+# RUNNING AND REPORTING
+# ============================================================================
+
+def run_size(n, templates, skip=None, seed=0):
+    """
+    Generate a cohort of n participants and run every stage on it inside a
+    scratch copy of the repository layout. Returns {stage: measurements}.
+    """
+    start = time.perf_counter()
+    cohort = generate_cohort(n, templates, seed=seed)
+    print(f"\n--- n = {n} (generated in {time.perf_counter() - start:.1f}s) ---")
+
+    results = {}
+    skip = set() if skip is None else skip
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as root:
+        write_cohort(cohort, root, excel=False)
+        os.chdir(os.path.join(root, "python"))
+        try:
+            ctx = dict(cohort)
+            for name, stage, deps in STAGES:
+                if name in skip or any(d in skip for d in deps):
+                    skip.add(name)
+                    print(f"  {name:<34} skipped")
+                    continue
+                with PeakRSS() as rss, contextlib.redirect_stdout(io.StringIO()):
+                    t0 = time.perf_counter()
+                    ctx.update(stage(ctx) or {})
+                    seconds = time.perf_counter() - t0
+                results[name] = {
+                    "seconds": seconds,
+                    "peak_rss_mb": rss.peak / 2 ** 20,
+                    "rss_growth_mb": (rss.peak - rss.start) / 2 ** 20,
+                }
+                print(f"  {name:<34} {seconds:9.3f}s  peak {rss.peak / 2 ** 20:8.1f} MB")
+        finally:
+            os.chdir(cwd)
+    return results
+
+
+def scaling_exponents(results):
+    """
+    Slope b of log(seconds) against log(n) per stage, over every size the
+    stage ran at.
+    """
+    exponents = {}
+    for name, _, _ in STAGES:
+        points = [(int(n), r[name]["seconds"]) for n, r in results.items()
+                  if name in r and r[name]["seconds"] > 0]
+        if len(points) >= 2:
+            n, s = np.log(np.array(points)).T
+            exponents[name] = float(np.polyfit(n, s, 1)[0])
+    return exponents
+
+
+def plot_scaling(results, path=PLOT_PATH):
+    fig, axes = plt.subplots(1, 2, figsize=(16, 7))
+    for name, _, _ in STAGES:
+        sizes = [int(n) for n, r in results.items() if name in r]
+        if not sizes:
+            continue
+        axes[0].plot(sizes, [results[str(n)][name]["seconds"] for n in sizes], marker="o", label=name)
+        axes[1].plot(sizes, [results[str(n)][name]["peak_rss_mb"] for n in sizes], marker="o", label=name)
+    for ax, label in zip(axes, ["seconds", "peak RSS (MB)"]):
+        ax.set_xscale("log")
+        ax.set_yscale("log")
+        ax.set_xlabel("participants")
+        ax.set_ylabel(label)
+        ax.grid(True, which="both", alpha=0.3)
+    axes[0].legend(fontsize=8)
+    plt.tight_layout()
+    plt.savefig(path, dpi=150)
+    plt.close()
+
+
+def compare_to_baseline(results, baseline, tolerance=TOLERANCE):
+    """
+    (stage, n, baseline seconds, current seconds) for every stage that ran
+    more than `tolerance` slower than in the baseline.
+    """
+    regressions = []
+    for n, stages in results.items():
+        for name, current in stages.items():
+            previous = baseline.get("results", {}).get(n, {}).get(name)
+            if previous is None:
+                continue
+            before, after = previous["seconds"], current["seconds"]
+            if after > before * (1 + tolerance) and after - before > MIN_REGRESSION_SECONDS:
+                regressions.append((name, int(n), before, after))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the offline analysis pipelines")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--stages", nargs="+", help="only run these stages (and what they need)")
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    parser.add_argument("--plot", default=PLOT_PATH)
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--max-stage-seconds", type=float, default=MAX_STAGE_SECONDS)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("OFFLINE PIPELINE BENCHMARK")
+    print("=" * 70)
+    if psutil is None:
+        print("⚠ psutil not installed: peak RSS is the process high-water mark")
+
+    templates = load_templates()
+    results = {}
+    skip = set()
+    if args.stages:
+        skip = {name for name, _, _ in STAGES} - required_stages(args.stages)
+
+    for n in sorted(args.sizes):
+        results[str(n)] = run_size(n, templates, skip=set(skip), seed=args.seed)
+        skip |= {name for name, r in results[str(n)].items()
+                 if r["seconds"] > args.max_stage_seconds}
+
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "sizes": sorted(args.sizes),
+        "results": results,
+        "scaling_exponents": scaling_exponents(results),
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✓ Results saved: {args.output}")
+
+    plot_scaling(results, args.plot)
+    print(f"✓ Scaling curves saved: {args.plot}")
+
+    print("\nScaling exponents (seconds ~ n^b):")
+    for name, b in sorted(report["scaling_exponents"].items(), key=lambda kv: -kv[1]):
+        print(f"  {name:<34} b = {b:5.2f}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n⚠ {len(regressions)} regressions against {args.baseline}:")
+            for name, n, before, after in regressions:
+                print(f"  {name} @ n={n}: {before:.3f}s → {after:.3f}s ({after / before:.2f}x)")
+            sys.exit(1)
+        print(f"\n✓ No regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Compact in-memory cohort store
+==============================
+Holds public/data.csv in a few typed buffers instead of a pandas frame of
+float64 columns and Python string objects:
+
+- numeric features: one contiguous float32 2-D array (rows x features)
+- DX1 / gender / MOCA_impairment: small integer codes plus their categories
+- transcripts and file names: offsets into one shared UTF-8 buffer
+- REGTRYID: int64 ids
+
+Every server endpoint that needs cohort data shares one store.
+"""
+
+import numpy as np
+import pandas as pd
+
+ID_COLUMN = "REGTRYID"
+CATEGORICAL_COLUMNS = ("DX1", "gender", "MOCA_impairment")
+TEXT_COLUMNS = ("file", "utterance")
+
+
+class StringColumn:
+    """
+    Strings packed into one UTF-8 buffer, addressed by int64 offsets.
+    """
+
+    def __init__(self, values):
+        values = list(values)
+        self.missing = np.array([v is None or v != v for v in values], dtype=bool)
+        encoded = [b"" if m else str(v).encode("utf-8") for v, m in zip(values, self.missing)]
+
+        self.offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=self.offsets[1:])
+        self.buffer = b"".join(encoded)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if self.missing[i]:
+            return None
+        return self.buffer[self.offsets[i]:self.offsets[i + 1]].decode("utf-8")
+
+    @property
+    def nbytes(self):
+        return len(self.buffer) + self.offsets.nbytes + self.missing.nbytes
+
+
+class CohortStore:
+    """
+    Typed, column-addressable view of the cohort with a small query API.
+    """
+
+    def __init__(self, df, categorical=CATEGORICAL_COLUMNS, text=TEXT_COLUMNS,
+                 id_column=ID_COLUMN):
+        df = df.reset_index(drop=True)
+        self.columns = list(df.columns)
+        self.id_column = id_column
+        self.ids = df[id_column].to_numpy(dtype=np.int64)
+
+        self.categories = {}
+        self.codes = {}
+        for col in categorical:
+            codes, uniques = pd.factorize(df[col], sort=True)
+            dtype = np.int8 if len(uniques) < 127 else np.int32
+            self.codes[col] = codes.astype(dtype)
+            self.categories[col] = np.asarray(uniques)
+
+        self.text = {col: StringColumn(df[col]) for col in text}
+
+        skip = set(categorical) | set(text) | {id_column}
+        self.numeric_columns = [
+            c for c in self.columns
+            if c not in skip and pd.api.types.is_numeric_dtype(df[c])
+        ]
+        self.integer_columns = {
+            c for c in self.numeric_columns if pd.api.types.is_integer_dtype(df[c])
+        }
+        self.numeric = np.ascontiguousarray(df[self.numeric_columns].to_numpy(dtype=np.float32))
+        self._numeric_index = {c: i for i, c in enumerate(self.numeric_columns)}
+
+        self._by_id = {int(r): i for i, r in enumerate(self.ids)}
+        self._by_file = {self.text["file"][i]: i for i in range(len(self))} if "file" in self.text else {}
+
+    @classmethod
+    def from_csv(cls, path, **kwargs):
+        return cls(pd.read_csv(path), **kwargs)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def kind(self, name):
+        """
+        One of "id", "numeric", "categorical" or "text".
+        """
+        if name == self.id_column:
+            return "id"
+        if name in self._numeric_index:
+            return "numeric"
+        if name in self.codes:
+            return "categorical"
+        if name in self.text:
+            return "text"
+        raise KeyError(name)
+
+    def values(self, columns, rows=None):
+        """
+        float32 matrix of the given numeric columns, for all rows or a
+        subset (index array or boolean mask).
+        """
+        block = self.numeric if rows is None else self.numeric[rows]
+        return block[:, [self._numeric_index[c] for c in columns]]
+
+    def column(self, name, rows=None):
+        """
+        One column as an array: float32 (int64 for integer columns) for
+        numeric features, decoded labels for categoricals, str for text.
+        """
+        rows = np.arange(len(self)) if rows is None else np.arange(len(self))[rows]
+        kind = self.kind(name)
+
+        if kind == "id":
+            return self.ids[rows]
+        if kind == "numeric":
+            values = self.numeric[rows, self._numeric_index[name]]
+            return values.astype(np.int64) if name in self.integer_columns else values
+        if kind == "categorical":
+            codes = self.codes[name][rows]
+            decoded = self.categories[name][np.maximum(codes, 0)].astype(object)
+            decoded[codes < 0] = None
+            return decoded
+        return np.array([self.text[name][i] for i in rows], dtype=object)
+
+    def transcript(self, i):
+        return self.text["utterance"][i]
+
+    def mask(self, equals=None, ranges=None):
+        """
+        Boolean row mask. equals maps a categorical column to the labels to
+        keep, ranges maps a numeric column to an inclusive (low, high) pair
+        where either bound may be None.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        for col, labels in (equals or {}).items():
+            wanted = np.flatnonzero(np.isin(self.categories[col], list(labels)))
+            mask &= np.isin(self.codes[col], wanted)
+        for col, (low, high) in (ranges or {}).items():
+            values = self.numeric[:, self._numeric_index[col]]
+            if low is not None:
+                mask &= values >= low
+            if high is not None:
+                mask &= values <= high
+        return mask
+
+    def lookup(self, key):
+        """
+        Row position for a REGTRYID or a transcript file name, or None.
+        """
+        key = str(key)
+        if key.isdigit() and int(key) in self._by_id:
+            return self._by_id[int(key)]
+        return self._by_file.get(key)
+
+    def memory_usage(self):
+        """
+        Bytes held by each part of the store.
+        """
+        usage = {
+            "numeric": self.numeric.nbytes,
+            "categorical": sum(c.nbytes for c in self.codes.values()),
+            "text": sum(t.nbytes for t in self.text.values()),
+            "ids": self.ids.nbytes,
+        }
+        usage["total"] = sum(usage.values())
+        return usage
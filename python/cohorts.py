@@ -0,0 +1,196 @@
+"""
+Lazily loaded cohorts under a memory budget
+===========================================
+One deployment can serve several cohorts (sites, studies), each with its
+own data file and model bundle, listed in cohorts.json:
+
+    {
+        "site-b": {"data": "../sites/b/data.csv", "registry": "../sites/b/registry"},
+        "pilot":  {"data": "../pilot/data.csv", "models": "../pilot/models"}
+    }
+
+"registry" serves the current version of a model registry (see
+model_registry.py), "models" a plain directory of bundle files. Relative
+paths are relative to cohorts.json.
+
+A cohort is loaded on first use and kept in an LRU cache. When the loaded
+cohorts together exceed the memory budget, the least recently used idle
+ones (no request holding them) are evicted. Resident cohorts, such as the
+one the server starts with, are reported but never evicted.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+import types
+from collections import OrderedDict
+
+import numpy as np
+
+COHORTS_FILE = "cohorts.json"
+COHORT_MEMORY_BUDGET_MB = 1024
+
+
+class CohortError(RuntimeError):
+    pass
+
+
+def load_cohort_config(path=COHORTS_FILE):
+    """
+    {name: {"data": path, "registry" or "models": path}} with paths made
+    relative to the working directory. No file means no extra cohorts.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        config = json.load(f)
+
+    root = os.path.dirname(path)
+    cohorts = {}
+    for name, spec in config.items():
+        if "data" not in spec or ("registry" in spec) == ("models" in spec):
+            raise CohortError(f"Cohort '{name}' needs 'data' and one of 'registry' or 'models'")
+        cohorts[name] = {key: os.path.join(root, value) for key, value in spec.items()}
+    return cohorts
+
+
+def deep_nbytes(obj, seen=None):
+    """
+    Approximate bytes held by obj and everything it references, counting
+    shared objects once across calls that share `seen`. Modules, classes
+    and functions are not followed.
+    """
+    seen = set() if seen is None else seen
+    if id(obj) in seen or isinstance(obj, (types.ModuleType, type, types.FunctionType,
+                                           types.MethodType, types.BuiltinFunctionType)):
+        return 0
+    seen.add(id(obj))
+
+    if isinstance(obj, np.ndarray):
+        # views count their base once, wherever it is reached first
+        return obj.nbytes if obj.base is None else deep_nbytes(obj.base, seen)
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, bytearray, memoryview, int, float, bool)) or obj is None:
+        return size
+    if isinstance(obj, dict):
+        return size + sum(deep_nbytes(k, seen) + deep_nbytes(v, seen) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return size + sum(deep_nbytes(v, seen) for v in obj)
+    if type(obj).__module__ != "builtins":
+        # what the object would pickle: its __dict__ and slots, or the
+        # arrays extension types such as sklearn's KDTree expose
+        try:
+            state = obj.__getstate__()
+        except Exception:
+            state = getattr(obj, "__dict__", None)
+        return size + deep_nbytes(state, seen)
+    return size
+
+
+class CohortCache:
+    """
+    name -> loaded cohort, least recently used first. load(name) builds a
+    cohort; its memory_usage() ({part: bytes}) is taken once, after loading.
+    """
+
+    def __init__(self, load, names, budget_mb=COHORT_MEMORY_BUDGET_MB):
+        self.load = load
+        self.names = set(names)
+        self.budget = budget_mb * 2 ** 20
+        self.loaded = OrderedDict()
+        self.resident = {}
+        self.usage = {}
+        self.users = {}
+        self.counters = {name: {"loads": 0, "hits": 0, "evictions": 0, "load_seconds": 0.0}
+                         for name in self.names}
+        self.last_used = {}
+        self.lock = threading.Lock()
+        # one lock per name, so a cohort is loaded once however many requests want it
+        self.load_locks = {name: threading.Lock() for name in self.names}
+
+    def add_resident(self, name, cohort):
+        with self.lock:
+            self.resident[name] = cohort
+            self.usage[name] = cohort.memory_usage()
+
+    def __contains__(self, name):
+        return name in self.resident or name in self.names
+
+    def acquire(self, name):
+        """
+        The cohort, loaded if need be and held until release(name). Blocks
+        while it loads, so call it off the event loop.
+        """
+        if name in self.resident:
+            return self.resident[name]
+        if name not in self.names:
+            raise CohortError(f"Unknown cohort '{name}'")
+
+        with self.load_locks[name]:
+            with self.lock:
+                if name in self.loaded:
+                    self.loaded.move_to_end(name)
+                    self.counters[name]["hits"] += 1
+                    return self._hold(name)
+
+            start = time.perf_counter()
+            cohort = self.load(name)
+            usage = cohort.memory_usage()
+
+            with self.lock:
+                self.counters[name]["loads"] += 1
+                self.counters[name]["load_seconds"] += time.perf_counter() - start
+                self.loaded[name] = cohort
+                self.usage[name] = usage
+                cohort = self._hold(name)
+                self._evict()
+                return cohort
+
+    def _hold(self, name):
+        self.users[name] = self.users.get(name, 0) + 1
+        self.last_used[name] = time.time()
+        return self.loaded[name]
+
+    def release(self, name):
+        if name in self.resident:
+            return
+        with self.lock:
+            self.users[name] -= 1
+            self._evict()
+
+    def _used(self):
+        return sum(u["total"] for u in self.usage.values())
+
+    def _evict(self):
+        """
+        Drop idle cohorts, least recently used first, until within budget.
+        Cohorts in use stay, so the budget can be exceeded for a while.
+        """
+        for name in list(self.loaded):
+            if self._used() <= self.budget:
+                return
+            if self.users.get(name, 0) == 0:
+                del self.loaded[name]
+                del self.usage[name]
+                self.counters[name]["evictions"] += 1
+
+    def stats(self):
+        with self.lock:
+            cohorts = {}
+            for name in sorted(self.names | set(self.resident)):
+                usage = self.usage.get(name)
+                cohorts[name] = {
+                    "loaded": name in self.loaded or name in self.resident,
+                    "resident": name in self.resident,
+                    "in_use": self.users.get(name, 0),
+                    "last_used": self.last_used.get(name),
+                    "memory_mb": {k: v / 2 ** 20 for k, v in usage.items()} if usage else None,
+                    **self.counters.get(name, {}),
+                }
+            return {
+                "budget_mb": self.budget / 2 ** 20,
+                "used_mb": self._used() / 2 ** 20,
+                "cohorts": cohorts,
+            }
@@ -0,0 +1,171 @@
+"""
+Blocked top-k correlation engine
+================================
+Pearson correlations across wide feature tables (all of fullData, LIWC)
+without building the full features x features matrix:
+
+1. every column is standardized once into a float32 memory map, stored
+   feature-major and scaled by 1/sqrt(n) so that the dot product of two
+   rows is their correlation;
+2. the correlation matrix is computed in BLOCK_SIZE x BLOCK_SIZE tiles with
+   one BLAS matrix product each;
+3. each tile is merged into a running top-k (by absolute correlation) per
+   feature and then discarded.
+
+Memory is O(features x rows) on disk plus O(BLOCK_SIZE^2) for one tile.
+
+Missing values are mean-imputed: after standardizing they are set to 0,
+and every correlation is taken over all rows. p-values use that same n
+(all rows), not the number of rows where both features are present. For
+columns with gaps the results therefore differ from pandas' pairwise
+complete DataFrame.corr(): correlations shrink toward 0 and the p-values
+assume more observations than were made.
+"""
+
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+# 1024 x 1024 float32 tile = 4 MB, small enough to stay in cache-friendly
+# BLAS kernels while keeping the number of products low
+BLOCK_SIZE = 1024
+TOP_K = 10
+
+
+def standardize_to_memmap(X, path=None, chunk_columns=BLOCK_SIZE):
+    """
+    Write the z-scored columns of X (DataFrame or 2-D array, rows x
+    features) to a float32 memory map of shape (features, rows), scaled by
+    1/sqrt(rows). Missing values become 0 (the column mean) and constant
+    columns become all zeros, so they correlate 0 with everything.
+
+    Columns are converted chunk by chunk, so no float64 copy of the whole
+    table is made. Returns the memmap and its path.
+    """
+    is_frame = isinstance(X, pd.DataFrame)
+    n_rows, n_features = X.shape
+    if path is None:
+        fd, path = tempfile.mkstemp(suffix=".f32")
+        os.close(fd)
+
+    Z = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32,
+                                  shape=(n_features, n_rows))
+    for start in range(0, n_features, chunk_columns):
+        stop = min(start + chunk_columns, n_features)
+        if is_frame:
+            block = X.iloc[:, start:stop].to_numpy(dtype=float)
+        else:
+            block = np.asarray(X[:, start:stop], dtype=float)
+
+        mean = np.nanmean(block, axis=0)
+        centered = np.nan_to_num(block - mean)
+        norm = np.sqrt((centered ** 2).sum(axis=0))
+        norm[norm == 0] = np.inf
+        Z[start:stop] = (centered / norm).T
+
+    Z.flush()
+    return Z, path
+
+
+def _strength(values):
+    """
+    |r| for ranking, with NaN (a feature against itself) ranked last.
+    """
+    return np.nan_to_num(np.abs(values), nan=-1.0)
+
+
+def _merge_top_k(best_idx, best_val, cand_idx, cand_val, k):
+    """
+    Keep the k entries with the largest |value| per row out of the current
+    best and the new candidates.
+    """
+    idx = np.concatenate([best_idx, cand_idx], axis=1)
+    val = np.concatenate([best_val, cand_val], axis=1)
+    if idx.shape[1] > k:
+        keep = np.argpartition(-_strength(val), k - 1, axis=1)[:, :k]
+        idx = np.take_along_axis(idx, keep, axis=1)
+        val = np.take_along_axis(val, keep, axis=1)
+    return idx, val
+
+
+def top_k_correlations(Z, k=TOP_K, block_size=BLOCK_SIZE):
+    """
+    For every feature (row of the standardized matrix Z) the k other
+    features with the largest absolute correlation.
+
+    Returns (partners, correlations), both (n_features, k) and sorted by
+    decreasing |r|.
+    """
+    n_features = Z.shape[0]
+    k = min(k, n_features - 1)
+    partners = np.empty((n_features, k), dtype=np.int64)
+    correlations = np.empty((n_features, k), dtype=np.float32)
+
+    for i0 in range(0, n_features, block_size):
+        i1 = min(i0 + block_size, n_features)
+        A = np.asarray(Z[i0:i1])
+        best_idx = np.empty((i1 - i0, 0), dtype=np.int64)
+        best_val = np.empty((i1 - i0, 0), dtype=np.float32)
+
+        for j0 in range(0, n_features, block_size):
+            j1 = min(j0 + block_size, n_features)
+            tile = A @ np.asarray(Z[j0:j1]).T
+            # a feature is never its own partner
+            if j0 == i0:
+                np.fill_diagonal(tile, np.nan)
+            cols = np.broadcast_to(np.arange(j0, j1), tile.shape)
+
+            take = min(k, j1 - j0)
+            part = np.argpartition(-_strength(tile), take - 1, axis=1)[:, :take]
+            best_idx, best_val = _merge_top_k(
+                best_idx, best_val,
+                np.take_along_axis(cols, part, axis=1),
+                np.take_along_axis(tile, part, axis=1), k,
+            )
+
+        order = np.argsort(-_strength(best_val), axis=1, kind="stable")
+        partners[i0:i1] = np.take_along_axis(best_idx, order, axis=1)
+        correlations[i0:i1] = np.take_along_axis(best_val, order, axis=1)
+
+    return partners, np.clip(correlations, -1.0, 1.0)
+
+
+def correlation_p_values(r, n_rows):
+    """
+    Two-sided p-values of Pearson correlations r over n_rows observations.
+    """
+    r = np.asarray(r, dtype=float)
+    dof = n_rows - 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = r * np.sqrt(dof / np.maximum(1.0 - r ** 2, 1e-12))
+    return 2 * stats.t.sf(np.abs(t), dof)
+
+
+def top_correlation_table(X, k=TOP_K, p_values=False, block_size=BLOCK_SIZE,
+                          memmap_path=None):
+    """
+    Long-format table of the top-k correlated partners of every column of
+    the DataFrame X: feature, rank, partner, r (and p_value).
+    """
+    Z, path = standardize_to_memmap(X, memmap_path)
+    try:
+        partners, corr = top_k_correlations(Z, k=k, block_size=block_size)
+    finally:
+        del Z
+        if memmap_path is None:
+            os.remove(path)
+
+    names = np.asarray(X.columns)
+    n_features, k = partners.shape
+    table = pd.DataFrame({
+        "feature": np.repeat(names, k),
+        "rank": np.tile(np.arange(1, k + 1), n_features),
+        "partner": names[partners.ravel()],
+        "r": corr.ravel().astype(float),
+    })
+    if p_values:
+        table["p_value"] = correlation_p_values(table["r"], X.shape[0])
+    return table
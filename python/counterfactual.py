@@ -0,0 +1,100 @@
+"""
+Counterfactual search for the linear AD-status models
+=====================================================
+Finds a small change to the linguistic features that moves a multinomial
+logistic model's prediction to a target class, keeping every feature
+inside its observed range.
+
+For a linear model the decision margin between the target class t and a
+competitor j is itself linear, so its gradient w.r.t. the (standardized)
+features is the closed form (w_t - w_j) * scale. The search walks along
+each of these directions, clipping to the feature box, and evaluates all
+candidate points in one batched matrix product.
+"""
+
+import numpy as np
+
+N_STEPS = 128
+
+
+def _margins(points, coef, intercept, target):
+    """
+    Smallest logit margin of the target class over every other class for
+    each candidate point (positive means the target class is predicted).
+    """
+    logits = points @ coef.T + intercept
+    others = np.delete(logits, target, axis=-1)
+    return logits[..., target] - others.max(axis=-1)
+
+
+def _candidate_path(x, directions, scale, lower, upper, t):
+    """
+    Points clip(x + t * d * scale) for every direction d and its row of
+    steps t, shape (n_directions, n_steps, n_features).
+    """
+    steps = t[:, :, None] * directions[:, None, :] * scale
+    return np.clip(x + steps, lower, upper)
+
+
+def find_counterfactual(x, coef, intercept, target, lower, upper, scale,
+                        movable=None, margin=1e-6, n_steps=N_STEPS):
+    """
+    Search for the point closest to x (in units of `scale`) that the linear
+    model coef/intercept assigns to class index `target`.
+
+    Returns (point, distance, found). When no point inside [lower, upper]
+    reaches the target class, found is False and point is the candidate
+    that got closest to the decision boundary.
+    """
+    x = np.asarray(x, dtype=float)
+    coef = np.asarray(coef, dtype=float)
+    intercept = np.asarray(intercept, dtype=float)
+    scale = np.where(np.asarray(scale, dtype=float) > 0, scale, 1.0)
+    movable = np.ones(len(x), dtype=bool) if movable is None else np.asarray(movable)
+
+    # never count moving a slider back into range as part of the change
+    lower = np.minimum(lower, x)
+    upper = np.maximum(upper, x)
+
+    if _margins(x, coef, intercept, target) > margin:
+        return x, 0.0, True
+
+    # closed-form margin gradients in standardized units, one per competitor,
+    # plus their average to cover points where several boundaries meet
+    grads = (coef[target] - np.delete(coef, target, axis=0)) * scale * movable
+    norms = np.linalg.norm(grads, axis=1)
+    grads = grads[norms > 0] / norms[norms > 0, None]
+    if len(grads) == 0:
+        return x, 0.0, False
+    directions = np.vstack([grads, grads.mean(axis=0, keepdims=True)])
+
+    # per direction, far enough for every feature it meaningfully moves to
+    # saturate at its bound
+    span = (upper - lower) / scale
+    reach = np.where(np.abs(directions) > 1e-3, span / np.abs(directions).clip(1e-3), 0.0)
+    t = np.linspace(0.0, 1.0, n_steps)[None, :] * reach.max(axis=1, keepdims=True)
+
+    points = _candidate_path(x, directions, scale, lower, upper, t)
+    margins = _margins(points, coef, intercept, target)
+    feasible = margins > margin
+
+    if not feasible.any():
+        d, i = np.unravel_index(np.argmax(margins), margins.shape)
+        point = points[d, i]
+        return point, float(np.linalg.norm((point - x) / scale)), False
+
+    # refine between the last infeasible and first feasible step of each
+    # direction that crosses the boundary
+    crossing = np.flatnonzero(feasible.any(axis=1))
+    first = feasible[crossing].argmax(axis=1)
+    fine = np.linspace(0.0, 1.0, n_steps)[None, :]
+    t_fine = t[crossing, first - 1, None] + fine * (t[crossing, first, None] - t[crossing, first - 1, None])
+
+    refined = _candidate_path(x, directions[crossing], scale, lower, upper, t_fine)
+    refined_ok = _margins(refined, coef, intercept, target) > margin
+
+    candidates = np.concatenate([points[feasible], refined[refined_ok]])
+    distances = np.linalg.norm((candidates - x) / scale, axis=1)
+    best = np.argmin(distances)
+
+    return candidates[best], float(distances[best]), True
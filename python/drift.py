@@ -0,0 +1,216 @@
+"""
+Streaming input drift against the training distribution
+=======================================================
+Training saves, per feature, its count, mean, standard deviation, range
+and the training deciles as histogram edges, with the share of training
+rows in each bin (feature_stats in metadata.json).
+
+The server keeps, per feature, a Welford running mean and variance and a
+histogram of incoming values over those same edges: a fixed-size sketch
+from which approximate quantiles are read back, so memory per feature is
+constant however many requests arrive. Each observation is a Welford step
+and one bisect, cheap enough for every request.
+
+Drift per feature is reported as the population stability index (PSI)
+between the incoming and training bin shares, plus the shift of the mean
+in training standard deviations and the ratio of standard deviations.
+"""
+
+import bisect
+import math
+import threading
+
+import numpy as np
+
+DRIFT_BINS = 10
+# fewer observations than this are not scored
+DRIFT_MIN_COUNT = 30
+# conventional PSI bands: below 0.1 stable, above 0.25 a significant shift
+PSI_MODERATE = 0.1
+PSI_DRIFT = 0.25
+PSI_EPSILON = 1e-4
+REPORTED_QUANTILES = (0.1, 0.5, 0.9)
+
+
+def feature_stats(values, bins=DRIFT_BINS):
+    """
+    Training statistics of one feature, as stored in metadata.json. A
+    value v falls in bin bisect_right(edges, v).
+    """
+    values = np.asarray(values, dtype=float)
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return None
+    edges = np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1]))
+    counts = np.bincount(np.searchsorted(edges, values, side="right"), minlength=len(edges) + 1)
+    return {
+        "count": int(len(values)),
+        "mean": float(values.mean()),
+        "std": float(values.std(ddof=1)) if len(values) > 1 else 0.0,
+        "min": float(values.min()),
+        "max": float(values.max()),
+        "edges": edges.tolist(),
+        "fractions": (counts / len(values)).tolist(),
+    }
+
+
+def training_stats(frame, columns, bins=DRIFT_BINS):
+    """
+    feature_stats of each column of a DataFrame that has any values.
+    """
+    stats = {col: feature_stats(frame[col], bins) for col in columns if col in frame.columns}
+    return {col: s for col, s in stats.items() if s is not None}
+
+
+def update_feature_stats(stats, values):
+    """
+    feature_stats after adding new training values, without the old ones:
+    counts, moments and range are merged, the bin edges kept.
+    """
+    values = np.asarray(values, dtype=float)
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return stats
+    if stats is None:
+        return feature_stats(values)
+
+    n_old, n_new = stats["count"], len(values)
+    n = n_old + n_new
+    new_mean = float(values.mean())
+    delta = new_mean - stats["mean"]
+    # Chan et al. merge of the two sums of squared deviations
+    m2 = (stats["std"] ** 2 * (n_old - 1) + float(((values - new_mean) ** 2).sum())
+          + delta ** 2 * n_old * n_new / n)
+    counts = np.asarray(stats["fractions"]) * n_old + np.bincount(
+        np.searchsorted(stats["edges"], values, side="right"), minlength=len(stats["edges"]) + 1)
+    return {
+        "count": n,
+        "mean": stats["mean"] + delta * n_new / n,
+        "std": math.sqrt(m2 / (n - 1)) if n > 1 else 0.0,
+        "min": min(stats["min"], float(values.min())),
+        "max": max(stats["max"], float(values.max())),
+        "edges": stats["edges"],
+        "fractions": (counts / n).tolist(),
+    }
+
+
+def psi(observed, expected):
+    """
+    Population stability index between two sets of bin shares.
+    """
+    total = 0.0
+    for p, q in zip(observed, expected):
+        p, q = max(p, PSI_EPSILON), max(q, PSI_EPSILON)
+        total += (p - q) * math.log(p / q)
+    return total
+
+
+class RunningStats:
+    """
+    Welford mean/variance, range and bin counts of one feature.
+    """
+
+    __slots__ = ("count", "mean", "m2", "min", "max", "bins")
+
+    def __init__(self, n_bins):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.bins = [0] * n_bins
+
+    def update(self, value, edges):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.bins[bisect.bisect_right(edges, value)] += 1
+
+    @property
+    def std(self):
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def quantile(self, q, edges):
+        """
+        Approximate quantile, interpolated linearly inside its bin.
+        """
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.bins):
+            if n and seen + n >= target:
+                lo = max(edges[i - 1], self.min) if i > 0 else self.min
+                hi = min(edges[i], self.max) if i < len(edges) else self.max
+                return lo + (hi - lo) * (target - seen) / n
+            seen += n
+        return self.max
+
+
+class DriftMonitor:
+    """
+    Running statistics of incoming values for every feature with training
+    statistics; values for other features are ignored.
+    """
+
+    def __init__(self, reference, min_count=DRIFT_MIN_COUNT):
+        self.reference = reference
+        self.min_count = min_count
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.observations = 0
+            self.stats = {f: RunningStats(len(s["edges"]) + 1) for f, s in self.reference.items()}
+
+    def observe(self, values):
+        """
+        Add one request's {feature: value}.
+        """
+        with self.lock:
+            self.observations += 1
+            for feature, value in values.items():
+                stats = self.stats.get(feature)
+                if stats is None or value is None:
+                    continue
+                value = float(value)
+                if math.isfinite(value):
+                    stats.update(value, self.reference[feature]["edges"])
+
+    def feature_report(self, feature):
+        ref, stats = self.reference[feature], self.stats[feature]
+        report = {"count": stats.count}
+        if stats.count == 0:
+            return dict(report, status="no data")
+
+        report.update({
+            "mean": stats.mean,
+            "std": stats.std,
+            "min": stats.min,
+            "max": stats.max,
+            "quantiles": {f"p{int(q * 100)}": stats.quantile(q, ref["edges"]) for q in REPORTED_QUANTILES},
+            "training_mean": ref["mean"],
+            "training_std": ref["std"],
+        })
+        if stats.count < self.min_count:
+            return dict(report, status="insufficient data")
+
+        score = psi([n / stats.count for n in stats.bins], ref["fractions"])
+        report.update({
+            "psi": score,
+            "mean_shift": (stats.mean - ref["mean"]) / ref["std"] if ref["std"] > 0 else None,
+            "std_ratio": stats.std / ref["std"] if ref["std"] > 0 else None,
+            "status": "drift" if score >= PSI_DRIFT else "moderate" if score >= PSI_MODERATE else "stable",
+        })
+        return report
+
+    def report(self):
+        with self.lock:
+            features = {f: self.feature_report(f) for f in self.stats}
+            return {
+                "observations": self.observations,
+                "drifting": sorted(f for f, r in features.items() if r["status"] == "drift"),
+                "features": features,
+            }
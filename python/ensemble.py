@@ -0,0 +1,228 @@
+"""
+Bootstrap ensembles for the AD-status logistic models
+=====================================================
+Fits a few hundred logistic regressions on bootstrap resamples of
+public/data.csv and stores their coefficients as one stacked tensor per
+model, so the server can turn a single prediction into percentile bands
+with one batched einsum over the whole ensemble.
+"""
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LogisticRegression
+
+ENSEMBLE_PATH = "ensembles.npz"
+N_BOOTSTRAP = 200
+BAND_PERCENTILES = (5, 50, 95)
+
+# Feature sets, labels and hyper-parameters of the three served models.
+# The pickles the server loads (model.pkl, linguisticFeatures_vs_ADstatus.pkl
+# and tokens_vs_ADstatus_analysis.pkl) are fit from these specs together
+# with the ensembles (fit_served_models), so a point estimate and its bands
+# always come from the same model.
+MODEL_SPECS = {
+    "model": {
+        "features": [
+            "tTau_AB42Ratio", "AB42_AB40Ratio", "P_TAU_LUMI",
+            "AUX(participant)", "VERB(participant)", "CCONJ(participant)",
+            "NUM(participant)", "PROPN(participant)", "TTR(participant)",
+            "MATTR(participant)",
+        ],
+        "label_map": {"Normal": 0, "Prob AD": 1, "MCI": 2},
+        "params": {"max_iter": 2000},
+        "standardize": False,
+    },
+    "blob": {
+        "features": [
+            "AUX(participant)", "CCONJ(participant)", "NUM(participant)",
+            "PROPN(participant)", "VERB(participant)", "TTR(participant)",
+            "MATTR(participant)",
+        ],
+        "label_map": {"Normal": 0, "Prob AD": 1, "MCI": 2},
+        "params": {"max_iter": 1000},
+        "standardize": False,
+    },
+    "brain": {
+        "features": ["tokens(participant)"],
+        # classes_ of the pickled model are the sorted DX1 strings
+        "label_map": {"MCI": 0, "Normal": 1, "Prob AD": 2},
+        "params": {"max_iter": 1000, "class_weight": "balanced"},
+        "standardize": True,
+    },
+}
+
+
+def bootstrap_indices(y, n_boot, random_state=42):
+    """
+    Stratified bootstrap: resample within each class so every replicate
+    still sees the rare groups (there are only 3 Prob AD participants).
+    """
+    rng = np.random.default_rng(random_state)
+    classes = np.unique(y)
+    members = [np.flatnonzero(y == c) for c in classes]
+
+    indices = np.empty((n_boot, len(y)), dtype=np.int64)
+    for b in range(n_boot):
+        indices[b] = np.concatenate([rng.choice(m, size=len(m)) for m in members])
+    return indices
+
+
+def fold_scaler(model, mean, scale):
+    """
+    Fold a (mean, std) standardizing scaler into a fitted linear model's
+    coefficients, in place, so that it takes raw feature values.
+    """
+    scale = np.where(np.asarray(scale, dtype=float) == 0, 1.0, scale)
+    coef = model.coef_ / scale
+    model.intercept_ = model.intercept_ - coef @ np.asarray(mean, dtype=float)
+    model.coef_ = coef
+    return model
+
+
+def fit_model(X, y, params, standardize=False, scaler=None):
+    """
+    One logistic regression on all of X, standardized as in
+    fit_bootstrap_ensemble and taking raw feature values.
+    """
+    X = np.asarray(X, dtype=float)
+    mean, scale = np.zeros(X.shape[1]), np.ones(X.shape[1])
+    if standardize:
+        mean, scale = scaler if scaler is not None else (X.mean(axis=0), X.std(axis=0))
+        scale = np.where(np.asarray(scale, dtype=float) == 0, 1.0, scale)
+    clf = LogisticRegression(solver="lbfgs", **params)
+    clf.fit((X - mean) / scale, np.asarray(y))
+    return fold_scaler(clf, mean, scale)
+
+
+def fit_bootstrap_ensemble(X, y, params, n_boot=N_BOOTSTRAP, standardize=False,
+                           random_state=42, init=None, scaler=None):
+    """
+    Fit one logistic regression per bootstrap replicate.
+
+    Returns coefs (n_boot, n_classes, n_features) and intercepts
+    (n_boot, n_classes). When standardize is set the scaler is folded into
+    the coefficients, so the ensemble always takes raw feature values; a
+    given (mean, std) scaler is used instead of X's own. init, a previous
+    (coefs, intercepts) of the same shape, warm-starts every replicate from
+    its earlier solution.
+    """
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y)
+
+    mean = np.zeros(X.shape[1])
+    scale = np.ones(X.shape[1])
+    if standardize:
+        mean, scale = scaler if scaler is not None else (X.mean(axis=0), X.std(axis=0))
+        mean = np.asarray(mean, dtype=float)
+        scale = np.where(np.asarray(scale, dtype=float) == 0, 1.0, scale)
+    Xs = (X - mean) / scale
+
+    n_classes = len(np.unique(y))
+    coefs = np.empty((n_boot, n_classes, X.shape[1]))
+    intercepts = np.empty((n_boot, n_classes))
+
+    # Consecutive replicates are close, so warm-starting from the previous
+    # solution saves most of the lbfgs iterations.
+    clf = LogisticRegression(solver="lbfgs", warm_start=True, **params)
+    for b, idx in enumerate(bootstrap_indices(y, n_boot, random_state)):
+        if init is not None:
+            # raw-value coefficients back into the standardized space
+            clf.coef_ = init[0][b] * scale
+            clf.intercept_ = init[1][b] + init[0][b] @ mean
+        clf.fit(Xs[idx], y[idx])
+        coefs[b] = clf.coef_ / scale
+        intercepts[b] = clf.intercept_ - clf.coef_ @ (mean / scale)
+
+    return coefs, intercepts
+
+
+def ensemble_probabilities(coefs, intercepts, X):
+    """
+    Class probabilities of every ensemble member for every row of X,
+    shape (n_boot, n_rows, n_classes).
+    """
+    X = np.atleast_2d(np.asarray(X, dtype=float))
+    logits = np.einsum("bkf,nf->bnk", coefs, X) + intercepts[:, None, :]
+    logits -= logits.max(axis=2, keepdims=True)
+    probs = np.exp(logits)
+    probs /= probs.sum(axis=2, keepdims=True)
+    return probs
+
+
+def percentile_bands(coefs, intercepts, X, percentiles=BAND_PERCENTILES):
+    """
+    Percentiles of the ensemble probabilities, shape
+    (len(percentiles), n_rows, n_classes).
+    """
+    probs = ensemble_probabilities(coefs, intercepts, X)
+    return np.percentile(probs, percentiles, axis=0)
+
+
+def model_data(df, spec):
+    """
+    Rows of df usable for a MODEL_SPECS entry.
+    """
+    data = df.dropna(subset=spec["features"] + ["DX1"])
+    return data[data["DX1"].isin(spec["label_map"])]
+
+
+def fit_served_models(df):
+    """
+    The served model of every MODEL_SPECS entry, fit on all usable rows of
+    df, as {name: LogisticRegression}.
+    """
+    models = {}
+    for name, spec in MODEL_SPECS.items():
+        data = model_data(df, spec)
+        y = data["DX1"].map(spec["label_map"]).values
+        models[name] = fit_model(data[spec["features"]].values, y, spec["params"],
+                                 standardize=spec["standardize"])
+    return models
+
+
+def build_ensembles(df, n_boot=N_BOOTSTRAP, path=ENSEMBLE_PATH, init=None, scalers=None,
+                    max_iter=None):
+    """
+    Fit an ensemble for every model in MODEL_SPECS and save them to one
+    .npz file (<name>_coef, <name>_intercept per model). init and scalers
+    map model names to fit_bootstrap_ensemble's init and scaler; max_iter
+    overrides the specs' (warm-started fits need far fewer iterations).
+    """
+    arrays = {}
+    for name, spec in MODEL_SPECS.items():
+        data = model_data(df, spec)
+        X = data[spec["features"]].values
+        y = data["DX1"].map(spec["label_map"]).values
+
+        params = dict(spec["params"], **({"max_iter": max_iter} if max_iter else {}))
+        previous = (init or {}).get(name)
+        if previous is not None and previous[0].shape != (n_boot, len(spec["label_map"]), X.shape[1]):
+            previous = None
+        coefs, intercepts = fit_bootstrap_ensemble(
+            X, y, params, n_boot=n_boot, standardize=spec["standardize"],
+            init=previous, scaler=(scalers or {}).get(name)
+        )
+        arrays[f"{name}_coef"] = coefs
+        arrays[f"{name}_intercept"] = intercepts
+        print(f"✓ {name}: {coefs.shape[0]} bootstrap models, {coefs.shape[2]} features")
+
+    np.savez_compressed(path, **arrays)
+    return arrays
+
+
+def load_ensembles(path=ENSEMBLE_PATH):
+    """
+    Load the stacked ensembles as {name: (coefs, intercepts)}.
+    """
+    with np.load(path) as data:
+        return {
+            name: (data[f"{name}_coef"], data[f"{name}_intercept"])
+            for name in MODEL_SPECS
+            if f"{name}_coef" in data
+        }
+
+
+if __name__ == "__main__":
+    df = pd.read_csv("../public/data.csv")
+    build_ensembles(df)
+    print(f"Saved {ENSEMBLE_PATH}")
@@ -0,0 +1,103 @@
+"""
+Arrow IPC export of the dashboard datasets
+==========================================
+Writes every dataset the dashboard loads (data.csv, the radial word cloud
+JSON, the TF-IDF and correlation CSVs) as Arrow IPC (Feather v2) files, so
+the browser can map typed arrays directly instead of parsing text.
+
+Numeric columns are stored as float32 (integers as int32), and repeated
+strings such as DX1 are dictionary-encoded. File names carry a content
+hash, so the server can cache them forever; manifest.json maps each
+dataset name to its current file.
+"""
+
+import hashlib
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+PUBLIC_DIR = "../public"
+ARROW_DIR = os.path.join(PUBLIC_DIR, "arrow")
+MANIFEST = "manifest.json"
+
+# Columns whose distinct values are at most this fraction of the rows are
+# dictionary-encoded
+DICTIONARY_RATIO = 0.5
+
+
+def load_datasets(public_dir=PUBLIC_DIR):
+    """
+    The dashboard datasets as DataFrames keyed by name.
+    """
+    datasets = {
+        "data": pd.read_csv(os.path.join(public_dir, "data.csv")),
+        "tfidf_scores_normal": pd.read_csv(os.path.join(public_dir, "tfidf_scores_normal.csv")),
+        "tfidf_scores_impaired": pd.read_csv(os.path.join(public_dir, "tfidf_scores_impaired.csv")),
+        "radial_wordcloud_data": pd.read_json(os.path.join(public_dir, "radial_wordcloud_data.json")),
+    }
+    corr = pd.read_csv(os.path.join(public_dir, "correlation_matrix_top10.csv"), index_col=0)
+    datasets["correlation_matrix_top10"] = corr.rename_axis("feature").reset_index()
+    return datasets
+
+
+def to_arrow_table(df):
+    """
+    Typed Arrow table: float32 / int32 numbers, dictionary-encoded
+    low-cardinality strings, plain strings otherwise.
+    """
+    arrays = {}
+    for col in df.columns:
+        values = df[col]
+        if pd.api.types.is_bool_dtype(values):
+            arrays[col] = pa.array(values, type=pa.bool_())
+        elif pd.api.types.is_integer_dtype(values):
+            arrays[col] = pa.array(values, type=pa.int32())
+        elif pd.api.types.is_numeric_dtype(values):
+            arrays[col] = pa.array(values, type=pa.float32(), from_pandas=True)
+        else:
+            strings = pa.array(values.astype(object).where(values.notna(), None), type=pa.string())
+            if values.nunique() <= DICTIONARY_RATIO * len(values):
+                strings = strings.dictionary_encode()
+            arrays[col] = strings
+    return pa.table(arrays)
+
+
+def export_datasets(datasets, out_dir=ARROW_DIR):
+    """
+    Write one content-addressed .arrow file per dataset plus the manifest.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {}
+
+    for name, df in datasets.items():
+        tmp_path = os.path.join(out_dir, f"{name}.arrow.tmp")
+        # uncompressed IPC buffers: the JS reader maps them directly and the
+        # server compresses on the wire
+        feather.write_feather(to_arrow_table(df), tmp_path, compression="uncompressed")
+
+        with open(tmp_path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:12]
+        filename = f"{name}.{digest}.arrow"
+        os.replace(tmp_path, os.path.join(out_dir, filename))
+
+        manifest[name] = {"file": filename, "rows": len(df), "columns": list(df.columns)}
+        print(f"✓ {name}: {len(df)} rows -> {filename}")
+
+    # drop files from earlier exports that the manifest no longer points to
+    current = {entry["file"] for entry in manifest.values()}
+    for filename in os.listdir(out_dir):
+        if filename.endswith(".arrow") and filename not in current:
+            os.remove(os.path.join(out_dir, filename))
+
+    with open(os.path.join(out_dir, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    return manifest
+
+
+if __name__ == "__main__":
+    export_datasets(load_datasets())
+    print(f"Saved Arrow datasets and {MANIFEST} to {ARROW_DIR}")
@@ -4,10 +4,12 @@ Feature Analysis and ML Prediction for Alzheimer's Disease
 This script performs:
 1. Data cleaning and preprocessing from Excel files
 2. Feature importance analysis to identify top predictive features
-3. Correlation matrix computation
+3. Correlation matrix computation (top 10 features, plus the strongest
+   partners of every feature via the blocked engine in correlation.py)
 4. ML model training for AD prediction
 """
 
+import argparse
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
@@ -18,6 +20,9 @@ from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
 from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import classification_report, confusion_matrix, roc_auc_score
 from sklearn.feature_selection import SelectKBest, f_classif, mutual_info_classif
+from correlation import top_correlation_table
+from pipeline import Pipeline, PipelineError
+from profiling import PROFILE_DIR
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -197,6 +202,25 @@ def compute_correlation_matrix(X, top_features, save_plot=True):
     return corr_matrix
 
 
+def compute_top_correlations(X, k=10, p_values=True):
+    """
+    Top-k absolute correlations of every feature against all others,
+    computed block by block without the full correlation matrix
+    """
+    print("\n" + "=" * 70)
+    print(f"STEP 4b: Top {k} Correlated Partners of All {X.shape[1]} Features")
+    print("=" * 70)
+
+    pairs = top_correlation_table(X, k=k, p_values=p_values)
+
+    strongest = pairs[pairs['rank'] == 1].sort_values('r', key=abs, ascending=False)
+    print(f"\n✓ {len(pairs)} feature pairs kept")
+    print("\nStrongest partner per feature (top 10):")
+    print(strongest.head(10).to_string(index=False))
+
+    return pairs
+
+
 # ============================================================================
 # 3. MACHINE LEARNING MODELS
 # ============================================================================
@@ -274,28 +298,23 @@ def train_ml_models(X, y, top_features):
 
 
 # ============================================================================
-# 4. MAIN EXECUTION
+# 4. PIPELINE
 # ============================================================================
 
-def main():
+INPUT_FILES = [
+    '../demographic(1).xlsx',
+    '../fullData(1).xlsx',
+    '../linguistic_outcomes.xlsx',
+    '../utterance_data.xlsx',
+]
+TIMING_REPORT = 'feature_analysis_timings.json'
+
+
+def prepare_features(merged_data, target_col='DX1'):
     """
-    Main execution function
+    Split the merged data into a clean numeric feature matrix and an
+    encoded binary target
     """
-    print("\n" + "=" * 70)
-    print("ALZHEIMER'S DISEASE FEATURE ANALYSIS AND PREDICTION")
-    print("=" * 70)
-    
-    # Step 1: Load and clean data
-    data_dict = load_and_clean_data()
-    if data_dict is None:
-        return
-    
-    # Step 2: Merge and prepare
-    merged_data = merge_and_prepare_data(data_dict)
-    if merged_data is None:
-        return
-    
-    # Step 3: Prepare features and target
     # NOTE: Adjust 'AD_status' to your actual target column name
     # Common names: 'AD_status', 'diagnosis', 'group', 'label', 'class'
     print("\n" + "=" * 70)
@@ -305,8 +324,6 @@ def main():
     print(merged_data.columns.tolist())
     
     # Target column: DX1 contains diagnosis (Normal, Prob AD, MCI variants)
-    target_col = 'DX1'
-    
     if target_col not in merged_data.columns:
         print(f"\n⚠ WARNING: '{target_col}' not found in data!")
         print("Please modify the 'target_col' variable with the correct column name.")
@@ -316,7 +333,7 @@ def main():
                                 ['status', 'diagnosis', 'group', 'label', 'class', 'ad'])]
         if potential_targets:
             print(f"Potential target columns: {potential_targets}")
-        return
+        return None
     
     # Separate features and target
     X = merged_data.drop(columns=[target_col])
@@ -363,36 +380,94 @@ def main():
     print(f"\n✓ Feature matrix (cleaned): {X.shape}")
     print(f"✓ Final target distribution: {pd.Series(y).value_counts().to_dict()}")
     
-    # Step 4: Identify top features
-    top_features, feature_scores = identify_top_features(X, y, n_features=10)
-    
-    # Save feature scores
+    return X, y
+
+
+def feature_importance_stage(X, y, n_features=10):
+    top_features, feature_scores = identify_top_features(X, y, n_features=n_features)
     feature_scores.to_csv('feature_importance_scores.csv')
     print("\n✓ Feature scores saved: feature_importance_scores.csv")
-    
-    # Step 5: Compute correlation matrix
+    return top_features, feature_scores
+
+
+def correlation_stage(X, top_features):
     corr_matrix = compute_correlation_matrix(X, top_features)
     corr_matrix.to_csv('correlation_matrix_top10.csv')
     print("✓ Correlation matrix saved: correlation_matrix_top10.csv")
-    
-    # Step 6: Train ML models
-    results, X_test, y_test, scaler = train_ml_models(X, y, top_features)
-    
-    # Save cleaned data
-    cleaned_data = merged_data.copy()
-    cleaned_data.to_csv('cleaned_merged_data.csv', index=False)
+
+
+def top_pairs_stage(X, k=10):
+    top_pairs = compute_top_correlations(X, k=k)
+    top_pairs.to_csv('correlation_top_pairs.csv', index=False)
+    print("✓ Top correlated pairs saved: correlation_top_pairs.csv")
+
+
+def cleaned_data_stage(merged_data):
+    merged_data.to_csv('cleaned_merged_data.csv', index=False)
     print("\n✓ Cleaned data saved: cleaned_merged_data.csv")
-    
+
+
+def build_pipeline(n_features=10, max_workers=None, profile_dir=None):
+    """
+    The analysis as a DAG of cached stages (see pipeline.py). Changing
+    n_features only reruns the stages downstream of feature selection.
+    """
+    pipeline = Pipeline('feature_analysis', max_workers=max_workers, profile_dir=profile_dir)
+    pipeline.add('load', load_and_clean_data, outputs=['data_dict'], files=INPUT_FILES)
+    pipeline.add('merge', merge_and_prepare_data, inputs=['data_dict'], outputs=['merged_data'])
+    pipeline.add('prepare', prepare_features, inputs=['merged_data'], outputs=['X', 'y'])
+    pipeline.add('top_features', feature_importance_stage, inputs=['X', 'y'],
+                 outputs=['top_features', 'feature_scores'],
+                 params={'n_features': n_features},
+                 products=['feature_importance_scores.csv'])
+    pipeline.add('correlation', correlation_stage, inputs=['X', 'top_features'],
+                 products=['correlation_matrix_top10.png', 'correlation_matrix_top10.csv'])
+    pipeline.add('top_pairs', top_pairs_stage, inputs=['X'],
+                 products=['correlation_top_pairs.csv'], depends=[top_correlation_table])
+    pipeline.add('train', train_ml_models, inputs=['X', 'y', 'top_features'],
+                 outputs=['ml_results'])
+    pipeline.add('cleaned_data', cleaned_data_stage, inputs=['merged_data'],
+                 products=['cleaned_merged_data.csv'])
+    return pipeline
+
+
+# ============================================================================
+# 5. MAIN EXECUTION
+# ============================================================================
+
+def main(n_features=10, profile=False):
+    """
+    Main execution function
+    """
+    print("\n" + "=" * 70)
+    print("ALZHEIMER'S DISEASE FEATURE ANALYSIS AND PREDICTION")
+    print("=" * 70)
+
+    pipeline = build_pipeline(n_features=n_features, profile_dir=PROFILE_DIR if profile else None)
+    try:
+        pipeline.run()
+    except PipelineError as e:
+        print(f"Error: {e}")
+        return
+    pipeline.timer.write_report(TIMING_REPORT)
+
     print("\n" + "=" * 70)
     print("ANALYSIS COMPLETE!")
     print("=" * 70)
     print("\nGenerated files:")
     print("  1. correlation_matrix_top10.png - Heatmap visualization")
     print("  2. correlation_matrix_top10.csv - Correlation values")
-    print("  3. feature_importance_scores.csv - Feature importance metrics")
-    print("  4. cleaned_merged_data.csv - Preprocessed dataset")
+    print("  3. correlation_top_pairs.csv - Top 10 partners of every feature")
+    print("  4. feature_importance_scores.csv - Feature importance metrics")
+    print("  5. cleaned_merged_data.csv - Preprocessed dataset")
+    print(f"  6. {TIMING_REPORT} - Per-stage wall and CPU time")
     print("\n" + "=" * 70)
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--n-features", type=int, default=10)
+    parser.add_argument("--profile", action="store_true",
+                        help=f"stack-sample every stage into {PROFILE_DIR}/")
+    args = parser.parse_args()
+    main(n_features=args.n_features, profile=args.profile)
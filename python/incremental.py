@@ -0,0 +1,293 @@
+"""
+Incremental retraining
+======================
+Retrains the three bundle models when new participants appear in
+public/data.csv, at a cost that follows the new rows rather than the
+whole cohort:
+
+- metadata.json keeps a training_state: the REGTRYIDs trained on so far
+  and, per model, the running count/mean/M2 of its features. Feature
+  means, scaler statistics and drift reference stats are merged with the
+  new rows only.
+- Every LogisticRegression, and every bootstrap replicate of the
+  ensembles, warm-starts from the currently served coefficients, so lbfgs
+  converges in far fewer iterations than from scratch. The served models
+  take raw feature values (older bundles are converted on load, see
+  model_registry.py), so the starting point and the held-out comparison
+  are in the same feature space as the candidates.
+- Before anything is published, a share of the new participants (chosen
+  by REGTRYID hash, so reruns agree) is held out. Each candidate must
+  converge and score a log loss on them no worse than the served model's,
+  within LOSS_TOLERANCE. Only then are the models refit on all rows
+  (again required to converge) and published as a new registry version.
+
+    python incremental.py
+    python Biomarkers_Linguistic_AD.py --incremental
+"""
+
+import argparse
+import json
+import pickle
+import warnings
+import zlib
+
+import numpy as np
+import pandas as pd
+from sklearn.exceptions import ConvergenceWarning
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, log_loss
+
+from drift import update_feature_stats
+from ensemble import ENSEMBLE_PATH, MODEL_SPECS, build_ensembles, fold_scaler, model_data
+from model_registry import (BUNDLE_FILES, BUNDLE_MODELS, REGISTRY_DIR, ModelBundle,
+                            current_version, publish_bundle)
+
+DATA_PATH = "../public/data.csv"
+# None: each spec's own max_iter; a warm start needs far fewer
+INCREMENTAL_MAX_ITER = None
+MIN_NEW_PARTICIPANTS = 10
+HOLDOUT_PERCENT = 30
+MIN_HOLDOUT = 3
+LOSS_TOLERANCE = 0.05
+# features whose drift reference stats are kept (see drift.py)
+STATS_MODEL = "model"
+
+
+def moments(X):
+    X = np.asarray(X, dtype=float)
+    mean = X.mean(axis=0) if len(X) else np.zeros(X.shape[1])
+    return {"n": len(X), "mean": mean.tolist(), "m2": ((X - mean) ** 2).sum(axis=0).tolist()}
+
+
+def merge_moments(state, X):
+    """
+    Running count/mean/M2 with the rows of X added (Chan et al.).
+    """
+    new = moments(X)
+    n_old, n_new = state["n"], new["n"]
+    if n_new == 0:
+        return state
+    n = n_old + n_new
+    delta = np.asarray(new["mean"]) - state["mean"]
+    return {
+        "n": n,
+        "mean": (np.asarray(state["mean"]) + delta * n_new / n).tolist(),
+        "m2": (np.asarray(state["m2"]) + new["m2"] + delta ** 2 * n_old * n_new / n).tolist(),
+    }
+
+
+def scaler_of(state):
+    """
+    (mean, std) as StandardScaler would compute them.
+    """
+    std = np.sqrt(np.asarray(state["m2"]) / max(state["n"], 1))
+    return np.asarray(state["mean"]), np.where(std == 0, 1.0, std)
+
+
+def training_state(df):
+    """
+    Running statistics of a full training run, the base later incremental
+    runs build on.
+    """
+    return {
+        "trained_ids": sorted(int(i) for i in df["REGTRYID"]),
+        "moments": {
+            name: moments(model_data(df, spec)[spec["features"]].values)
+            for name, spec in MODEL_SPECS.items()
+        },
+    }
+
+
+def in_holdout(ids, percent=HOLDOUT_PERCENT):
+    return np.array([zlib.crc32(str(int(i)).encode()) % 100 < percent for i in ids], dtype=bool)
+
+
+def iteration_cap(spec, max_iter=INCREMENTAL_MAX_ITER):
+    return max_iter or spec["params"]["max_iter"]
+
+
+def warm_fit(previous, data, spec, scaler, max_iter=INCREMENTAL_MAX_ITER):
+    """
+    Fit a spec's model on data, starting from previous's coefficients
+    (which take raw values). As in the ensembles, a standardizing scaler is
+    folded into the returned coefficients, so the model takes raw values.
+    """
+    X = data[spec["features"]].values.astype(float)
+    y = data["DX1"].map(spec["label_map"]).values
+    mean, scale = scaler if spec["standardize"] else (np.zeros(X.shape[1]), np.ones(X.shape[1]))
+
+    clf = LogisticRegression(solver="lbfgs", warm_start=True,
+                             **dict(spec["params"], max_iter=iteration_cap(spec, max_iter)))
+    if previous is not None and previous.coef_.shape == (len(np.unique(y)), X.shape[1]):
+        clf.coef_ = previous.coef_ * scale
+        clf.intercept_ = previous.intercept_ + previous.coef_ @ mean
+    Xs = (X - mean) / scale
+    # keep the input type the served model was trained with
+    if hasattr(previous, "feature_names_in_"):
+        Xs = pd.DataFrame(Xs, columns=spec["features"])
+    # convergence is checked explicitly, see converged()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", ConvergenceWarning)
+        clf.fit(Xs, y)
+    return fold_scaler(clf, mean, scale)
+
+
+def converged(model, spec, max_iter=INCREMENTAL_MAX_ITER):
+    return int(model.n_iter_.max()) < iteration_cap(spec, max_iter)
+
+
+def fit_outcome(model, spec, max_iter=INCREMENTAL_MAX_ITER):
+    iterations = int(model.n_iter_.max())
+    if converged(model, spec, max_iter):
+        return f"converged in {iterations} iterations"
+    return f"did not converge within {iterations} iterations"
+
+
+def evaluate(model, data, spec):
+    X = data[spec["features"]].values.astype(float)
+    if hasattr(model, "feature_names_in_"):
+        X = pd.DataFrame(X, columns=model.feature_names_in_)
+    y = data["DX1"].map(spec["label_map"]).values
+    probs = model.predict_proba(X)
+    return {
+        "log_loss": float(log_loss(y, probs, labels=list(range(probs.shape[1])))),
+        "accuracy": float(accuracy_score(y, probs.argmax(axis=1))),
+    }
+
+
+def held_out_check(served, candidate, test, spec, tolerance=LOSS_TOLERANCE,
+                   max_iter=INCREMENTAL_MAX_ITER):
+    """
+    Whether candidate may replace served: it converged, and its log loss on
+    the held-out rows is no worse than served's, within tolerance. Returns
+    (passed, before, after).
+    """
+    before, after = evaluate(served, test, spec), evaluate(candidate, test, spec)
+    passed = (converged(candidate, spec, max_iter)
+              and after["log_loss"] <= before["log_loss"] * (1 + tolerance))
+    return passed, before, after
+
+
+def load_previous(registry_dir=REGISTRY_DIR):
+    version = current_version(registry_dir)
+    if version is None:
+        return ModelBundle.from_directory(".")
+    return ModelBundle.from_registry(version, registry_dir)
+
+
+def retrain_incremental(data_path=DATA_PATH, registry_dir=REGISTRY_DIR,
+                        min_new=MIN_NEW_PARTICIPANTS, tolerance=LOSS_TOLERANCE,
+                        max_iter=INCREMENTAL_MAX_ITER, publish=True):
+    """
+    Retrain on the participants added since the served bundle was trained.
+    Returns the published version, or None when nothing was published.
+    """
+    print("=" * 70)
+    print("INCREMENTAL RETRAINING")
+    print("=" * 70)
+
+    previous = load_previous(registry_dir)
+    meta = previous.meta
+    state = meta.get("training_state")
+    if state is None:
+        print(f"⚠ Bundle {previous.version} has no training_state; run a full training first")
+        return None
+
+    df = pd.read_csv(data_path)
+    df = df[df["DX1"].notna()]
+    trained = set(state["trained_ids"])
+    new = df[~df["REGTRYID"].isin(trained)]
+    print(f"✓ Serving {previous.version}: {len(trained)} participants trained, {len(new)} new")
+    if len(new) < min_new:
+        print(f"⚠ Waiting for at least {min_new} new participants")
+        return None
+
+    holdout = new[in_holdout(new["REGTRYID"])]
+    if len(holdout) < MIN_HOLDOUT:
+        print(f"⚠ Only {len(holdout)} new participants fall in the held-out share "
+              f"(need {MIN_HOLDOUT}); waiting for more")
+        return None
+    train = df.drop(index=holdout.index)
+    new_train = new.drop(index=holdout.index)
+
+    # 1. candidates without the held-out participants, checked against the served models
+    print(f"\nHeld-out check on {len(holdout)} new participants:")
+    passed = True
+    for name, spec in MODEL_SPECS.items():
+        served = getattr(previous, BUNDLE_MODELS[name])
+        rows = merge_moments(state["moments"][name], model_data(new_train, spec)[spec["features"]].values)
+        candidate = warm_fit(served, model_data(train, spec), spec, scaler_of(rows), max_iter)
+        test = model_data(holdout, spec)
+        if len(test) == 0:
+            print(f"  {name:<6} no usable held-out rows, skipped")
+            continue
+        ok, before, after = held_out_check(served, candidate, test, spec, tolerance, max_iter)
+        passed &= ok
+        print(f"  {name:<6} log loss {before['log_loss']:.4f} → {after['log_loss']:.4f}  "
+              f"accuracy {before['accuracy']:.2f} → {after['accuracy']:.2f}  "
+              f"({fit_outcome(candidate, spec, max_iter)}) {'✓' if ok else '⚠ failed'}")
+    if not passed:
+        print("\n⚠ Candidates failed the held-out check; nothing published")
+        return None
+
+    # 2. final models on every row, with statistics merged from the new rows only
+    print("\nFinal fit:")
+    models, scalers, stats = {}, {}, dict(meta.get("feature_stats", {}))
+    moments_state = {}
+    for name, spec in MODEL_SPECS.items():
+        moments_state[name] = merge_moments(state["moments"][name],
+                                            model_data(new, spec)[spec["features"]].values)
+        scalers[name] = scaler_of(moments_state[name])
+        models[name] = warm_fit(getattr(previous, BUNDLE_MODELS[name]), model_data(df, spec),
+                                spec, scalers[name], max_iter)
+        print(f"  {name:<6} on all {len(model_data(df, spec))} rows: "
+              f"{fit_outcome(models[name], spec, max_iter)}")
+    failed = [name for name, model in models.items()
+              if not converged(model, MODEL_SPECS[name], max_iter)]
+    if failed:
+        print(f"\n⚠ {', '.join(failed)} did not converge on all rows; nothing published")
+        return None
+
+    stats_rows = model_data(new, MODEL_SPECS[STATS_MODEL])
+    for feature in stats:
+        if feature in stats_rows.columns:
+            stats[feature] = update_feature_stats(stats[feature], stats_rows[feature])
+
+    model_features = MODEL_SPECS[STATS_MODEL]["features"]
+    meta = dict(meta)
+    meta["feature_means"] = dict(zip(model_features, moments_state[STATS_MODEL]["mean"]))
+    meta["feature_stats"] = stats
+    meta["input_scalers"] = {}
+    meta["training_state"] = {
+        "trained_ids": sorted(trained | {int(i) for i in new["REGTRYID"]}),
+        "moments": moments_state,
+    }
+
+    for name, model in models.items():
+        with open(BUNDLE_FILES[BUNDLE_MODELS[name]], "wb") as f:
+            pickle.dump(model, f)
+    with open(BUNDLE_FILES["metadata"], "w") as f:
+        json.dump(meta, f, indent=2)
+    build_ensembles(df, path=ENSEMBLE_PATH, init=previous.ensembles, max_iter=max_iter,
+                    scalers={n: s for n, s in scalers.items() if MODEL_SPECS[n]["standardize"]})
+    print(f"\n✓ Retrained on {len(df)} participants ({len(new)} new)")
+
+    if not publish:
+        return None
+    version = publish_bundle(".", registry_dir)
+    print(f"✓ Published model version {version}")
+    return version
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Retrain on newly added participants")
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--registry", default=REGISTRY_DIR)
+    parser.add_argument("--min-new", type=int, default=MIN_NEW_PARTICIPANTS)
+    parser.add_argument("--tolerance", type=float, default=LOSS_TOLERANCE)
+    parser.add_argument("--max-iter", type=int, default=INCREMENTAL_MAX_ITER,
+                        help="iteration cap per fit (default: each model's own max_iter)")
+    parser.add_argument("--no-publish", action="store_true")
+    args = parser.parse_args()
+    retrain_incremental(args.data, args.registry, args.min_new, args.tolerance,
+                        args.max_iter, publish=not args.no_publish)
@@ -0,0 +1,234 @@
+"""
+Versioned model registry
+========================
+Training runs publish immutable model bundles; the server loads whichever
+bundle the registry marks as current.
+
+    registry/
+        <version>/              one read-only directory per bundle
+            model.pkl
+            linguisticFeatures_vs_ADstatus.pkl
+            tokens_vs_ADstatus_analysis.pkl
+            metadata.json       BIOMARKERS, LINGUISTIC, FEATURE_MEANS, ...
+            ensembles.npz
+            manifest.json       version, creation time, sha256 per file
+        CURRENT                 the active version
+
+A version is "<UTC timestamp>-<hash of the bundle contents>". Bundles are
+written to a temporary directory and renamed into place, and CURRENT is
+replaced atomically, so readers never see a partial bundle or pointer.
+Rolling back is just pointing CURRENT at an older version.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import stat
+import tempfile
+import time
+
+from ensemble import ENSEMBLE_PATH, fold_scaler, load_ensembles
+
+REGISTRY_DIR = "registry"
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+BUNDLE_FILES = {
+    "model": "model.pkl",
+    "blob_model": "linguisticFeatures_vs_ADstatus.pkl",
+    "brain_model": "tokens_vs_ADstatus_analysis.pkl",
+    "metadata": "metadata.json",
+    "ensembles": ENSEMBLE_PATH,
+}
+
+# bundle attribute of each model in ensemble.MODEL_SPECS
+BUNDLE_MODELS = {"model": "model", "blob": "blob_model", "brain": "brain_model"}
+# metadata.json "input_scalers" lists the models whose pickle expects
+# standardized inputs; they are converted to raw inputs on load. Bundles
+# from before the pickles were fit from MODEL_SPECS have no such entry:
+# their tokens model (tokens_vs_ADstatus_analysis.py) was trained on tokens
+# standardized with the StandardScaler of that script's data.csv.
+LEGACY_INPUT_SCALERS = {"brain": {"mean": [659.3023255813953], "scale": [328.7117977725047]}}
+
+
+class RegistryError(RuntimeError):
+    pass
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_atomic(path, text):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".")
+    with os.fdopen(fd, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def bundle_hash(source_dir="."):
+    """
+    Hash of the bundle files in source_dir, used to version and to tell
+    whether the files changed.
+    """
+    digest = hashlib.sha256()
+    for name in sorted(BUNDLE_FILES.values()):
+        digest.update(name.encode())
+        digest.update(_file_hash(os.path.join(source_dir, name)).encode())
+    return digest.hexdigest()
+
+
+def publish_bundle(source_dir=".", registry_dir=REGISTRY_DIR, activate=True):
+    """
+    Copy the bundle files from source_dir into a new immutable version and,
+    by default, make it current. Publishing unchanged files again returns
+    the existing version.
+    """
+    missing = [n for n in BUNDLE_FILES.values() if not os.path.exists(os.path.join(source_dir, n))]
+    if missing:
+        raise RegistryError(f"Missing bundle files in {source_dir}: {missing}")
+
+    content = bundle_hash(source_dir)
+    os.makedirs(registry_dir, exist_ok=True)
+    for version in list_versions(registry_dir):
+        if version.endswith(content[:12]):
+            if activate:
+                set_current(version, registry_dir)
+            return version
+
+    version = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime()) + "-" + content[:12]
+    staging = tempfile.mkdtemp(prefix=".staging-", dir=registry_dir)
+    files = {}
+    for name in BUNDLE_FILES.values():
+        target = os.path.join(staging, name)
+        shutil.copyfile(os.path.join(source_dir, name), target)
+        files[name] = _file_hash(target)
+    with open(os.path.join(staging, MANIFEST_FILE), "w") as f:
+        json.dump({"version": version, "created": time.time(), "files": files}, f, indent=2)
+
+    for name in os.listdir(staging):
+        os.chmod(os.path.join(staging, name), stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+    os.rename(staging, os.path.join(registry_dir, version))
+
+    if activate:
+        set_current(version, registry_dir)
+    return version
+
+
+def list_versions(registry_dir=REGISTRY_DIR):
+    """
+    Published versions, oldest first.
+    """
+    if not os.path.isdir(registry_dir):
+        return []
+    return sorted(
+        v for v in os.listdir(registry_dir)
+        if os.path.exists(os.path.join(registry_dir, v, MANIFEST_FILE))
+    )
+
+
+def manifest(version, registry_dir=REGISTRY_DIR):
+    with open(os.path.join(registry_dir, version, MANIFEST_FILE)) as f:
+        return json.load(f)
+
+
+def current_version(registry_dir=REGISTRY_DIR):
+    """
+    The version CURRENT points at, or None for an empty registry.
+    """
+    path = os.path.join(registry_dir, CURRENT_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return f.read().strip() or None
+
+
+def set_current(version, registry_dir=REGISTRY_DIR):
+    if version not in list_versions(registry_dir):
+        raise RegistryError(f"Unknown model version '{version}'")
+    _write_atomic(os.path.join(registry_dir, CURRENT_FILE), version + "\n")
+
+
+def previous_version(version, registry_dir=REGISTRY_DIR):
+    """
+    The newest published version older than the given one, or None.
+    """
+    older = [v for v in list_versions(registry_dir) if v < version]
+    return older[-1] if older else None
+
+
+class ModelBundle:
+    """
+    The three pickled models, their metadata and bootstrap ensembles,
+    loaded from one registry version (or a plain directory of files).
+    """
+
+    def __init__(self, path, version):
+        self.path = path
+        self.version = version
+
+        def load_pickle(key):
+            with open(os.path.join(path, BUNDLE_FILES[key]), "rb") as f:
+                return pickle.load(f)
+
+        self.model = load_pickle("model")
+        self.blob_model = load_pickle("blob_model")
+        self.brain_model = load_pickle("brain_model")
+        with open(os.path.join(path, BUNDLE_FILES["metadata"])) as f:
+            self.meta = json.load(f)
+        # every model takes raw feature values, like the ensembles
+        for name, scaler in self.meta.get("input_scalers", LEGACY_INPUT_SCALERS).items():
+            fold_scaler(getattr(self, BUNDLE_MODELS[name]), scaler["mean"], scaler["scale"])
+        self.ensembles = load_ensembles(os.path.join(path, BUNDLE_FILES["ensembles"]))
+
+    @classmethod
+    def from_registry(cls, version, registry_dir=REGISTRY_DIR):
+        path = os.path.join(registry_dir, version)
+        expected = manifest(version, registry_dir)["files"]
+        for name, digest in expected.items():
+            if _file_hash(os.path.join(path, name)) != digest:
+                raise RegistryError(f"{version}/{name} does not match its manifest")
+        return cls(path, version)
+
+    @classmethod
+    def from_directory(cls, path="."):
+        """
+        Bundle from loose files (no registry yet), versioned by content.
+        """
+        return cls(path, "local-" + bundle_hash(path)[:12])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the model registry")
+    sub = parser.add_subparsers(dest="command", required=True)
+    publish = sub.add_parser("publish", help="publish the bundle files as a new version")
+    publish.add_argument("--source", default=".")
+    publish.add_argument("--no-activate", action="store_true")
+    sub.add_parser("list", help="list published versions")
+    activate = sub.add_parser("activate", help="make a version current")
+    activate.add_argument("version")
+    sub.add_parser("rollback", help="make the previous version current")
+    args = parser.parse_args()
+
+    if args.command == "publish":
+        version = publish_bundle(args.source, activate=not args.no_activate)
+        print(f"✓ Published {version}")
+    elif args.command == "list":
+        current = current_version()
+        for version in list_versions():
+            print(("* " if version == current else "  ") + version)
+    elif args.command == "activate":
+        set_current(args.version)
+        print(f"✓ Current version: {args.version}")
+    elif args.command == "rollback":
+        previous = previous_version(current_version() or "")
+        if previous is None:
+            raise SystemExit("No earlier version to roll back to")
+        set_current(previous)
+        print(f"✓ Rolled back to {previous}")
@@ -0,0 +1,57 @@
+"""
+Server-side patient index
+=========================
+Looks participants up by REGTRYID or transcript file name in the shared
+cohort store and precomputes every participant's percentile rank within
+each diagnosis group from presorted per-group arrays, so a single patient
+can be served without shipping the whole corpus to the browser.
+"""
+
+import numpy as np
+
+
+class PatientIndex:
+    """
+    Lookup of cohort rows by REGTRYID or file, with per-group percentiles.
+    """
+
+    def __init__(self, store, features, group_col="DX1", groups=None):
+        self.store = store
+        self.features = list(features)
+        labels = store.column(group_col)
+        self.groups = list(groups) if groups is not None else sorted(set(labels) - {None})
+
+        self.raw = store.values(self.features)
+        self.values = self.raw.astype(float)
+
+        # percentiles[row, group, feature]: mid-rank of the row's value among
+        # that group's participants, from one searchsorted per group/feature
+        self.percentiles = np.full((len(self.values), len(self.groups), len(self.features)), np.nan)
+        for g, group in enumerate(self.groups):
+            members = self.values[labels == group]
+            for f in range(len(self.features)):
+                presorted = np.sort(members[:, f][~np.isnan(members[:, f])])
+                if len(presorted) == 0:
+                    continue
+                below = np.searchsorted(presorted, self.values[:, f], side="left")
+                at_or_below = np.searchsorted(presorted, self.values[:, f], side="right")
+                self.percentiles[:, g, f] = 100.0 * (below + at_or_below) / (2 * len(presorted))
+
+    def __len__(self):
+        return len(self.values)
+
+    def lookup(self, key):
+        """
+        Row position for a REGTRYID or a file name, or None.
+        """
+        return self.store.lookup(key)
+
+    def features_of(self, i):
+        # str() gives the shortest repr of the stored float32 value
+        return {f: float(str(v)) for f, v in zip(self.features, self.raw[i])}
+
+    def percentiles_of(self, i):
+        return {
+            group: {f: float(p) for f, p in zip(self.features, self.percentiles[i, g])}
+            for g, group in enumerate(self.groups)
+        }
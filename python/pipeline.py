@@ -0,0 +1,349 @@
+"""
+Stage DAG runner with a content-addressed artifact cache
+========================================================
+An analysis pipeline is a set of named stages. Each stage declares:
+
+- inputs:   artifact names produced by other stages (passed positionally)
+- outputs:  artifact names it returns (one value, or a tuple in order)
+- params:   keyword arguments
+- files:    source files it reads (hashed by content)
+- products: files it writes as a side effect (stored and restored)
+
+A stage's cache key is the hash of its code version, its params, the
+content hashes of its input artifacts and of its source files. Unless
+`version` is given, the code version hashes the source of the stage
+function and of every function from the same module it references,
+directly or through other such helpers (e.g. preprocess_text), so editing
+one of them reruns the stage while edits elsewhere in the module do not.
+Helpers imported from other modules must be listed in `depends`; they are
+hashed the same way. Module constants and classes are not tracked: pass a
+new `version` when a stage's behaviour depends on a changed one. Outputs
+are pickled and stored by the hash of their bytes, so when a recomputed
+stage produces identical artifacts nothing downstream reruns. Stages whose
+inputs are ready run in parallel on a process pool; cached stages are
+resolved without loading their artifacts unless a downstream stage needs
+them.
+
+Every run is timed with profiling.Timer (self.timer after run()); with a
+profile_dir each stage that runs is also stack-sampled into
+<profile_dir>/<pipeline>.<stage>.folded.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import shutil
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from profiling import Timer
+
+ARTIFACT_DIR = "artifact_cache"
+
+
+class PipelineError(RuntimeError):
+    pass
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ArtifactStore:
+    """
+    objects/<hash> holds pickled artifacts and copies of product files,
+    keys/<stage key>.json maps a stage run to the hashes it produced.
+    """
+
+    def __init__(self, root=ARTIFACT_DIR):
+        self.root = root
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        os.makedirs(os.path.join(root, "keys"), exist_ok=True)
+
+    def _object(self, digest):
+        return os.path.join(self.root, "objects", digest)
+
+    def _write_atomic(self, path, data):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def put(self, value):
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        digest = _sha256(data)
+        if not os.path.exists(self._object(digest)):
+            self._write_atomic(self._object(digest), data)
+        return digest
+
+    def get(self, digest):
+        with open(self._object(digest), "rb") as f:
+            return pickle.load(f)
+
+    def put_file(self, path):
+        digest = file_hash(path)
+        if not os.path.exists(self._object(digest)):
+            shutil.copyfile(path, self._object(digest))
+        return digest
+
+    def restore_file(self, digest, path):
+        if os.path.exists(path) and file_hash(path) == digest:
+            return
+        shutil.copyfile(self._object(digest), path)
+
+    def lookup(self, key):
+        """
+        The record of a finished stage run, or None when any of its objects
+        has gone missing.
+        """
+        path = os.path.join(self.root, "keys", f"{key}.json")
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            record = json.load(f)
+        digests = list(record["outputs"].values()) + list(record["products"].values())
+        if not all(os.path.exists(self._object(d)) for d in digests):
+            return None
+        return record
+
+    def record(self, key, record):
+        path = os.path.join(self.root, "keys", f"{key}.json")
+        self._write_atomic(path, json.dumps(record, indent=2, sort_keys=True).encode())
+
+
+def _code_objects(code):
+    yield code
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            yield from _code_objects(const)
+
+
+def referenced_functions(func):
+    """
+    func and the functions of its own module it references, transitively,
+    by qualified name.
+    """
+    found = {}
+    pending = [func]
+    while pending:
+        f = pending.pop()
+        if f.__qualname__ in found:
+            continue
+        found[f.__qualname__] = f
+        for code in _code_objects(f.__code__):
+            for name in code.co_names:
+                obj = f.__globals__.get(name)
+                if inspect.isfunction(obj) and obj.__module__ == func.__module__:
+                    pending.append(obj)
+    return found
+
+
+def code_version(func, depends=()):
+    """
+    Hash of the source of func, of the functions in depends, and of the
+    same-module helpers each of them references.
+    """
+    functions = {}
+    for f in (func, *depends):
+        functions.update({(g.__module__, name): g for name, g in referenced_functions(f).items()})
+    digest = hashlib.sha256()
+    for (module, name), f in sorted(functions.items()):
+        digest.update(f"{module}.{name}".encode())
+        digest.update(inspect.getsource(f).encode())
+    return digest.hexdigest()
+
+
+class Stage:
+    def __init__(self, name, func, inputs=(), outputs=(), params=None, files=(),
+                 products=(), version=None, depends=()):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.params = dict(params or {})
+        self.files = tuple(files)
+        self.products = tuple(products)
+        self.version = version or code_version(func, depends)
+
+    def key(self, input_hashes):
+        """
+        Cache key from code version, params, input artifacts and files.
+        """
+        missing = [p for p in self.files if not os.path.exists(p)]
+        if missing:
+            raise PipelineError(f"Stage '{self.name}' is missing input files: {missing}")
+        spec = {
+            "stage": self.name,
+            "version": self.version,
+            "params": repr(sorted(self.params.items())),
+            "inputs": [input_hashes[name] for name in self.inputs],
+            "files": {p: file_hash(p) for p in self.files},
+        }
+        return _sha256(json.dumps(spec, sort_keys=True).encode())
+
+
+def _run_stage(name, func, args, params, profile=None):
+    """
+    Run one stage (in a worker process) and return its timing record.
+    """
+    timer = Timer(name)
+    with timer.stage(name, profile=profile):
+        result = func(*args, **params)
+    return result, timer.records[0]
+
+
+class Pipeline:
+    """
+    A DAG of stages run with caching and process-level parallelism.
+    """
+
+    def __init__(self, name, cache_dir=ARTIFACT_DIR, max_workers=None, profile_dir=None):
+        self.name = name
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.profile_dir = profile_dir
+        self.stages = {}
+        self.producers = {}
+
+    def add(self, name, func, inputs=(), outputs=(), **kwargs):
+        if name in self.stages:
+            raise PipelineError(f"Duplicate stage '{name}'")
+        for artifact in outputs:
+            if artifact in self.producers:
+                raise PipelineError(f"Artifact '{artifact}' is produced by two stages")
+            self.producers[artifact] = name
+        self.stages[name] = Stage(name, func, inputs, outputs, **kwargs)
+        return self
+
+    def set_params(self, stage, **params):
+        self.stages[stage].params.update(params)
+        return self
+
+    def _upstream(self, stage):
+        return {self.producers[a] for a in self.stages[stage].inputs}
+
+    def _required(self, targets):
+        """
+        Stages needed to build the target stages, checked for cycles.
+        """
+        for stage in self.stages.values():
+            unknown = [a for a in stage.inputs if a not in self.producers]
+            if unknown:
+                raise PipelineError(f"Stage '{stage.name}' needs unknown artifacts {unknown}")
+
+        required, visiting = set(), set()
+
+        def visit(name):
+            if name in required:
+                return
+            if name in visiting:
+                raise PipelineError(f"Cycle through stage '{name}'")
+            visiting.add(name)
+            for up in self._upstream(name):
+                visit(up)
+            visiting.discard(name)
+            required.add(name)
+
+        for name in targets:
+            visit(name)
+        return required
+
+    def run(self, targets=None, force=()):
+        """
+        Build the given target stages (default: all stages) and return the
+        values of the targets' output artifacts, keyed by name. Stages
+        listed in force rerun even when cached.
+        """
+        store = ArtifactStore(self.cache_dir)
+        keep = {a for t in targets or () for a in self.stages[t].outputs}
+        required = self._required(list(targets or self.stages))
+        # consumers decide whether a cached artifact must be loaded
+        consumers = {name: {s for s in required if name in self._upstream(s)} for name in required}
+
+        hashes, values = {}, {}
+        done, running, keys = set(), {}, {}
+        timer = self.timer = Timer(self.name)
+
+        def value(artifact):
+            if artifact not in values:
+                values[artifact] = store.get(hashes[artifact])
+            return values[artifact]
+
+        def finish(stage, key, result, timing):
+            if len(stage.outputs) == 1:
+                result = (result,)
+            if stage.outputs and (result is None or len(result) != len(stage.outputs)
+                                  or any(r is None for r in result)):
+                raise PipelineError(f"Stage '{stage.name}' produced no result")
+            outputs = {}
+            for artifact, val in zip(stage.outputs, result or ()):
+                outputs[artifact] = store.put(val)
+                values[artifact] = val
+            missing = [p for p in stage.products if not os.path.exists(p)]
+            if missing:
+                raise PipelineError(f"Stage '{stage.name}' did not write {missing}")
+            products = {p: store.put_file(p) for p in stage.products}
+            store.record(key, {"stage": stage.name, "outputs": outputs, "products": products})
+            hashes.update(outputs)
+            timer.records.append(timing)
+
+        workers = self.max_workers or min(len(required), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=max(workers, 1)) as pool:
+            while len(done) < len(required):
+                ready = [
+                    s for s in required
+                    if s not in done and s not in running.values()
+                    and self._upstream(s) <= done
+                ]
+                for name in sorted(ready):
+                    stage = self.stages[name]
+                    key = stage.key(hashes)
+                    record = None if name in force else store.lookup(key)
+                    if record is not None:
+                        hashes.update(record["outputs"])
+                        for path, digest in record["products"].items():
+                            store.restore_file(digest, path)
+                        done.add(name)
+                        timer.skip(name, "cached")
+                        continue
+                    args = [value(a) for a in stage.inputs]
+                    profile = None
+                    if self.profile_dir:
+                        profile = os.path.join(self.profile_dir, f"{self.name}.{name}.folded")
+                    future = pool.submit(_run_stage, name, stage.func, args, stage.params, profile)
+                    running[future] = name
+                    keys[name] = key
+
+                if not running:
+                    # only cache hits this round; schedule their consumers
+                    continue
+
+                finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    result, timing = future.result()
+                    finish(self.stages[name], keys[name], result, timing)
+                    done.add(name)
+
+                # drop loaded artifacts nobody still needs
+                for artifact in list(values):
+                    if artifact not in keep and consumers[self.producers[artifact]] <= done:
+                        values.pop(artifact)
+
+        records = timer.records
+        print(f"\n✓ Pipeline '{self.name}': "
+              f"{sum(r['status'] == 'ran' for r in records)} stages ran, "
+              f"{sum(r['status'] == 'cached' for r in records)} cached")
+        for r in records:
+            print(f"  {r['stage']:<24} {r['status']:<7} {r['seconds']:8.2f}s "
+                  f"{r['cpu_seconds']:8.2f}s cpu")
+        return {artifact: value(artifact) for artifact in sorted(keep)}
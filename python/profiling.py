@@ -0,0 +1,147 @@
+"""
+Stage timers and sampled stack profiles
+=======================================
+Timer records the wall and CPU time of named stages and writes them as a
+JSON timing report. A stage can also be profiled: a background thread
+samples the stacks of the profiled threads every PROFILE_INTERVAL seconds
+and the samples are written in the folded format read by flamegraph.pl,
+speedscope and inferno:
+
+    main (server.py:12);predict (server.py:40);predict_proba (_logistic.py:1350) 17
+
+Sampling only reads frames from outside the profiled code, so the cost is
+one stack walk per interval and nothing at all for unprofiled stages.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+PROFILE_INTERVAL = 0.005
+PROFILE_DIR = "profiles"
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def fold_stack(frame):
+    """
+    Root-first "a;b;c" stack of a frame.
+    """
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler:
+    """
+    Counts the folded stacks of the given threads (default: the calling
+    thread) while running. Threads not listed are sampled too while one of
+    their frames runs `code`, which catches work handed to a thread pool.
+    """
+
+    def __init__(self, threads=None, code=None, interval=PROFILE_INTERVAL):
+        self.threads = {threading.get_ident()} if threads is None else set(threads)
+        self.code = code
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+
+    def _wanted(self, ident, frame):
+        if ident in self.threads:
+            return True
+        if self.code is None:
+            return False
+        while frame is not None:
+            if frame.f_code is self.code:
+                return True
+            frame = frame.f_back
+        return False
+
+    def _sample(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident != own and self._wanted(ident, frame):
+                    self.stacks[fold_stack(frame)] += 1
+            self.samples += 1
+
+    def start(self):
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self
+
+    def write_folded(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+
+class Timer:
+    """
+    Wall and CPU time of named stages, in the order they finished.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.started_at = time.time()
+        self.records = []
+
+    @contextmanager
+    def stage(self, name, profile=None, **sampler_args):
+        """
+        Time the block as stage `name`. With profile set to a path, the
+        block is stack-sampled and the folded samples are written there.
+        """
+        sampler = StackSampler(**sampler_args).start() if profile else None
+        record = {"stage": name, "status": "ran", "started_at": time.time(), "pid": os.getpid()}
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        except BaseException:
+            record["status"] = "failed"
+            raise
+        finally:
+            record["seconds"] = time.perf_counter() - wall
+            record["cpu_seconds"] = time.process_time() - cpu
+            if sampler is not None:
+                sampler.stop()
+                record["profile"] = sampler.write_folded(profile)
+                record["samples"] = sampler.samples
+            self.records.append(record)
+
+    def skip(self, name, status):
+        """
+        Record a stage that did not run (e.g. served from a cache).
+        """
+        self.records.append({"stage": name, "status": status, "started_at": time.time(),
+                             "seconds": 0.0, "cpu_seconds": 0.0})
+
+    def report(self):
+        return {
+            "name": self.name,
+            "started_at": self.started_at,
+            "total_seconds": time.time() - self.started_at,
+            "stages": self.records,
+        }
+
+    def write_report(self, path):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+        return path
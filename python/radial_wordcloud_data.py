@@ -1,108 +1,118 @@
 """
 Generate data for radial word cloud with HC, MCI, and AD groups
-This script creates word frequency data for each condition group
+This script computes per-group word frequencies from the participant
+utterances in data.csv
 """
 
+import os
+import re
+
 import pandas as pd
 import numpy as np
 import json
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer, ENGLISH_STOP_WORDS
+
+DATA_PATH = "../public/data.csv"
+OUTPUT_DIRS = [".", "../public"]
+MAX_WORDS = 40
+
+# JSON key -> DX1 group. WordCloudViz.js draws the "mci" ring as Prob AD and
+# the "ad" ring as MCI, so the keys follow those labels.
+RADIAL_GROUPS = {"hc": "Normal", "mci": "Prob AD", "ad": "MCI"}
+
+# Conversational words with no content (apostrophes are stripped, so
+# contractions appear as e.g. "didnt"). Hesitation fillers such as "uh",
+# "um" and "uhm" are kept on purpose: they differ between groups.
+CONVERSATIONAL_STOPWORDS = {
+    'yeah', 'okay', 'like', 'know', 'just', 'really', 'well', 'got', 'get',
+    'going', 'gonna', 'went', 'said', 'say', 'thing', 'things', 'lot', 'kind',
+    'mean', 'actually', 'thats', 'dont', 'didnt', 'doesnt', 'isnt', 'wasnt',
+    'cant', 'couldnt', 'wouldnt', 'im', 'ive', 'its', 'youre', 'theyre',
+    'theres', 'hes', 'shes', 'weve', 'wed', 'id', 'ill', 'youve', 'lets',
+}
+STOP_WORDS = sorted(ENGLISH_STOP_WORDS | CONVERSATIONAL_STOPWORDS)
+
+
+def normalize_text(text):
+    """
+    Lowercase and keep letters only, so "didn't" and "didnt" count as one word
+    """
+    return re.sub(r"[^a-z\s]", "", str(text).lower())
+
+
+def group_term_counts(texts, labels, groups, vectorizer):
+    """
+    Term counts per group from one sparse document-term matrix.
+
+    Returns the vocabulary and a dense (n_groups, n_terms) count matrix,
+    computed as the sparse product of a group-indicator matrix with the
+    document-term counts.
+    """
+    counts = vectorizer.fit_transform(texts)
+    labels = np.asarray(labels)
+
+    rows, cols = [], []
+    for g, group in enumerate(groups):
+        members = np.flatnonzero(labels == group)
+        rows.extend([g] * len(members))
+        cols.extend(members)
+    indicator = sparse.csr_matrix(
+        (np.ones(len(rows)), (rows, cols)), shape=(len(groups), len(labels))
+    )
+
+    return vectorizer.get_feature_names_out(), (indicator @ counts).toarray()
 
-def create_radial_wordcloud_data():
+
+def create_radial_wordcloud_data(data_path=DATA_PATH, max_words=MAX_WORDS):
     """
-    Create sample data for radial word cloud visualization
-    Each word will have frequencies for HC, MCI, and AD groups
+    Compute word frequencies for the radial word cloud visualization.
+    Each word gets its rate per 1,000 words in each group of RADIAL_GROUPS;
+    the top words by total rate are kept.
     """
-    
-    # Load existing data to get word lists
-    try:
-        normal_df = pd.read_csv('tfidf_scores_normal.csv')
-        impaired_df = pd.read_csv('tfidf_scores_impaired.csv')
-    except:
-        print("Could not load existing CSV files, creating sample data")
-        normal_df = pd.DataFrame({'word': [], 'tfidf_score': []})
-        impaired_df = pd.DataFrame({'word': [], 'tfidf_score': []})
-    
-    # Get top words from both groups
-    all_words = set()
-    if len(normal_df) > 0:
-        all_words.update(normal_df['word'].head(30).tolist())
-    if len(impaired_df) > 0:
-        all_words.update(impaired_df['word'].head(30).tolist())
-    
-    # If no data available, create sample words
-    if len(all_words) == 0:
-        all_words = {
-            'remember', 'back', 'college', 'house', 'school', 'people', 'time', 'family',
-            'work', 'home', 'car', 'friends', 'wedding', 'husband', 'wife', 'children',
-            'mother', 'father', 'years', 'life', 'good', 'little', 'never', 'always',
-            'think', 'know', 'right', 'mean', 'thats', 'didnt', 'dont', 'gonna',
-            'room', 'event', 'married', 'germany', 'west', 'within', 'uhm', 'put'
-        }
-    
-    # Create data structure for radial visualization
+    df = pd.read_csv(data_path)
+    df = df.dropna(subset=['utterance', 'DX1'])
+
+    vectorizer = CountVectorizer(
+        preprocessor=normalize_text,
+        token_pattern=r"(?u)\b[a-z]{2,}\b",
+        stop_words=STOP_WORDS,
+    )
+    keys = list(RADIAL_GROUPS)
+    vocabulary, counts = group_term_counts(
+        df['utterance'], df['DX1'], [RADIAL_GROUPS[k] for k in keys], vectorizer
+    )
+
+    totals = counts.sum(axis=1, keepdims=True)
+    rates = 1000.0 * counts / np.maximum(totals, 1)
+    total_rate = rates.sum(axis=0)
+
+    # highest total first, ties broken alphabetically so output is stable
+    order = np.lexsort((vocabulary, -np.round(total_rate, 4)))[:max_words]
+
     radial_data = []
-    
-    word_list = list(all_words)[:40]  # Limit to 40 words max
-    
-    for word in word_list:
-        # Simulate different frequencies for each group
-        # In real implementation, this would come from actual data analysis
-        
-        # Base frequency (random for simulation)
-        base_freq = np.random.random() * 0.1
-        
-        # Create variations for each group
-        hc_freq = base_freq * (0.8 + np.random.random() * 0.4)  # HC: 0.8-1.2x base
-        mci_freq = base_freq * (0.9 + np.random.random() * 0.6)  # MCI: 0.9-1.5x base  
-        ad_freq = base_freq * (1.0 + np.random.random() * 0.8)  # AD: 1.0-1.8x base
-        
-        # Some words might be more prevalent in certain conditions
-        if word in ['remember', 'forget', 'memory', 'confusion', 'think', 'know']:
-            # Memory-related words more frequent in impaired groups
-            mci_freq *= 1.5
-            ad_freq *= 2.0
-            hc_freq *= 0.7
-        elif word in ['work', 'career', 'active', 'energy', 'college', 'school']:
-            # Activity words more frequent in healthy controls
-            hc_freq *= 1.5
-            mci_freq *= 0.9
-            ad_freq *= 0.6
-        elif word in ['back', 'thats', 'uhm', 'didnt', 'mean']:
-            # Common filler words might be more frequent in MCI
-            mci_freq *= 1.3
-            ad_freq *= 1.1
-            hc_freq *= 0.8
-        elif word in ['house', 'home', 'family', 'wife', 'husband']:
-            # Personal/family words might show different patterns
-            hc_freq *= 1.2
-            mci_freq *= 1.4
-            ad_freq *= 0.9
-        
-        radial_data.append({
-            'word': word,
-            'hc': round(hc_freq, 4),
-            'mci': round(mci_freq, 4), 
-            'ad': round(ad_freq, 4),
-            'total': round(hc_freq + mci_freq + ad_freq, 4)
-        })
-    
-    # Sort by total frequency
-    radial_data.sort(key=lambda x: x['total'], reverse=True)
-    
-    # Save as CSV
-    df = pd.DataFrame(radial_data)
-    df.to_csv('radial_wordcloud_data.csv', index=False)
-    
-    # Also save as JSON for easier JavaScript consumption
-    with open('radial_wordcloud_data.json', 'w') as f:
-        json.dump(radial_data, f, indent=2)
-    
-    print(f"Generated radial word cloud data with {len(radial_data)} words")
-    print("Top 10 words by total frequency:")
+    for i in order:
+        entry = {'word': str(vocabulary[i])}
+        for g, key in enumerate(keys):
+            entry[key] = round(float(rates[g, i]), 4)
+        entry['total'] = round(float(total_rate[i]), 4)
+        radial_data.append(entry)
+
+    for out_dir in OUTPUT_DIRS:
+        # Save as CSV
+        pd.DataFrame(radial_data).to_csv(os.path.join(out_dir, 'radial_wordcloud_data.csv'), index=False)
+
+        # Also save as JSON for easier JavaScript consumption
+        with open(os.path.join(out_dir, 'radial_wordcloud_data.json'), 'w') as f:
+            json.dump(radial_data, f, indent=2)
+
+    print(f"Generated radial word cloud data with {len(radial_data)} words "
+          f"from {len(vocabulary)} word types")
+    print("Top 10 words by total frequency (per 1,000 words):")
     for i, item in enumerate(radial_data[:10]):
-        print(f"{i+1}. {item['word']}: HC={item['hc']:.3f}, MCI={item['mci']:.3f}, AD={item['ad']:.3f}")
-    
+        print(f"{i+1}. {item['word']}: Normal={item['hc']:.3f}, Prob AD={item['mci']:.3f}, MCI={item['ad']:.3f}")
+
     return radial_data
 
 if __name__ == "__main__":
-    create_radial_wordcloud_data()
\ No newline at end of file
+    create_radial_wordcloud_data()
@@ -1,89 +1,621 @@
 # server.py
-from fastapi import FastAPI, Body
+from fastapi import FastAPI, Body, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse
 from pydantic import BaseModel
-from typing import Dict
+from starlette.concurrency import run_in_threadpool
+from starlette.routing import Match
+from typing import Dict, List
+import asyncio
+import contextvars
+import gzip
+import hashlib
+import hmac
 import json
-import pickle
+import os
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
 import numpy as np
 import pandas as pd
 
-model = pickle.load(open("model.pkl", "rb"))
-blob_model = pickle.load(open("linguisticFeatures_vs_ADstatus.pkl", "rb"))
-brain_model = pickle.load(open("tokens_vs_ADstatus_analysis.pkl", "rb"))
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
-with open("metadata.json", "r") as f:
-    meta = json.load(f)
-
-BIOMARKERS = meta["biomarkers"]
-LINGUISTIC = meta["linguistic"]
-FEATURE_MEANS = meta["feature_means"]
-LABEL_MAP = meta["label_map"]
+from cohort_store import CohortStore
+from cohorts import (COHORT_MEMORY_BUDGET_MB, COHORTS_FILE, CohortCache, CohortError,
+                     deep_nbytes, load_cohort_config)
+from contributions import contribution_records, linear_contributions
+from counterfactual import find_counterfactual
+from audit_log import AUDIT_DIR, AuditLog
+from admission import ADMISSION_SLOTS, AdmissionController, Lane, Rejected
+from batching import BATCH_MAX_SIZE, BATCH_WINDOW_MS, MicroBatcher
+from drift import DriftMonitor, feature_stats
+from ensemble import percentile_bands
+from export_arrow import ARROW_DIR, MANIFEST
+from model_registry import (REGISTRY_DIR, ModelBundle, current_version, list_versions,
+                            manifest, previous_version, set_current)
+from patient_index import PatientIndex
+from profiling import PROFILE_DIR, Timer
+from similarity import SIMILARITY_MODES, SimilarityIndex
+from text_features import FEATURE_NOTE, transcript_features
+from wordcloud_layout import LAYOUT_GROUPS, cached_layout, get_layout
 
 GROUPS = ["Normal", "Prob AD", "MCI"]
 
-app = FastAPI()
+# The features must be in the same order as the blob model was trained on
+BLOB_FEATURES = ['AUX(participant)', 'CCONJ(participant)', 'NUM(participant)',
+                 'PROPN(participant)', 'VERB(participant)', 'TTR(participant)',
+                 'MATTR(participant)']
+# brain model output order is [MCI, Normal, Prob AD]
+BRAIN_CLASSES = ["MCI", "Normal", "Prob AD"]
+# Inputs are checked for drift separately per source: values set on the
+# sliders and features extracted from submitted transcripts
+DRIFT_SOURCES = ("sliders", "transcripts")
+
+# Observed cohort, shared by every endpoint that needs participant data
+DATA_PATH = "../public/data.csv"
+COHORT = CohortStore.from_csv(DATA_PATH)
+
+# Numeric features of a patient (identifiers and transcript excluded)
+PATIENT_FEATURES = COHORT.numeric_columns
+PATIENTS = PatientIndex(COHORT, PATIENT_FEATURES, groups=GROUPS)
+
+# Model bundles come from the registry (see model_registry.py), which is
+# polled every MODEL_POLL_SECONDS (0 turns polling off). The last
+# MODEL_HISTORY active versions stay loaded so rolling back is instant.
+REGISTRY = os.environ.get("MODEL_REGISTRY", REGISTRY_DIR)
+MODEL_POLL_SECONDS = float(os.environ.get("MODEL_POLL_SECONDS", 5))
+MODEL_HISTORY = 3
+
+
+def explain_rows(models, name, X):
+    estimator, features = models.explained[name]
+    means = [models.feature_means[f] for f in features]
+    baseline, contributions, logits = linear_contributions(
+        estimator.coef_, estimator.intercept_, X, means
+    )
+    return contribution_records(baseline, contributions, logits, features, GROUPS)
+
+
+def explain_cohort(models, name):
+    _, features = models.explained[name]
+    cohort = models.cohort
+    records = explain_rows(models, name, cohort.values(features).astype(float))
+    for record, regtryid, file, dx in zip(records, cohort.ids, cohort.column("file"), cohort.column("DX1")):
+        record.update({"REGTRYID": int(regtryid), "file": file, "DX1": dx})
+    return records
+
+
+def cohort_predictions(models):
+    """
+    Predictions of all three models for every participant, in one batch per model.
+    """
+    cohort = models.cohort
+    full = models.model.predict_proba(cohort.values(models.biomarkers + models.linguistic).astype(float))
+    blob = models.blob_model.predict_proba(cohort.values(BLOB_FEATURES).astype(float))
+    brain = models.brain_model.predict_proba(cohort.values(["tokens(participant)"]).astype(float))
+
+    return [
+        {
+            "model": {g: float(p) for g, p in zip(GROUPS, full[i])},
+            "blob": {g: float(p) for g, p in zip(GROUPS, blob[i])},
+            "brain": {g: float(p) for g, p in zip(BRAIN_CLASSES, brain[i])},
+        }
+        for i in range(len(cohort))
+    ]
+
+
+class ServingModels:
+    """
+    One model bundle plus everything the endpoints precompute from it for a
+    cohort (default: the served data.csv). It is fully built, and so warm,
+    before it is swapped in, and never changes afterwards.
+    """
+
+    def __init__(self, bundle, cohort=COHORT):
+        self.version = bundle.version
+        self.cohort = cohort
+        self.model = bundle.model
+        self.blob_model = bundle.blob_model
+        self.brain_model = bundle.brain_model
+        self.biomarkers = bundle.meta["biomarkers"]
+        self.linguistic = bundle.meta["linguistic"]
+        self.feature_means = bundle.meta["feature_means"]
+        self.label_map = bundle.meta["label_map"]
+        # Stacked bootstrap coefficients, {name: (coefs, intercepts)} (see ensemble.py)
+        self.ensembles = bundle.ensembles
+
+        # Linear models that can be explained feature by feature
+        self.explained = {
+            "model": (self.model, self.biomarkers + self.linguistic),
+            "blob": (self.blob_model, BLOB_FEATURES),
+        }
+        # Explanations and predictions for every participant in the cohort
+        self.cohort_contributions = {name: explain_cohort(self, name) for name in self.explained}
+        self.patient_predictions = cohort_predictions(self)
+        self.similar_patients = SimilarityIndex(cohort, self.biomarkers + self.linguistic)
+
+        # Incoming inputs against the training distribution (see drift.py);
+        # a new version starts measuring from scratch
+        stats = bundle.meta.get("feature_stats")
+        if stats is None:
+            # bundles from before feature_stats were saved: the cohort they
+            # were trained on stands in
+            features = self.biomarkers + self.linguistic + ["tokens(participant)"]
+            stats = {f: feature_stats(cohort.values([f])[:, 0]) for f in features if f in cohort.columns}
+            stats = {f: s for f, s in stats.items() if s is not None}
+        self.drift = {source: DriftMonitor(stats) for source in DRIFT_SOURCES}
+
+
+# version -> ServingModels of recently active versions, oldest first
+LOADED_MODELS = OrderedDict()
+MODEL_LOCK = threading.Lock()
+# versions that failed to load, so the watcher does not retry them every poll
+FAILED_VERSIONS = set()
+# the models a request started with, so a swap mid-request cannot mix versions
+REQUEST_MODELS = contextvars.ContextVar("request_models", default=None)
+
+
+def load_models(version):
+    """
+    ServingModels for a registry version, reusing a loaded one.
+    """
+    with MODEL_LOCK:
+        if version in LOADED_MODELS:
+            return LOADED_MODELS[version]
+    return ServingModels(ModelBundle.from_registry(version, REGISTRY))
+
+
+def activate_models(models):
+    global ACTIVE_MODELS
+    with MODEL_LOCK:
+        LOADED_MODELS[models.version] = models
+        LOADED_MODELS.move_to_end(models.version)
+        while len(LOADED_MODELS) > MODEL_HISTORY:
+            LOADED_MODELS.popitem(last=False)
+        # one reference assignment, so requests see either version, never a mix
+        ACTIVE_MODELS = models
+
+
+def active_models():
+    return REQUEST_MODELS.get() or ACTIVE_MODELS
+
+
+def initial_models():
+    version = current_version(REGISTRY)
+    if version is None:
+        # no registry yet: serve the loose files next to server.py
+        return ServingModels(ModelBundle.from_directory("."))
+    return load_models(version)
+
+
+def watch_registry(stop):
+    """
+    Load, warm and swap in a new current version whenever CURRENT changes.
+    """
+    while not stop.wait(MODEL_POLL_SECONDS):
+        version = current_version(REGISTRY)
+        if not version or version == ACTIVE_MODELS.version or version in FAILED_VERSIONS:
+            continue
+        try:
+            activate_models(load_models(version))
+            print(f"✓ Serving model version {version}")
+        except Exception as e:
+            FAILED_VERSIONS.add(version)
+            print(f"⚠ Could not load model version {version}: {e}")
+
+
+ACTIVE_MODELS = None
+activate_models(initial_models())
+
+
+class ServedCohort:
+    """
+    A cohort's data, patient index and models, served under /cohorts/{name}.
+    """
+
+    def __init__(self, name, store, models, patients=None):
+        self.name = name
+        self.store = store
+        self.patients = patients or PatientIndex(store, store.numeric_columns, groups=GROUPS)
+        self._models = models
+
+    @property
+    def models(self):
+        return self._models
+
+    def memory_usage(self):
+        seen = set()
+        usage = {
+            "data": deep_nbytes(self.store, seen),
+            "patients": deep_nbytes(self.patients, seen),
+            "models": deep_nbytes(self.models, seen),
+        }
+        usage["total"] = sum(usage.values())
+        return usage
+
+
+class ActiveCohort(ServedCohort):
+    """
+    data.csv with whichever models are active, so it follows hot swaps.
+    """
+
+    def __init__(self, name):
+        super().__init__(name, COHORT, None, PATIENTS)
+
+    @property
+    def models(self):
+        return active_models()
+
+
+def load_cohort(name):
+    spec = COHORT_CONFIG[name]
+    store = CohortStore.from_csv(spec["data"])
+    if "registry" in spec:
+        version = current_version(spec["registry"])
+        if version is None:
+            raise CohortError(f"The registry of cohort '{name}' has no current version")
+        bundle = ModelBundle.from_registry(version, spec["registry"])
+    else:
+        bundle = ModelBundle.from_directory(spec["models"])
+    return ServedCohort(name, store, ServingModels(bundle, store))
+
+
+# Other cohorts (see cohorts.py) load on first use and are evicted, least
+# recently used first, when together they need more than the memory budget.
+# The cohort in data.csv is always loaded, under DEFAULT_COHORT.
+DEFAULT_COHORT = os.environ.get("DEFAULT_COHORT", "slacad")
+COHORT_CONFIG = load_cohort_config(os.environ.get("COHORTS_CONFIG", COHORTS_FILE))
+COHORTS = CohortCache(
+    load_cohort,
+    [name for name in COHORT_CONFIG if name != DEFAULT_COHORT],
+    budget_mb=float(os.environ.get("COHORT_MEMORY_BUDGET_MB", COHORT_MEMORY_BUDGET_MB)),
+)
+ACTIVE_COHORT = ActiveCohort(DEFAULT_COHORT)
+COHORTS.add_resident(DEFAULT_COHORT, ACTIVE_COHORT)
+
+DATA_VERSION = "%x-%x" % (int(os.path.getmtime(DATA_PATH)), os.path.getsize(DATA_PATH))
+# The transcripts are only sent when asked for by name
+DEFAULT_DATA_COLUMNS = [c for c in COHORT.columns if c != "utterance"]
+# Compressed responses by ETag, so repeated queries skip filtering and compression
+DATA_RESPONSE_CACHE = {}
+DATA_RESPONSE_CACHE_SIZE = 256
+
+# Written by wordcloud_analysis.compute_topic_trajectories
+TRAJECTORY_PATH = "topic_trajectories.json"
+# (mtime, parsed trajectories, {encoding: (etag, body)}) of the last read
+TRAJECTORY_CACHE = {}
+
+# Transcript analysis never runs on the event loop. Texts longer than this
+# many characters go to the process pool, shorter ones to the thread pool.
+# Cohort transcripts have a median of about 3,600 characters, a 75th
+# percentile of 4,300 and a maximum of 8,700, so roughly the longer third
+# is tagged in the pool, where it no longer holds the GIL.
+LONG_TRANSCRIPT_CHARS = int(os.environ.get("LONG_TRANSCRIPT_CHARS", 4000))
+ANALYSIS_WORKERS = int(os.environ.get("ANALYSIS_WORKERS", 2))
+ANALYSIS_CACHE_SIZE = 512
+# sha256 of transcript text -> analysis result, least recently used first
+ANALYSIS_CACHE = OrderedDict()
+ANALYSIS_POOL = None
+
+# /predict and /blob_predict requests arriving within BATCH_WINDOW_MS of each
+# other are evaluated as one batch of up to BATCH_MAX_SIZE rows
+BATCHER = MicroBatcher(
+    window_ms=float(os.environ.get("BATCH_WINDOW_MS", BATCH_WINDOW_MS)),
+    max_batch=int(os.environ.get("BATCH_MAX_SIZE", BATCH_MAX_SIZE)),
+)
+
+# Route -> (priority, concurrent requests, queued requests, max queue wait in
+# seconds); lower priority values are served first. Routes not listed here
+# are not admission controlled.
+ADMISSION_LIMITS = {
+    "/predict": (0, BATCHER.max_batch, 64, 0.5),
+    "/blob_predict": (0, BATCHER.max_batch, 64, 0.5),
+    "/cohorts/{name}/predict": (0, BATCHER.max_batch, 64, 0.5),
+    "/cohorts/{name}/blob_predict": (0, BATCHER.max_batch, 64, 0.5),
+    "/brain_predict": (0, 8, 64, 0.5),
+    "/counterfactual": (1, 4, 16, 2.0),
+    "/contributions": (1, 4, 16, 2.0),
+    "/patients/{patient_id}/similar": (1, 4, 16, 2.0),
+    "/analyze_transcript": (2, ANALYSIS_WORKERS, 8, 10.0),
+    "/wordcloud_layout": (2, ANALYSIS_WORKERS, 8, 10.0),
+}
+# Requests are stack-sampled for the routes in PROFILING["routes"] (all
+# routes when empty) at PROFILING["rate"]. A request can force a profile
+# with "X-Profile: <PROFILE_TOKEN>"; without a configured token the header
+# is ignored, so clients cannot bypass the sampling rate.
+PROFILE_HEADER = "X-Profile"
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+# Requests last milliseconds, so they are sampled more densely than stages
+PROFILING = {
+    "rate": float(os.environ.get("PROFILE_RATE", 0.0)),
+    "routes": [],
+    "interval_ms": float(os.environ.get("PROFILE_INTERVAL_MS", 1.0)),
+}
+MAX_PROFILES = 200
+
+ADMISSION = AdmissionController(
+    [Lane(path, *limits) for path, limits in ADMISSION_LIMITS.items()],
+    slots=int(os.environ.get("ADMISSION_SLOTS", ADMISSION_SLOTS)),
+)
+
+# Every served prediction is queued here and written to Parquet segments in
+# the background (see audit_log.py); AUDIT_LOG=0 turns it off
+AUDIT = AuditLog(os.environ.get("AUDIT_DIR", AUDIT_DIR)) if os.environ.get("AUDIT_LOG", "1") != "0" else None
+
+# Bounds on /wordcloud_layout parameters, to keep a cache miss cheap
+MAX_LAYOUT_WORDS = 200
+MAX_LAYOUT_SIZE = 2000
+
+
+def query_columns(columns, dx=None, age_min=None, age_max=None,
+                  moca_min=None, moca_max=None, limit=None):
+    mask = COHORT.mask(
+        equals={"DX1": dx} if dx else None,
+        ranges={"age": (age_min, age_max), "MOCATOTS": (moca_min, moca_max)},
+    )
+    rows = np.flatnonzero(mask)[:limit]
+    return {"rows": len(rows), "columns": {c: json_values(COHORT.column(c, rows)) for c in columns}}
+
+
+def json_values(values):
+    if values.dtype == np.float32:
+        # shortest repr of each float32 value rather than its float64 expansion
+        values = values.astype(str).astype(float)
+        return [None if v != v else v for v in values.tolist()]
+    return values.tolist()
+
+
+def negotiate_encoding(accept_encoding):
+    if brotli is not None and "br" in accept_encoding:
+        return "br"
+    if "gzip" in accept_encoding:
+        return "gzip"
+    return None
+
+
+def encode_body(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6)
+    return body
+
+@asynccontextmanager
+async def lifespan(app):
+    stop = threading.Event()
+    if MODEL_POLL_SECONDS > 0:
+        threading.Thread(target=watch_registry, args=(stop,), daemon=True).start()
+    if AUDIT is not None:
+        AUDIT.start()
+    yield
+    stop.set()
+    if AUDIT is not None:
+        AUDIT.close()
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Model-Version", "Retry-After", "X-Profile-Id", "Server-Timing"],
 )
 
+
+@app.middleware("http")
+async def model_version(request: Request, call_next):
+    # pin the request to the models active when it arrived and report them
+    models = ACTIVE_MODELS
+    token = REQUEST_MODELS.set(models)
+    try:
+        response = await call_next(request)
+    finally:
+        REQUEST_MODELS.reset(token)
+    # cohort routes report the version of their own models
+    response.headers.setdefault("X-Model-Version", models.version)
+    return response
+
+
+def match_route(request):
+    for route in app.router.routes:
+        if route.matches(request.scope)[0] == Match.FULL:
+            return route
+    return None
+
+
+def prune_profiles():
+    """
+    Keep the newest MAX_PROFILES folded profiles.
+    """
+    profiles = sorted(os.listdir(PROFILE_DIR))
+    for name in profiles[:-MAX_PROFILES]:
+        os.remove(os.path.join(PROFILE_DIR, name))
+
+
+def profile_requested(request, route):
+    token = request.headers.get(PROFILE_HEADER)
+    if PROFILE_TOKEN and token is not None and hmac.compare_digest(token, PROFILE_TOKEN):
+        return True
+    if PROFILING["routes"] and route.path not in PROFILING["routes"]:
+        return False
+    return random.random() < PROFILING["rate"]
+
+
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    route = match_route(request)
+    if route is None or not profile_requested(request, route):
+        return await call_next(request)
+
+    # sample the event loop thread, where async handlers and batches run,
+    # and any pool thread running this route's (sync) handler
+    profile_id = "-".join([
+        time.strftime("%Y%m%dT%H%M%S"),
+        route.path.strip("/").replace("/", "_").replace("{", "").replace("}", "") or "root",
+        uuid.uuid4().hex[:8],
+    ])
+    timer = Timer(route.path)
+    with timer.stage(route.path, profile=os.path.join(PROFILE_DIR, profile_id + ".folded"),
+                     code=getattr(route.endpoint, "__code__", None),
+                     interval=PROFILING["interval_ms"] / 1000.0):
+        response = await call_next(request)
+    prune_profiles()
+    response.headers["X-Profile-Id"] = profile_id
+    response.headers["Server-Timing"] = f"app;dur={timer.records[0]['seconds'] * 1000:.1f}"
+    return response
+
+
+@app.middleware("http")
+async def admission(request: Request, call_next):
+    # registered last, so it runs first: rejected requests cost next to nothing
+    route = match_route(request)
+    lane = ADMISSION.lanes.get(route.path) if route is not None else None
+    if lane is None:
+        return await call_next(request)
+
+    try:
+        await ADMISSION.acquire(lane)
+    except Rejected as e:
+        return JSONResponse({"Error": str(e)}, status_code=e.status_code,
+                            headers={"Retry-After": str(e.retry_after)})
+    start = time.perf_counter()
+    try:
+        return await call_next(request)
+    finally:
+        ADMISSION.release(lane, time.perf_counter() - start)
+
+
 class SliderInput(BaseModel):
     sliders: Dict[str, float]
 
-def compute_probabilities(sliders):    
+class ContributionInput(BaseModel):
+    rows: List[Dict[str, float]]
+    model: str = "model"
+
+class TranscriptInput(BaseModel):
+    text: str
+
+class CounterfactualInput(BaseModel):
+    sliders: Dict[str, float]
+    target: str
+    model: str = "blob"
+
+class ModelVersionInput(BaseModel):
+    version: str
+
+def feature_vector(models, sliders):
     row = {}
 
-    for b in BIOMARKERS:
-        row[b] = FEATURE_MEANS[b]
+    for b in models.biomarkers:
+        row[b] = models.feature_means[b]
 
-    for f in LINGUISTIC:
-        row[f] = sliders.get(f, FEATURE_MEANS[f])
+    for f in models.linguistic:
+        row[f] = sliders.get(f, models.feature_means[f])
 
-    x_vec = np.array([row[c] for c in BIOMARKERS + LINGUISTIC]).reshape(1, -1)
+    return np.array([row[c] for c in models.biomarkers + models.linguistic]).reshape(1, -1)
 
-    probs = model.predict_proba(x_vec)[0]
+
+def probability_bands(models, name, x_vec, classes, scale=1.0):
+    """
+    5th/50th/95th percentile of each class probability across the bootstrap
+    ensemble of the given model, evaluated in one batched einsum.
+    """
+    coefs, intercepts = models.ensembles[name]
+    return format_bands(percentile_bands(coefs, intercepts, x_vec)[:, 0, :], classes, scale)
+
+
+def format_bands(bands, classes, scale=1.0):
+    """
+    {class: {lower, median, upper}} from a (3, n_classes) array of bands.
+    """
+    lower, median, upper = np.asarray(bands) * scale
 
     return {
-        "Normal": float(probs[0]),
-        "Prob AD": float(probs[1]),
-        "MCI": float(probs[2]),
+        c: {
+            "lower": float(lower[i]),
+            "median": float(median[i]),
+            "upper": float(upper[i]),
+        }
+        for i, c in enumerate(classes)
     }
 
 
-def correlation_matrix(probabilities):
+def predict_batch(models, name, X):
+    """
+    Probabilities and ensemble bands of the "model" or "blob" model for a
+    stacked batch of rows, one (probabilities, bands) pair per row.
+    """
+    estimator = models.model if name == "model" else models.blob_model
+    coefs, intercepts = models.ensembles[name]
+
+    columns = getattr(estimator, "feature_names_in_", None)
+    probs = estimator.predict_proba(X if columns is None else pd.DataFrame(X, columns=columns))
+    bands = percentile_bands(coefs, intercepts, X)
+    return [(probs[i], bands[:, i, :]) for i in range(len(X))]
+
+
+async def batched_prediction(models, name, x):
+    # one batch per model and version; evaluated on the event loop, which
+    # for a few dozen rows takes well under a millisecond
+    return await BATCHER.submit((models.version, name), x, partial(predict_batch, models, name))
+
+
+def correlation_matrix(models, probabilities, bands):
     matrix = []
-    for b in BIOMARKERS:
+    for b in models.biomarkers:
         for g in GROUPS:
             matrix.append({
                 "biomarker": b,
                 "group": g,
-                "value": probabilities[g]
+                "value": probabilities[g],
+                "lower": bands[g]["lower"],
+                "upper": bands[g]["upper"],
             })
     return matrix
 
-@app.post("/predict")
-def predict(input_data: SliderInput):
-    sliders = input_data.sliders
-    probs = compute_probabilities(sliders)
-    matrix = correlation_matrix(probs)
-    return matrix
+def audit(route, cohort, name, models, inputs, probabilities, started):
+    if AUDIT is not None:
+        AUDIT.log(route, cohort, name, models.version,
+                  {k: float(v) for k, v in inputs.items()},
+                  {k: float(v) for k, v in probabilities.items()},
+                  (time.perf_counter() - started) * 1000.0)
 
 
-@app.post("/blob_predict")
-def get_blob_model(input_data: SliderInput):
+async def slider_prediction(models, sliders, route="/predict", cohort=DEFAULT_COHORT):
+    started = time.perf_counter()
+    models.drift["sliders"].observe(sliders)
+    x = feature_vector(models, sliders)[0]
+    probs, bands = await batched_prediction(models, "model", x)
+    probabilities = {g: float(p) for g, p in zip(GROUPS, probs)}
+    audit(route, cohort, "model", models, dict(zip(models.biomarkers + models.linguistic, x)),
+          probabilities, started)
+    return correlation_matrix(models, probabilities, format_bands(bands, GROUPS))
+
+
+async def blob_prediction(models, input_data, route="/blob_predict", cohort=DEFAULT_COHORT):
+    started = time.perf_counter()
     try:
         # Slider Input is a dictionary of feature names to values (str: float)
         # blob model predicts whether a person has AD based on linguistic features only. Output is 0, 1, or 2 corresponding to Normal, MCI, Prob AD
-        # The features must be in the same order as the model was trained on
-        feature_order = ['AUX(participant)', 'CCONJ(participant)', 'NUM(participant)',
-                        'PROPN(participant)', 'VERB(participant)', 'TTR(participant)',
-                        'MATTR(participant)']
-        features_df = pd.DataFrame([input_data.sliders], columns=feature_order)
+        # checked per request, so one bad row cannot fail a whole batch
+        missing = [f for f in BLOB_FEATURES if f not in input_data.sliders]
+        if missing:
+            return {"Error": f"Missing features: {missing}"}
+        x = np.array([input_data.sliders[f] for f in BLOB_FEATURES], dtype=float)
+        models.drift["sliders"].observe(dict(zip(BLOB_FEATURES, x)))
 
-        model_prediction = blob_model.predict(features_df)[0]
+        probs, bands = await batched_prediction(models, "blob", x)
+        audit(route, cohort, "blob", models, dict(zip(BLOB_FEATURES, x)), dict(zip(GROUPS, probs)), started)
+        model_prediction = int(np.argmax(probs))
         if model_prediction not in [0, 1, 2]:
             return {"Error": "Model prediction out of expected range."}
         
@@ -94,15 +626,30 @@ def get_blob_model(input_data: SliderInput):
         elif model_prediction == 2:
             prediction = "MCI" # Moderate/Severe AD (Moca: < 18)
 
-        output = {"prediction": prediction, "prediction_value": int(model_prediction)}
+        output = {"prediction": prediction, "prediction_value": model_prediction, "bands": format_bands(bands, GROUPS)}
         return output
     except Exception as e:
         return {"Error": str(e)}
 
+
+@app.post("/predict")
+async def predict(input_data: SliderInput):
+    return await slider_prediction(active_models(), input_data.sliders)
+
+
+@app.post("/blob_predict")
+async def get_blob_model(input_data: SliderInput):
+    return await blob_prediction(active_models(), input_data)
+
 @app.post("/brain_predict")
 def get_brain_model(num_tokens: int = Body(..., embed=True)):
+    started = time.perf_counter()
+    models = active_models()
+    models.drift["sliders"].observe({"tokens(participant)": num_tokens})
     try:
-        model_prediction = brain_model.predict_proba([[num_tokens]])[0]
+        model_prediction = models.brain_model.predict_proba([[num_tokens]])[0]
+        audit("/brain_predict", DEFAULT_COHORT, "brain", models, {"tokens(participant)": num_tokens},
+              dict(zip(BRAIN_CLASSES, model_prediction)), started)
 
         # output order is [MCI, Normal, Prob AD]
         normal = model_prediction[1] * 100
@@ -112,7 +659,11 @@ def get_brain_model(num_tokens: int = Body(..., embed=True)):
         output = {
             "Normal": round(normal, 2),
             "Prob AD": round(prob_ad, 2),
-            "MCI": round(mci, 2) 
+            "MCI": round(mci, 2),
+            "bands": {
+                c: {k: round(v, 2) for k, v in band.items()}
+                for c, band in probability_bands(models, "brain", [[num_tokens]], BRAIN_CLASSES, scale=100).items()
+            }
         }
 
         return output
@@ -123,3 +674,535 @@ def get_brain_model(num_tokens: int = Body(..., embed=True)):
         }
 
 
+
+
+@app.post("/counterfactual")
+def get_counterfactual(input_data: CounterfactualInput):
+    models = active_models()
+    try:
+        # "blob" moves the linguistic features of the blob model, "model" moves
+        # the linguistic features of the full model with biomarkers held at
+        # their means (as /predict does)
+        if input_data.model == "blob":
+            estimator, features = models.blob_model, BLOB_FEATURES
+            x = np.array([input_data.sliders.get(f, models.feature_means[f]) for f in features])
+        elif input_data.model == "model":
+            estimator, features = models.model, models.biomarkers + models.linguistic
+            x = feature_vector(models, input_data.sliders)[0]
+        else:
+            return {"Error": f"Unknown model '{input_data.model}'."}
+
+        if input_data.target not in GROUPS:
+            return {"Error": f"Unknown target '{input_data.target}'."}
+
+        observed = COHORT.values(features).astype(float)
+        movable = np.array([f in models.linguistic for f in features])
+        point, distance, found = find_counterfactual(
+            x, estimator.coef_, estimator.intercept_, GROUPS.index(input_data.target),
+            lower=np.nanmin(observed, axis=0), upper=np.nanmax(observed, axis=0),
+            scale=np.nanstd(observed, axis=0, ddof=1), movable=movable,
+        )
+
+        probs = estimator.predict_proba(point.reshape(1, -1))[0]
+        original = GROUPS[int(np.argmax(estimator.predict_proba(x.reshape(1, -1))[0]))]
+
+        return {
+            "found": bool(found),
+            "original_prediction": original,
+            "target": input_data.target,
+            "counterfactual": {f: float(v) for f, v in zip(features, point) if f in models.linguistic},
+            "changes": {f: float(v - x0) for f, v, x0 in zip(features, point, x) if not np.isclose(v, x0)},
+            "distance": distance,
+            "probabilities": {g: float(p) for g, p in zip(GROUPS, probs)},
+        }
+    except Exception as e:
+        return {"Error": str(e)}
+
+
+@app.post("/contributions")
+def get_contributions(input_data: ContributionInput):
+    models = active_models()
+    try:
+        if input_data.model not in models.explained:
+            return {"Error": f"Unknown model '{input_data.model}'."}
+
+        # features left out of a row are explained at their mean (zero contribution)
+        _, features = models.explained[input_data.model]
+        X = np.array([[row.get(f, models.feature_means[f]) for f in features] for row in input_data.rows])
+
+        return explain_rows(models, input_data.model, X.reshape(-1, len(features)))
+    except Exception as e:
+        return {"Error": str(e)}
+
+
+@app.get("/contributions/cohort")
+def get_cohort_contributions(model: str = "model"):
+    models = active_models()
+    if model not in models.cohort_contributions:
+        return {"Error": f"Unknown model '{model}'."}
+    return models.cohort_contributions[model]
+
+
+def patient_list(store):
+    return [
+        {"REGTRYID": int(r), "file": f, "DX1": dx}
+        for r, f, dx in zip(store.ids, store.column("file"), store.column("DX1"))
+    ]
+
+
+def patient_record(cohort, patient_id):
+    store, patients = cohort.store, cohort.patients
+    i = patients.lookup(patient_id)
+    if i is None:
+        return {"Error": f"Unknown patient '{patient_id}'."}
+
+    return {
+        "REGTRYID": int(store.ids[i]),
+        "file": store.text["file"][i],
+        "DX1": store.column("DX1", [i])[0],
+        "features": patients.features_of(i),
+        "predictions": cohort.models.patient_predictions[i],
+        "percentiles": patients.percentiles_of(i),
+    }
+
+
+@app.get("/patients")
+def list_patients():
+    return patient_list(COHORT)
+
+
+@app.get("/patients/{patient_id}")
+def get_patient(patient_id: str):
+    return patient_record(ACTIVE_COHORT, patient_id)
+
+
+@app.get("/patients/{patient_id}/similar")
+def get_similar_patients(patient_id: str, k: int = 5, mode: str = "combined"):
+    i = PATIENTS.lookup(patient_id)
+    if i is None:
+        return {"Error": f"Unknown patient '{patient_id}'."}
+    if mode not in SIMILARITY_MODES:
+        return {"Error": f"Unknown mode '{mode}', expected one of {list(SIMILARITY_MODES)}."}
+    if k < 1:
+        return {"Error": "k must be at least 1."}
+
+    return [
+        {
+            "REGTRYID": int(COHORT.ids[j]),
+            "file": COHORT.text["file"][j],
+            "DX1": COHORT.column("DX1", [j])[0],
+            "score": score,
+            "feature_distance": distance,
+            "text_similarity": text_similarity,
+        }
+        for j, score, distance, text_similarity in active_models().similar_patients.query(i, k, mode)
+    ]
+
+
+@app.get("/data")
+def get_data(request: Request, columns: str = None, dx: str = None,
+             age_min: float = None, age_max: float = None,
+             moca_min: float = None, moca_max: float = None, limit: int = Query(None, ge=0)):
+    # columns and dx are comma-separated lists, e.g. ?columns=DX1,age&dx=MCI,Prob AD
+    selected = columns.split(",") if columns else DEFAULT_DATA_COLUMNS
+    unknown = [c for c in selected if c not in COHORT.columns]
+    if unknown:
+        return {"Error": f"Unknown columns: {unknown}"}
+    groups = dx.split(",") if dx else None
+
+    encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+    # each encoding is its own representation, so it is part of the ETag
+    query = json.dumps([DATA_VERSION, encoding, selected, groups, age_min, age_max, moca_min, moca_max, limit])
+    etag = '"%s"' % hashlib.sha1(query.encode("utf-8")).hexdigest()
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    body = DATA_RESPONSE_CACHE.get(etag)
+    if body is None:
+        result = query_columns(selected, groups, age_min, age_max, moca_min, moca_max, limit)
+        body = encode_body(json.dumps(result).encode("utf-8"), encoding)
+        if len(DATA_RESPONSE_CACHE) >= DATA_RESPONSE_CACHE_SIZE:
+            DATA_RESPONSE_CACHE.pop(next(iter(DATA_RESPONSE_CACHE)))
+        DATA_RESPONSE_CACHE[etag] = body
+
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def arrow_manifest():
+    with open(os.path.join(ARROW_DIR, MANIFEST), "r") as f:
+        return json.load(f)
+
+
+@app.get("/arrow/manifest.json")
+def get_arrow_manifest():
+    # small and changes on every export, so browsers always revalidate it
+    return FileResponse(os.path.join(ARROW_DIR, MANIFEST), media_type="application/json",
+                        headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/arrow/{filename}")
+def get_arrow_file(filename: str):
+    # file names carry a content hash (see export_arrow.py), so they never change
+    if filename not in {entry["file"] for entry in arrow_manifest().values()}:
+        return {"Error": f"Unknown Arrow file '{filename}'."}
+    return FileResponse(os.path.join(ARROW_DIR, filename),
+                        media_type="application/vnd.apache.arrow.file",
+                        headers={"Cache-Control": "public, max-age=31536000, immutable"})
+
+
+@app.get("/wordcloud_layout")
+async def get_wordcloud_layout(group: str = "All", top_k: int = 50, width: int = 800, height: int = 600):
+    if group not in LAYOUT_GROUPS:
+        return {"Error": f"Unknown group '{group}', expected one of {LAYOUT_GROUPS}."}
+    if not (1 <= top_k <= MAX_LAYOUT_WORDS):
+        return {"Error": f"top_k must be between 1 and {MAX_LAYOUT_WORDS}."}
+    if not (50 <= width <= MAX_LAYOUT_SIZE and 50 <= height <= MAX_LAYOUT_SIZE):
+        return {"Error": f"width and height must be between 50 and {MAX_LAYOUT_SIZE}."}
+
+    try:
+        # cache hits are a small file read; only misses queue for the process pool
+        cached = await run_in_threadpool(cached_layout, group, top_k, width, height, data_path=DATA_PATH)
+        if cached is not None:
+            return cached
+        # layout is CPU bound: keep it off the event loop
+        return await asyncio.get_running_loop().run_in_executor(
+            get_analysis_pool(), partial(get_layout, group, top_k, width, height, data_path=DATA_PATH))
+    except Exception as e:
+        return {"Error": str(e)}
+
+
+def load_trajectories():
+    mtime = os.path.getmtime(TRAJECTORY_PATH)
+    if TRAJECTORY_CACHE.get("mtime") != mtime:
+        with open(TRAJECTORY_PATH, "r") as f:
+            trajectories = json.load(f)
+        TRAJECTORY_CACHE.clear()
+        TRAJECTORY_CACHE.update({
+            "mtime": mtime,
+            "data": trajectories,
+            "by_id": {str(p["REGTRYID"]): p for p in trajectories["participants"]},
+            "bodies": {},
+        })
+    return TRAJECTORY_CACHE
+
+
+@app.get("/topic_trajectories")
+def get_topic_trajectories(request: Request, id: str = None):
+    if not os.path.exists(TRAJECTORY_PATH):
+        return {"Error": "No topic trajectories yet, run wordcloud_analysis.py first."}
+
+    cache = load_trajectories()
+    if id is not None:
+        if id not in cache["by_id"]:
+            return {"Error": f"Unknown patient '{id}'."}
+        trajectories = dict(cache["data"], participants=[cache["by_id"][id]])
+    else:
+        trajectories = cache["data"]
+
+    encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+    key = (id, encoding)
+    if key not in cache["bodies"]:
+        body = encode_body(json.dumps(trajectories, separators=(",", ":")).encode("utf-8"), encoding)
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        cache["bodies"][key] = (etag, body)
+    etag, body = cache["bodies"][key]
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def get_analysis_pool():
+    global ANALYSIS_POOL
+    if ANALYSIS_POOL is None:
+        ANALYSIS_POOL = ProcessPoolExecutor(max_workers=ANALYSIS_WORKERS)
+    return ANALYSIS_POOL
+
+
+def predict_from_features(models, features):
+    """
+    All three models on one set of extracted transcript features. Biomarkers
+    are held at their means, as in /predict.
+    """
+    results = {}
+
+    missing = [f for f in models.linguistic if f not in features]
+    if missing:
+        results["model"] = {"Error": f"Missing features: {missing}"}
+    else:
+        x_vec = feature_vector(models, features)
+        probs = models.model.predict_proba(x_vec)[0]
+        results["model"] = {
+            "probabilities": {g: float(p) for g, p in zip(GROUPS, probs)},
+            "bands": probability_bands(models, "model", x_vec, GROUPS),
+        }
+
+    missing = [f for f in BLOB_FEATURES if f not in features]
+    if missing:
+        results["blob"] = {"Error": f"Missing features: {missing}"}
+    else:
+        x_vec = np.array([[features[f] for f in BLOB_FEATURES]])
+        probs = models.blob_model.predict_proba(x_vec)[0]
+        results["blob"] = {
+            "prediction": GROUPS[int(np.argmax(probs))],
+            "probabilities": {g: float(p) for g, p in zip(GROUPS, probs)},
+            "bands": probability_bands(models, "blob", x_vec, GROUPS),
+        }
+
+    x_vec = [[features["tokens(participant)"]]]
+    probs = models.brain_model.predict_proba(x_vec)[0] * 100
+    results["brain"] = {
+        "probabilities": {c: round(float(p), 2) for c, p in zip(BRAIN_CLASSES, probs)},
+        "bands": probability_bands(models, "brain", x_vec, BRAIN_CLASSES, scale=100),
+    }
+
+    return results
+
+
+def record_transcript(models, result, started):
+    features = {k: v for k, v in result["features"].items()
+                if isinstance(v, (int, float)) and not isinstance(v, bool)}
+    models.drift["transcripts"].observe(features)
+    for name, prediction in result["predictions"].items():
+        if "probabilities" in prediction:
+            # brain probabilities are reported as percentages
+            scale = 100.0 if name == "brain" else 1.0
+            probabilities = {c: p / scale for c, p in prediction["probabilities"].items()}
+            audit("/analyze_transcript", DEFAULT_COHORT, name, models, features, probabilities, started)
+
+
+@app.post("/analyze_transcript")
+async def analyze_transcript(input_data: TranscriptInput):
+    started = time.perf_counter()
+    models = active_models()
+    # results depend on the models, so the version is part of the key
+    key = (models.version, hashlib.sha256(input_data.text.encode("utf-8")).hexdigest())
+    if key in ANALYSIS_CACHE:
+        ANALYSIS_CACHE.move_to_end(key)
+        record_transcript(models, ANALYSIS_CACHE[key], started)
+        return dict(ANALYSIS_CACHE[key], cached=True)
+
+    try:
+        extract = partial(transcript_features, input_data.text, pos=True)
+        if len(input_data.text) > LONG_TRANSCRIPT_CHARS:
+            features = await asyncio.get_running_loop().run_in_executor(get_analysis_pool(), extract)
+        else:
+            features = await run_in_threadpool(extract)
+    except RuntimeError:
+        # no POS tagger installed: token statistics only, POS models report
+        # the missing features
+        try:
+            features = await run_in_threadpool(transcript_features, input_data.text)
+        except Exception as e:
+            return {"Error": str(e)}
+    except Exception as e:
+        return {"Error": str(e)}
+
+    result = {"features": features, "predictions": predict_from_features(models, features),
+              "feature_note": FEATURE_NOTE}
+    record_transcript(models, result, started)
+
+    ANALYSIS_CACHE[key] = result
+    if len(ANALYSIS_CACHE) > ANALYSIS_CACHE_SIZE:
+        ANALYSIS_CACHE.popitem(last=False)
+
+    return dict(result, cached=False)
+
+
+def switch_models(version):
+    """
+    Load and warm a registry version, point CURRENT at it (so the watcher
+    agrees) and swap it in.
+    """
+    models = load_models(version)
+    set_current(version, REGISTRY)
+    FAILED_VERSIONS.discard(version)
+    activate_models(models)
+    return models
+
+
+@app.get("/models")
+def get_models():
+    return {
+        "active": ACTIVE_MODELS.version,
+        "current": current_version(REGISTRY),
+        "loaded": list(LOADED_MODELS),
+        "versions": [manifest(v, REGISTRY) for v in list_versions(REGISTRY)],
+    }
+
+
+@app.post("/models/activate")
+def activate_version(input_data: ModelVersionInput):
+    if input_data.version not in list_versions(REGISTRY):
+        return {"Error": f"Unknown model version '{input_data.version}'."}
+    try:
+        return {"active": switch_models(input_data.version).version}
+    except Exception as e:
+        return {"Error": str(e)}
+
+
+@app.post("/models/rollback")
+def rollback_version():
+    active = ACTIVE_MODELS.version
+    if active not in list_versions(REGISTRY):
+        return {"Error": f"Active models '{active}' are not from the registry."}
+    previous = previous_version(active, REGISTRY)
+    if previous is None:
+        return {"Error": f"No version older than '{active}'."}
+    try:
+        return {"active": switch_models(previous).version, "rolled_back_from": active}
+    except Exception as e:
+        return {"Error": str(e)}
+
+
+@asynccontextmanager
+async def cohort_scope(name):
+    """
+    Hold a cohort for one request, loading it off the event loop if need be.
+    """
+    cohort = await run_in_threadpool(COHORTS.acquire, name)
+    try:
+        yield cohort
+    finally:
+        COHORTS.release(name)
+
+
+@app.get("/cohorts")
+def get_cohorts():
+    return COHORTS.stats()
+
+
+@app.post("/cohorts/{name}/predict")
+async def predict_cohort(name: str, input_data: SliderInput, response: Response):
+    try:
+        async with cohort_scope(name) as cohort:
+            models = cohort.models
+            response.headers["X-Model-Version"] = models.version
+            return await slider_prediction(models, input_data.sliders, "/cohorts/{name}/predict", name)
+    except Exception as e:
+        return {"Error": str(e)}
+
+
+@app.post("/cohorts/{name}/blob_predict")
+async def blob_predict_cohort(name: str, input_data: SliderInput, response: Response):
+    try:
+        async with cohort_scope(name) as cohort:
+            models = cohort.models
+            response.headers["X-Model-Version"] = models.version
+            return await blob_prediction(models, input_data, "/cohorts/{name}/blob_predict", name)
+    except Exception as e:
+        return {"Error": str(e)}
+
+
+@app.get("/cohorts/{name}/patients")
+async def list_cohort_patients(name: str):
+    try:
+        async with cohort_scope(name) as cohort:
+            return patient_list(cohort.store)
+    except Exception as e:
+        return {"Error": str(e)}
+
+
+@app.get("/cohorts/{name}/patients/{patient_id}")
+async def get_cohort_patient(name: str, patient_id: str, response: Response):
+    try:
+        async with cohort_scope(name) as cohort:
+            models = cohort.models
+            response.headers["X-Model-Version"] = models.version
+            return patient_record(cohort, patient_id)
+    except Exception as e:
+        return {"Error": str(e)}
+
+
+def drift_report(models):
+    return {"model_version": models.version,
+            **{source: monitor.report() for source, monitor in models.drift.items()}}
+
+
+@app.get("/drift")
+def get_drift():
+    return drift_report(active_models())
+
+
+@app.post("/drift/reset")
+def reset_drift():
+    models = active_models()
+    for monitor in models.drift.values():
+        monitor.reset()
+    return drift_report(models)
+
+
+@app.get("/cohorts/{name}/drift")
+async def get_cohort_drift(name: str):
+    try:
+        async with cohort_scope(name) as cohort:
+            return drift_report(cohort.models)
+    except Exception as e:
+        return {"Error": str(e)}
+
+
+@app.get("/batching/stats")
+def get_batching_stats():
+    return BATCHER.stats()
+
+
+@app.get("/audit/stats")
+def get_audit_stats():
+    if AUDIT is None:
+        return {"Error": "The audit log is turned off (AUDIT_LOG=0)."}
+    return AUDIT.stats()
+
+
+@app.get("/admission/stats")
+def get_admission_stats():
+    return ADMISSION.stats()
+
+
+class ProfilingInput(BaseModel):
+    rate: float
+    routes: List[str] = []
+    interval_ms: float = 1.0
+
+
+def profile_ids():
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    return sorted((n[:-len(".folded")] for n in os.listdir(PROFILE_DIR) if n.endswith(".folded")),
+                  reverse=True)
+
+
+@app.get("/profiling")
+def get_profiling():
+    return {**PROFILING, "header": PROFILE_HEADER, "header_enabled": bool(PROFILE_TOKEN),
+            "profiles": profile_ids()}
+
+
+@app.post("/profiling")
+def set_profiling(input_data: ProfilingInput):
+    if not (0.0 <= input_data.rate <= 1.0):
+        return {"Error": "rate must be between 0 and 1."}
+    if not (0.1 <= input_data.interval_ms <= 100.0):
+        return {"Error": "interval_ms must be between 0.1 and 100."}
+    known = {getattr(r, "path", None) for r in app.router.routes}
+    unknown = [r for r in input_data.routes if r not in known]
+    if unknown:
+        return {"Error": f"Unknown routes: {unknown}"}
+    PROFILING.update(rate=input_data.rate, routes=list(input_data.routes),
+                     interval_ms=input_data.interval_ms)
+    return get_profiling()
+
+
+@app.get("/profiling/{profile_id}")
+def get_profile(profile_id: str):
+    # only names we listed, never a path built from the request
+    if profile_id not in profile_ids():
+        return {"Error": f"Unknown profile '{profile_id}'."}
+    return FileResponse(os.path.join(PROFILE_DIR, profile_id + ".folded"), media_type="text/plain",
+                        filename=profile_id + ".folded")
@@ -0,0 +1,99 @@
+"""
+Similar-patient search
+======================
+Two indexes built once over the cohort store:
+
+- standardized BIOMARKERS + LINGUISTIC vectors in a KD-tree (a ball tree
+  for wide feature sets), so a k-nearest query costs O(log n) rather than
+  a full pairwise scan;
+- L2-normalized TF-IDF vectors of each transcript, where cosine similarity
+  to one patient is a single sparse matrix-vector product.
+
+"combined" queries re-rank the union of both candidate lists.
+"""
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.neighbors import BallTree, KDTree
+
+from radial_wordcloud_data import STOP_WORDS, normalize_text
+
+# KD-trees degrade in high dimensions, ball trees much less
+KD_TREE_MAX_DIMS = 20
+# candidates taken from each index per requested neighbour in combined mode
+CANDIDATE_FACTOR = 4
+SIMILARITY_MODES = ("features", "text", "combined")
+
+
+class SimilarityIndex:
+    """
+    Nearest neighbours of a cohort row by features, transcript, or both.
+    """
+
+    def __init__(self, store, features, text_weight=0.5):
+        self.store = store
+        self.text_weight = text_weight
+
+        X = store.values(features).astype(float)
+        mean = np.nanmean(X, axis=0)
+        std = np.nanstd(X, axis=0)
+        std[std == 0] = 1.0
+        # missing values sit at the mean, i.e. contribute no distance
+        self.vectors = np.nan_to_num((X - mean) / std)
+        tree = KDTree if self.vectors.shape[1] <= KD_TREE_MAX_DIMS else BallTree
+        self.tree = tree(self.vectors)
+
+        texts = [store.transcript(i) or "" for i in range(len(store))]
+        vectorizer = TfidfVectorizer(
+            preprocessor=normalize_text,
+            token_pattern=r"(?u)\b[a-z]{2,}\b",
+            stop_words=STOP_WORDS,
+            sublinear_tf=True,
+        )
+        # TfidfVectorizer rows are already L2-normalized
+        self.tfidf = vectorizer.fit_transform(texts).tocsr()
+
+    def feature_neighbours(self, i, k):
+        k = min(k + 1, len(self.vectors))
+        distances, rows = self.tree.query(self.vectors[i:i + 1], k=k)
+        return rows[0], distances[0]
+
+    def text_scores(self, i):
+        return (self.tfidf @ self.tfidf[i].T).toarray().ravel()
+
+    def query(self, i, k=5, mode="combined"):
+        """
+        The k rows most similar to row i (itself excluded), best first, as
+        (row, score, feature_distance, text_similarity) tuples.
+        """
+        n_candidates = k if mode != "combined" else k * CANDIDATE_FACTOR
+        text = self.text_scores(i) if mode != "features" else None
+
+        candidates = set()
+        if mode != "text":
+            rows, _ = self.feature_neighbours(i, n_candidates)
+            candidates.update(rows.tolist())
+        if mode != "features":
+            top = min(n_candidates + 1, len(text))
+            candidates.update(np.argpartition(-text, top - 1)[:top].tolist())
+        candidates.discard(i)
+        rows = np.array(sorted(candidates), dtype=int)
+
+        distances = np.linalg.norm(self.vectors[rows] - self.vectors[i], axis=1)
+        # distance per feature, mapped to (0, 1]
+        feature_sim = 1.0 / (1.0 + distances / np.sqrt(self.vectors.shape[1]))
+        text_sim = text[rows] if text is not None else np.full(len(rows), np.nan)
+
+        if mode == "features":
+            scores = feature_sim
+        elif mode == "text":
+            scores = text_sim
+        else:
+            scores = self.text_weight * text_sim + (1 - self.text_weight) * feature_sim
+
+        order = np.argsort(-scores, kind="stable")[:k]
+        return [
+            (int(rows[j]), float(scores[j]), float(distances[j]),
+             None if np.isnan(text_sim[j]) else float(text_sim[j]))
+            for j in order
+        ]
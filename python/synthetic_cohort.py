@@ -0,0 +1,185 @@
+"""
+Synthetic SLaCAD cohorts
+========================
+Generates cohorts of any size in the exact schema of public/data.csv and
+the Excel inputs read by feature_analysis.py and wordcloud_analysis.py, for
+benchmarking the pipelines past the real 91 participants.
+
+Every synthetic participant has a real "parent" row. Numeric values are the
+parent's values with Gaussian jitter (so correlations with DX1 and between
+features survive), categorical and date values are copied, and transcripts
+are sampled from the word distribution of the parent's diagnosis group,
+with a Zipf-distributed stream of novel words so the vocabulary keeps
+growing with the cohort the way a real corpus does.
+"""
+
+import argparse
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+DATA_PATH = "../public/data.csv"
+# Excel inputs by name, as the analysis scripts read them, and where to
+# look for them
+EXCEL_INPUTS = {
+    "demographic": "demographic(1).xlsx",
+    "full_data": "fullData(1).xlsx",
+    "linguistic": "linguistic_outcomes.xlsx",
+    "utterance": "utterance_data.xlsx",
+    "liwc": "LIWC-22 Results - participant - LIWC Analysis(1).xlsx",
+}
+TEMPLATE_DIRS = ["..", "../data"]
+
+FIRST_ID = 100000
+JITTER = 0.1            # numeric noise, in units of each column's std
+LENGTH_SIGMA = 0.2      # log-normal spread of transcript length
+NOVEL_WORD_RATE = 0.02  # share of words drawn from the open vocabulary
+NOVEL_WORD_ZIPF = 1.3
+TEXT_MIN_CHARS = 200    # string columns longer than this on average are transcripts
+WORD = re.compile(r"[A-Za-z']+|[.,?!]")
+
+
+def load_templates(data_path=DATA_PATH, template_dirs=TEMPLATE_DIRS):
+    """
+    The real data.csv and whichever Excel inputs can be found.
+    """
+    templates = {"data": pd.read_csv(data_path)}
+    for name, filename in EXCEL_INPUTS.items():
+        for directory in template_dirs:
+            path = os.path.join(directory, filename)
+            if os.path.exists(path):
+                templates[name] = pd.read_excel(path)
+                break
+    return templates
+
+
+class TextSampler:
+    """
+    Per-group unigram model of the real transcripts plus an open vocabulary
+    of synthetic words.
+    """
+
+    def __init__(self, texts, groups, rng):
+        self.rng = rng
+        self.models = {}
+        for group in pd.unique(groups):
+            words = [w for t in texts[groups == group] for w in WORD.findall(str(t))]
+            vocab, counts = np.unique(words, return_counts=True)
+            self.models[group] = (vocab, counts / counts.sum())
+
+    def sample(self, group, n_words):
+        vocab, p = self.models[group]
+        words = vocab[self.rng.choice(len(vocab), size=n_words, p=p)].astype(object)
+        novel = self.rng.random(n_words) < NOVEL_WORD_RATE
+        ranks = self.rng.zipf(NOVEL_WORD_ZIPF, size=novel.sum())
+        words[novel] = [f"zq{np.base_repr(r, 36).lower()}" for r in ranks]
+        return " ".join(words)
+
+
+def _key_column(frame):
+    for col in ("REGTRYID", "file"):
+        if col in frame.columns:
+            return col
+    return None
+
+
+def _is_text(series):
+    if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_datetime64_any_dtype(series):
+        return False
+    return series.dropna().astype(str).str.len().mean() > TEXT_MIN_CHARS
+
+
+def synthesize_frame(template, parents, ids, files, transcripts, rng):
+    """
+    One synthetic table with template's columns and dtypes: row i copies the
+    template row of parents[i] (by REGTRYID or file, else a random row),
+    with jittered numbers and new ids, file names and transcripts.
+    """
+    key = _key_column(template)
+    if key is not None:
+        position = {k: i for i, k in enumerate(template[key])}
+        rows = np.array([
+            position.get(k, rng.integers(len(template))) for k in parents[key]
+        ])
+    else:
+        rows = rng.integers(len(template), size=len(ids))
+
+    out = {}
+    for col in template.columns:
+        source = template[col].iloc[rows].reset_index(drop=True)
+        if col == "REGTRYID":
+            out[col] = ids
+        elif col == "file":
+            out[col] = files
+        elif _is_text(template[col]):
+            out[col] = transcripts
+        elif pd.api.types.is_bool_dtype(source) or not pd.api.types.is_numeric_dtype(source):
+            out[col] = source
+        else:
+            values = source.to_numpy(dtype=float)
+            std = np.nanstd(template[col].to_numpy(dtype=float))
+            values = values + rng.normal(0.0, JITTER * (std if std > 0 else 0.0), len(values))
+            values = np.clip(values, template[col].min(), template[col].max())
+            if pd.api.types.is_integer_dtype(template[col]):
+                out[col] = np.round(values).astype(template[col].dtype)
+            else:
+                out[col] = values.astype(template[col].dtype)
+    return pd.DataFrame(out, columns=template.columns)
+
+
+def generate_cohort(n, templates=None, seed=0):
+    """
+    n synthetic participants as {"data": data.csv frame, <Excel input name>:
+    frame, ...}, all sharing REGTRYIDs, file names and transcripts.
+    """
+    templates = templates or load_templates()
+    rng = np.random.default_rng(seed)
+    base = templates["data"].dropna(subset=["utterance", "DX1"]).reset_index(drop=True)
+
+    parents = base.iloc[rng.integers(len(base), size=n)].reset_index(drop=True)
+    ids = np.arange(FIRST_ID, FIRST_ID + n, dtype=np.int64)
+    files = [re.sub(r"^\d+", str(i), f) for i, f in zip(ids, parents["file"])]
+
+    sampler = TextSampler(base["utterance"].to_numpy(), base["DX1"].to_numpy(), rng)
+    lengths = parents["utterance"].str.split().str.len().to_numpy()
+    lengths = np.maximum(1, np.round(lengths * rng.lognormal(0.0, LENGTH_SIGMA, n))).astype(int)
+    transcripts = [sampler.sample(g, k) for g, k in zip(parents["DX1"], lengths)]
+
+    return {
+        name: synthesize_frame(template, parents, ids, files, transcripts, rng)
+        for name, template in templates.items()
+    }
+
+
+def write_cohort(cohort, root, excel=True):
+    """
+    Lay the cohort out like the repository (root/public/data.csv and the
+    Excel inputs in root), plus an empty root/python to run the analysis
+    scripts from. Writing Excel is slow for large cohorts; excel=False
+    skips it.
+    """
+    os.makedirs(os.path.join(root, "public"), exist_ok=True)
+    os.makedirs(os.path.join(root, "python"), exist_ok=True)
+    cohort["data"].to_csv(os.path.join(root, "public", "data.csv"), index=False)
+    if excel:
+        for name, filename in EXCEL_INPUTS.items():
+            if name in cohort:
+                cohort[name].to_excel(os.path.join(root, filename), index=False)
+    return root
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic SLaCAD cohort")
+    parser.add_argument("n", type=int, help="number of participants")
+    parser.add_argument("output", help="directory to write the cohort to")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-excel", action="store_true", help="only write data.csv")
+    args = parser.parse_args()
+
+    cohort = generate_cohort(args.n, seed=args.seed)
+    write_cohort(cohort, args.output, excel=not args.no_excel)
+    print(f"✓ Wrote {args.n} synthetic participants to {args.output}")
+    for name, frame in cohort.items():
+        print(f"  {name}: {frame.shape}")
@@ -0,0 +1,13 @@
+import os
+import sys
+
+import pytest
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PYTHON_DIR)
+
+
+@pytest.fixture(autouse=True)
+def python_dir(monkeypatch):
+    # the scripts read ../public/data.csv and their bundle files relative to python/
+    monkeypatch.chdir(PYTHON_DIR)
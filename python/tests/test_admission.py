@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionController, Lane, Rejected
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_capped_lane_does_not_block_an_idle_one():
+    async def scenario():
+        busy = Lane("busy", priority=0, concurrency=1, max_wait=0.2)
+        idle = Lane("idle", priority=0, concurrency=4, max_wait=0.2)
+        admission = AdmissionController([busy, idle], slots=64)
+
+        await admission.acquire(busy)
+        waiter = asyncio.create_task(admission.acquire(busy))
+        await settle()
+        assert busy.waiting == 1
+
+        # the queued busy request waits on its own cap, not on a free slot
+        await asyncio.wait_for(admission.acquire(idle), 0.05)
+        assert idle.active == 1
+        waiter.cancel()
+
+    run(scenario())
+
+
+def test_slots_go_to_higher_priority_first():
+    async def scenario():
+        low = Lane("low", priority=1, max_wait=1.0)
+        high = Lane("high", priority=0, max_wait=1.0)
+        admission = AdmissionController([low, high], slots=1)
+        order = []
+
+        async def request(lane):
+            await admission.acquire(lane)
+            order.append(lane.name)
+
+        await admission.acquire(low)
+        tasks = [asyncio.create_task(request(low)), asyncio.create_task(request(high))]
+        await settle()
+        admission.release(low, 0.01)
+        await settle()
+        admission.release(high, 0.01)
+        await asyncio.gather(*tasks)
+        assert order == ["high", "low"]
+
+    run(scenario())
+
+
+def test_full_queue_is_rejected_with_429():
+    async def scenario():
+        lane = Lane("lane", concurrency=1, queue_size=1, max_wait=1.0)
+        admission = AdmissionController([lane])
+        await admission.acquire(lane)
+        waiter = asyncio.create_task(admission.acquire(lane))
+        await settle()
+
+        with pytest.raises(Rejected) as rejected:
+            await admission.acquire(lane)
+        assert rejected.value.status_code == 429
+        assert lane.rejected[429] == 1
+        waiter.cancel()
+
+    run(scenario())
+
+
+def test_queue_timeout_is_rejected_with_503_and_retry_after():
+    async def scenario():
+        lane = Lane("lane", concurrency=1, max_wait=0.05)
+        admission = AdmissionController([lane])
+        await admission.acquire(lane)
+
+        with pytest.raises(Rejected) as rejected:
+            await admission.acquire(lane)
+        assert rejected.value.status_code == 503
+        assert rejected.value.retry_after >= 1
+        assert lane.waiting == 0
+
+    run(scenario())
+
+
+def test_cancelled_waiter_gives_up_its_place():
+    async def scenario():
+        lane = Lane("lane", concurrency=1, max_wait=1.0)
+        admission = AdmissionController([lane])
+        await admission.acquire(lane)
+        waiter = asyncio.create_task(admission.acquire(lane))
+        await settle()
+
+        waiter.cancel()
+        await settle()
+        assert lane.waiting == 0
+        admission.release(lane, 0.01)
+        assert admission.in_use == 0 and lane.active == 0
+
+        await asyncio.wait_for(admission.acquire(lane), 0.05)
+        assert lane.active == 1
+
+    run(scenario())
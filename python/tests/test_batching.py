@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from batching import Histogram, MicroBatcher
+
+
+def test_concurrent_rows_are_batched_and_scattered_back_in_order():
+    calls = []
+
+    def evaluate(X):
+        calls.append(X.shape)
+        return X.sum(axis=1)
+
+    async def scenario():
+        batcher = MicroBatcher(window_ms=20, max_batch=32)
+        rows = [[i, 10 * i] for i in range(5)]
+        return batcher, await asyncio.gather(*(batcher.submit("m", r, evaluate) for r in rows))
+
+    batcher, results = asyncio.run(scenario())
+    assert calls == [(5, 2)]
+    assert [float(r) for r in results] == [11 * i for i in range(5)]
+    assert batcher.stats()["batch_size"]["count"] == 1
+
+
+def test_full_batch_flushes_without_waiting_for_the_window():
+    async def scenario():
+        batcher = MicroBatcher(window_ms=10000, max_batch=4)
+        rows = [[i] for i in range(4)]
+        return await asyncio.wait_for(
+            asyncio.gather(*(batcher.submit("m", r, lambda X: X[:, 0] * 2) for r in rows)), 1.0)
+
+    assert [float(r) for r in asyncio.run(scenario())] == [0, 2, 4, 6]
+
+
+def test_keys_are_batched_separately():
+    async def scenario():
+        batcher = MicroBatcher(window_ms=20)
+        a = batcher.submit("a", [1], lambda X: ["a"] * len(X))
+        b = batcher.submit("b", [2], lambda X: ["b"] * len(X))
+        return batcher, await asyncio.gather(a, b)
+
+    batcher, results = asyncio.run(scenario())
+    assert results == ["a", "b"]
+    assert batcher.batches == 2
+
+
+def test_failed_evaluation_reaches_every_caller():
+    def evaluate(X):
+        raise ValueError("bad batch")
+
+    async def scenario():
+        batcher = MicroBatcher(window_ms=20)
+        return await asyncio.gather(*(batcher.submit("m", [i], evaluate) for i in range(3)),
+                                    return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+def test_histogram_buckets_are_upper_bounds():
+    histogram = Histogram([1, 2])
+    histogram.observe([0.5, 1, 1.5, 3])
+    snapshot = histogram.snapshot()
+    assert snapshot["buckets"] == {"<=1": 2, "<=2": 1, ">2": 1}
+    assert snapshot["mean"] == pytest.approx(1.5)
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from cohorts import CohortCache, CohortError, deep_nbytes
+
+MB = 2 ** 20
+
+
+class FakeCohort:
+    def __init__(self, name, mb):
+        self.name = name
+        self.mb = mb
+
+    def memory_usage(self):
+        return {"total": self.mb * MB}
+
+
+def cache(budget_mb=2.5, sizes=None):
+    sizes = sizes or {"a": 1, "b": 1, "c": 1}
+    loads = []
+
+    def load(name):
+        loads.append(name)
+        return FakeCohort(name, sizes[name])
+
+    return CohortCache(load, sizes, budget_mb=budget_mb), loads
+
+
+def test_least_recently_used_idle_cohort_is_evicted_over_budget():
+    cohorts, loads = cache()
+    for name in ("a", "b"):
+        cohorts.acquire(name)
+        cohorts.release(name)
+    cohorts.acquire("a")
+    cohorts.release("a")
+
+    cohorts.acquire("c")
+    cohorts.release("c")
+    assert list(cohorts.loaded) == ["a", "c"]
+    assert cohorts.stats()["cohorts"]["b"]["evictions"] == 1
+    assert cohorts.stats()["used_mb"] <= 2.5
+
+    cohorts.acquire("b")
+    assert loads == ["a", "b", "c", "b"]
+    assert cohorts.stats()["cohorts"]["a"]["hits"] == 1
+
+
+def test_cohorts_in_use_are_not_evicted():
+    cohorts, _ = cache(budget_mb=1.5)
+    cohorts.acquire("a")
+    cohorts.acquire("b")
+    assert set(cohorts.loaded) == {"a", "b"}
+
+    cohorts.release("a")
+    assert list(cohorts.loaded) == ["b"]
+
+
+def test_resident_cohorts_are_never_evicted_or_loaded():
+    cohorts, loads = cache(budget_mb=1)
+    resident = FakeCohort("main", 5)
+    cohorts.add_resident("main", resident)
+    assert cohorts.acquire("main") is resident
+    cohorts.release("main")
+    assert "main" in cohorts and loads == []
+
+
+def test_unknown_cohort_is_rejected():
+    cohorts, _ = cache()
+    with pytest.raises(CohortError):
+        cohorts.acquire("missing")
+
+
+def test_deep_nbytes_counts_shared_arrays_once():
+    array = np.zeros(1000)
+    single = deep_nbytes({"x": array})
+    shared = deep_nbytes({"x": array, "y": array, "view": array[:10]})
+    assert array.nbytes <= single
+    assert shared - single < array.nbytes
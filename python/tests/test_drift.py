@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from drift import (DRIFT_MIN_COUNT, PSI_DRIFT, DriftMonitor, RunningStats, feature_stats, psi,
+                   update_feature_stats)
+
+rng = np.random.default_rng(0)
+TRAINING = rng.normal(10.0, 2.0, 2000)
+
+
+def monitor_after(values):
+    monitor = DriftMonitor({"x": feature_stats(TRAINING)})
+    for v in values:
+        monitor.observe({"x": v})
+    return monitor.report()["features"]["x"]
+
+
+def test_running_stats_match_numpy():
+    values = rng.normal(5.0, 3.0, 500)
+    edges = feature_stats(values)["edges"]
+    stats = RunningStats(len(edges) + 1)
+    for v in values:
+        stats.update(v, edges)
+
+    assert stats.mean == pytest.approx(values.mean())
+    assert stats.std == pytest.approx(values.std(ddof=1))
+    assert stats.quantile(0.5, edges) == pytest.approx(np.median(values), abs=0.2)
+
+
+def test_psi_is_zero_for_identical_shares():
+    shares = [0.1] * 10
+    assert psi(shares, shares) == 0.0
+
+
+def test_too_few_observations_are_not_scored():
+    report = monitor_after(TRAINING[:DRIFT_MIN_COUNT - 1])
+    assert report["status"] == "insufficient data"
+    assert "psi" not in report
+
+
+def test_training_distribution_is_stable():
+    report = monitor_after(rng.normal(10.0, 2.0, 1000))
+    assert report["status"] == "stable"
+
+
+def test_shifted_distribution_is_flagged():
+    report = monitor_after(rng.normal(13.0, 2.0, 1000))
+    assert report["psi"] >= PSI_DRIFT
+    assert report["status"] == "drift"
+    assert report["mean_shift"] == pytest.approx(1.5, abs=0.2)
+
+
+def test_update_feature_stats_matches_a_full_recompute():
+    old, new = TRAINING[:1500], TRAINING[1500:]
+    merged = update_feature_stats(feature_stats(old), new)
+    full = feature_stats(TRAINING)
+
+    assert merged["count"] == full["count"]
+    assert merged["mean"] == pytest.approx(full["mean"])
+    assert merged["std"] == pytest.approx(full["std"])
+    assert sum(merged["fractions"]) == pytest.approx(1.0)
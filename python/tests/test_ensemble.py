@@ -0,0 +1,18 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ensemble import MODEL_SPECS, model_data, percentile_bands
+from model_registry import BUNDLE_MODELS, ModelBundle
+
+
+@pytest.mark.parametrize("name", list(MODEL_SPECS))
+def test_served_probability_inside_its_band(name):
+    bundle = ModelBundle.from_directory(".")
+    spec = MODEL_SPECS[name]
+    X = model_data(pd.read_csv("../public/data.csv"), spec)[spec["features"]].values.astype(float)
+
+    probs = getattr(bundle, BUNDLE_MODELS[name]).predict_proba(X)
+    lower, _, upper = percentile_bands(*bundle.ensembles[name], X)
+
+    assert np.all((probs >= lower - 1e-9) & (probs <= upper + 1e-9))
@@ -0,0 +1,66 @@
+import json
+import pickle
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from ensemble import MODEL_SPECS, model_data
+from incremental import evaluate, held_out_check, in_holdout, iteration_cap, warm_fit
+from model_registry import BUNDLE_FILES, LEGACY_INPUT_SCALERS, ModelBundle
+
+
+def brain_split():
+    spec = MODEL_SPECS["brain"]
+    data = model_data(pd.read_csv("../public/data.csv"), spec)
+    holdout = in_holdout(data["REGTRYID"])
+    return spec, data[~holdout], data[holdout]
+
+
+def brain_candidate(served, train, spec):
+    X = train[spec["features"]].values
+    return warm_fit(served, train, spec, (X.mean(axis=0), X.std(axis=0)))
+
+
+def test_worse_brain_candidate_is_rejected():
+    spec, train, test = brain_split()
+    served = ModelBundle.from_directory(".").brain_model
+    candidate = brain_candidate(served, train, spec)
+    # same fit, but predicting the reverse of what the tokens say
+    candidate.coef_ = -candidate.coef_
+
+    passed, before, after = held_out_check(served, candidate, test, spec)
+    assert not passed
+    assert after["log_loss"] > before["log_loss"]
+
+
+def test_unconverged_candidate_is_rejected():
+    spec, train, test = brain_split()
+    served = ModelBundle.from_directory(".").brain_model
+    candidate = brain_candidate(served, train, spec)
+    candidate.n_iter_ = np.array([iteration_cap(spec)])
+    assert not held_out_check(served, candidate, test, spec)[0]
+
+
+def test_legacy_brain_model_takes_raw_tokens(tmp_path):
+    # a bundle from before input_scalers: the tokens model expects standardized tokens
+    for name in BUNDLE_FILES.values():
+        shutil.copy(name, tmp_path / name)
+    with open(BUNDLE_FILES["metadata"]) as f:
+        meta = json.load(f)
+    del meta["input_scalers"]
+    with open(tmp_path / BUNDLE_FILES["metadata"], "w") as f:
+        json.dump(meta, f)
+
+    current = ModelBundle.from_directory(".").brain_model
+    legacy = pickle.loads(pickle.dumps(current))
+    scaler = LEGACY_INPUT_SCALERS["brain"]
+    legacy.intercept_ = legacy.intercept_ + legacy.coef_ @ np.array(scaler["mean"])
+    legacy.coef_ = legacy.coef_ * np.array(scaler["scale"])
+    with open(tmp_path / BUNDLE_FILES["brain_model"], "wb") as f:
+        pickle.dump(legacy, f)
+
+    loaded = ModelBundle.from_directory(str(tmp_path)).brain_model
+    spec, _, test = brain_split()
+    assert np.allclose(loaded.coef_, current.coef_)
+    assert np.isclose(evaluate(loaded, test, spec)["log_loss"], evaluate(current, test, spec)["log_loss"])
@@ -0,0 +1,43 @@
+import importlib
+import sys
+
+from pipeline import Stage
+
+HELPERS = "def scale(x):\n    return {factor} * x\n"
+STAGES = (
+    "from stage_helpers import scale\n\n"
+    "def clean(x):\n    return x.{method}()\n\n"
+    "def unrelated(x):\n    return {unrelated}\n\n"
+    "def stage(x):\n    return [scale(c) for c in clean(x)]\n"
+)
+
+
+def write_module(path, name, source):
+    (path / f"{name}.py").write_text(source)
+    sys.modules.pop(name, None)
+    importlib.invalidate_caches()
+    return importlib.import_module(name)
+
+
+def stage_version(path, method="strip", unrelated="x", factor=2):
+    helpers = write_module(path, "stage_helpers", HELPERS.format(factor=factor))
+    stages = write_module(path, "stage_funcs", STAGES.format(method=method, unrelated=unrelated))
+    return Stage("s", stages.stage, depends=[helpers.scale]).version
+
+
+def test_stage_version_follows_only_the_code_it_calls(tmp_path, monkeypatch):
+    monkeypatch.syspath_prepend(str(tmp_path))
+    base = stage_version(tmp_path)
+
+    # a helper from the same module, called inside a comprehension
+    assert stage_version(tmp_path, method="lower") != base
+    # a helper listed in depends
+    assert stage_version(tmp_path, factor=3) != base
+    # other code in the same module
+    assert stage_version(tmp_path, unrelated="x + 1") == base
+
+
+def test_explicit_version_wins(tmp_path, monkeypatch):
+    monkeypatch.syspath_prepend(str(tmp_path))
+    stage_version(tmp_path)
+    assert Stage("s", sys.modules["stage_funcs"].stage, version="1").version == "1"
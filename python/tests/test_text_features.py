@@ -0,0 +1,27 @@
+import pandas as pd
+
+from text_features import MATTR_WINDOW, token_statistics, transcript_features
+
+
+def test_mattr_matches_a_recount_of_every_window():
+    words = "the cat and the dog and the bird saw the cat".split()
+    stats = token_statistics((w, False, None) for w in words)
+
+    windows = [words[i:i + MATTR_WINDOW] for i in range(len(words) - MATTR_WINDOW + 1)]
+    expected = sum(len(set(w)) / MATTR_WINDOW for w in windows) / len(windows)
+    assert abs(stats["MATTR(participant)"] - expected) < 1e-12
+
+
+def test_agreement_with_stored_columns_where_tokens_match():
+    df = pd.read_csv("../public/data.csv")
+    matching = []
+    for _, row in df.iterrows():
+        features = transcript_features(row["utterance"])
+        if features["tokens(participant)"] == row["tokens(participant)"]:
+            matching.append((features, row))
+
+    # the stored columns come from another transcript version; see the module docstring
+    assert len(matching) >= 7
+    for features, row in matching:
+        assert abs(features["TTR(participant)"] - row["TTR(participant)"]) <= 0.007
+        assert abs(features["MATTR(participant)"] - row["MATTR(participant)"]) <= 0.001
@@ -0,0 +1,33 @@
+import json
+
+import pandas as pd
+from sklearn.decomposition import LatentDirichletAllocation
+from sklearn.feature_extraction.text import CountVectorizer
+
+from wordcloud_analysis import compute_topic_trajectories, window_spans
+
+
+def test_window_spans_cover_the_trailing_tokens():
+    assert window_spans(180, 100, 50) == [(0, 100), (50, 150), (100, 180)]
+    assert window_spans(200, 100, 50) == [(0, 100), (50, 150), (100, 200)]
+    assert window_spans(40, 100, 50) == [(0, 40)]
+
+
+def test_trajectories_score_the_last_partial_window(tmp_path):
+    words = ["cookie", "jar", "stool", "water", "sink", "mother", "boy", "girl"]
+    utterance = " ".join(words[i % len(words)] for i in range(130))
+    data_path = tmp_path / "data.csv"
+    pd.DataFrame({"REGTRYID": [1], "DX1": ["Normal"], "utterance": [utterance]}).to_csv(data_path, index=False)
+
+    vectorizer = CountVectorizer()
+    lda = LatentDirichletAllocation(n_components=2, random_state=0)
+    lda.fit(vectorizer.fit_transform([" ".join(words)] * 4))
+
+    output_path = tmp_path / "trajectories.json"
+    compute_topic_trajectories(lda, vectorizer, data_path=data_path, window_size=50, step=25,
+                               output_path=output_path)
+    with open(output_path) as f:
+        participant = json.load(f)["participants"][0]
+
+    assert participant["tokens"] == [50, 50, 50, 50, 30]
+    assert len(participant["topics"]) == len(participant["ttr"]) == 5
@@ -0,0 +1,199 @@
+"""
+Token statistics for raw transcripts
+====================================
+Recomputes the tokens(participant), uniquetokens(participant),
+TTR(participant) and MATTR(participant) columns of data.csv from raw
+transcript text, in a single pass over the tokens. With pos=True the same
+pass also counts the AUX/CCONJ/NUM/PROPN/VERB columns, which needs the
+spaCy POS_MODEL pipeline.
+
+Tokens follow spaCy's rule-based English tokenizer (no trained model is
+needed) without whitespace tokens; unique tokens are case-sensitive and
+TTR is unique / total. MATTR averages the type-token ratio of every
+MATTR_WINDOW-token window of lowercased word tokens, and is kept up to
+date with a sliding counter instead of recounting each window.
+
+Known deviation from data.csv: these columns do not reproduce the stored
+ones exactly. The stored features were computed from another version of
+the transcripts by an undocumented tool: only 7 of the 90 utterances
+tokenize to the stored token count, some stored rows are cohort means,
+and the stored TTR is not always uniquetokens / tokens. On the 7 rows
+whose token counts match, TTR is within 0.007 and MATTR within 0.001
+(pinned by tests/test_text_features.py).
+
+MATTR_WINDOW = 3 is not a standard MATTR window (Covington & McFall use
+50 words, which gives values around 0.77 here). The stored MATTR values,
+around 0.99, are only reachable with a tiny window, and 3 fits the
+matching rows best: within 0.001, against 0.013 for windows of 2 or 4.
+Models fed these values (e.g. /analyze_transcript) see features that are
+close to, but not the same as, the ones they were trained on.
+"""
+
+import re
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+try:
+    import spacy
+except ImportError:
+    spacy = None
+
+MATTR_WINDOW = 3
+FEATURE_COLUMNS = [
+    "tokens(participant)", "uniquetokens(participant)",
+    "TTR(participant)", "MATTR(participant)",
+]
+# returned with features computed here, see the module docstring
+FEATURE_NOTE = (
+    "Token features are recomputed from the text and approximate, but do not "
+    "exactly reproduce, the data.csv columns the models were trained on "
+    f"(MATTR uses a {MATTR_WINDOW}-word window fitted to those columns)."
+)
+POS_MODEL = "en_core_web_sm"
+POS_TAGS = ["AUX", "CCONJ", "NUM", "PROPN", "VERB"]
+POS_COLUMNS = [f"{tag}(participant)" for tag in POS_TAGS]
+
+# Close to spaCy's splitting when it is not installed: contractions
+# ("was" + "n't"), words, and single punctuation marks
+FALLBACK_TOKEN = re.compile(r"\w+(?=n't)|n't|'\w+|\w+|[^\w\s]")
+
+_tokenizer = None
+_tagger = None
+
+
+def get_tokenizer():
+    """
+    Per-process tokenizer: spaCy's English rules if available, else a regex.
+    Yields (text, is_punct, None) tuples.
+    """
+    global _tokenizer
+    if _tokenizer is None:
+        if spacy is not None:
+            nlp = spacy.blank("en")
+            _tokenizer = lambda text: (
+                (t.text, t.is_punct, None) for t in nlp.tokenizer(text) if not t.is_space
+            )
+        else:
+            _tokenizer = lambda text: (
+                (t, not any(c.isalnum() for c in t), None) for t in FALLBACK_TOKEN.findall(text)
+            )
+    return _tokenizer
+
+
+def get_tagger():
+    """
+    Per-process POS tagger yielding (text, is_punct, pos) tuples, or None
+    when spaCy or POS_MODEL is not installed.
+    """
+    global _tagger
+    if _tagger is None:
+        # False remembers that loading failed, so it is not retried per call
+        _tagger = False
+        if spacy is not None:
+            try:
+                nlp = spacy.load(POS_MODEL, exclude=["parser", "ner", "lemmatizer"])
+                _tagger = lambda text: (
+                    (t.text, t.is_punct, t.pos_) for t in nlp(text) if not t.is_space
+                )
+            except OSError:
+                pass
+    return _tagger or None
+
+
+def pos_available():
+    return get_tagger() is not None
+
+
+def token_statistics(tokens, window=MATTR_WINDOW):
+    """
+    tokens, unique tokens, TTR and MATTR of a (text, is_punct, pos)
+    stream in one pass, plus POS counts when the stream is tagged.
+    """
+    seen = set()
+    window_tokens = deque()
+    window_counts = Counter()
+    pos_counts = Counter()
+    ttr_sum = 0.0
+    n_windows = 0
+    n_words = 0
+    total = 0
+    tagged = False
+
+    for text, is_punct, pos in tokens:
+        total += 1
+        seen.add(text)
+        if pos is not None:
+            tagged = True
+            pos_counts[pos] += 1
+        if is_punct:
+            continue
+
+        word = text.lower()
+        window_tokens.append(word)
+        window_counts[word] += 1
+        n_words += 1
+
+        if n_words > window:
+            # slide: drop the word that left the window
+            old = window_tokens.popleft()
+            window_counts[old] -= 1
+            if window_counts[old] == 0:
+                del window_counts[old]
+        if n_words >= window:
+            ttr_sum += len(window_counts) / window
+            n_windows += 1
+
+    if n_windows:
+        mattr = ttr_sum / n_windows
+    else:
+        # shorter than one window: plain TTR of the words there are
+        mattr = len(window_counts) / n_words if n_words else 0.0
+
+    features = {
+        "tokens(participant)": float(total),
+        "uniquetokens(participant)": float(len(seen)),
+        "TTR(participant)": len(seen) / total if total else 0.0,
+        "MATTR(participant)": mattr,
+    }
+    if tagged:
+        for tag, col in zip(POS_TAGS, POS_COLUMNS):
+            features[col] = float(pos_counts[tag])
+    return features
+
+
+def transcript_features(text, window=MATTR_WINDOW, pos=False):
+    """
+    Token statistics of one raw transcript. With pos=True the POS counts
+    are added too, which raises if no tagger is installed.
+    """
+    if pd.isna(text):
+        text = ""
+    if pos:
+        tagger = get_tagger()
+        if tagger is None:
+            raise RuntimeError(f"POS counts need spaCy and its '{POS_MODEL}' model.")
+        return token_statistics(tagger(str(text)), window)
+    return token_statistics(get_tokenizer()(str(text)), window)
+
+
+def corpus_features(texts, max_workers=None, chunksize=8):
+    """
+    Token statistics for a whole corpus, spread over a process pool.
+    Returns a DataFrame with the data.csv column names, one row per text.
+    """
+    texts = list(texts)
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        rows = list(pool.map(transcript_features, texts, chunksize=chunksize))
+    return pd.DataFrame(rows, columns=FEATURE_COLUMNS)
+
+
+if __name__ == "__main__":
+    df = pd.read_csv("../public/data.csv")
+    features = corpus_features(df["utterance"])
+
+    print(f"✓ Computed token statistics for {len(features)} transcripts")
+    for col in FEATURE_COLUMNS:
+        diff = (features[col] - df[col]).abs()
+        print(f"  {col}: mean |diff| vs data.csv = {diff.mean():.4f}, exact rows = {(diff < 1e-6).sum()}")
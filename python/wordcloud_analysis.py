@@ -9,12 +9,14 @@ This script performs:
 5. Word association analysis
 """
 
+import argparse
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 from wordcloud import WordCloud, STOPWORDS
 from collections import Counter
+import json
 import re
 import warnings
 warnings.filterwarnings('ignore')
@@ -45,6 +47,10 @@ except ImportError:
 from sklearn.feature_extraction.text import TfidfVectorizer, CountVectorizer
 from sklearn.decomposition import LatentDirichletAllocation
 
+from pipeline import Pipeline, PipelineError
+from profiling import PROFILE_DIR
+from radial_wordcloud_data import group_term_counts
+
 
 # ============================================================================
 # STOPWORDS CONFIGURATION
@@ -540,6 +546,95 @@ def create_comparison_chart(freq_results):
     plt.close()
 
 
+def log_odds_dirichlet(counts_a, counts_b, prior):
+    """
+    Log-odds ratio with an informative Dirichlet prior (Monroe et al., 2008)
+    for every vocabulary term at once.
+    
+    counts_a, counts_b and prior are aligned count vectors over the
+    vocabulary. Returns the log-odds ratio of group a vs group b and its
+    z-score; positive values mean the term is more typical of group a.
+    """
+    counts_a = np.asarray(counts_a, dtype=float)
+    counts_b = np.asarray(counts_b, dtype=float)
+    prior = np.asarray(prior, dtype=float)
+    
+    n_a, n_b, a0 = counts_a.sum(), counts_b.sum(), prior.sum()
+    
+    log_odds_a = np.log(counts_a + prior) - np.log(n_a + a0 - counts_a - prior)
+    log_odds_b = np.log(counts_b + prior) - np.log(n_b + a0 - counts_b - prior)
+    delta = log_odds_a - log_odds_b
+    
+    variance = 1.0 / (counts_a + prior) + 1.0 / (counts_b + prior)
+    
+    return delta, delta / np.sqrt(variance)
+
+
+def differential_vocabulary_analysis(corpus_df, prior_size=1000):
+    """
+    Rank the full vocabulary by how strongly each word distinguishes the
+    diagnosis groups: Normal vs Impaired, and each DX1 group vs the rest
+    """
+    print("\n" + "=" * 70)
+    print("STEP 6b: Differential Vocabulary Analysis (Log-Odds, Dirichlet Prior)")
+    print("=" * 70)
+    
+    texts = corpus_df['processed_text'].tolist()
+    vectorizer = CountVectorizer(token_pattern=r"(?u)\b\w+\b")
+    
+    # Binary split
+    vocabulary, counts = group_term_counts(
+        texts, corpus_df['diagnosis'], ['Normal', 'Impaired'], vectorizer
+    )
+    pooled = counts.sum(axis=0)
+    # prior: pooled word shares scaled to prior_size pseudo-counts
+    prior = prior_size * pooled / pooled.sum()
+    
+    delta, z = log_odds_dirichlet(counts[1], counts[0], prior)
+    binary_df = pd.DataFrame({
+        'word': vocabulary,
+        'count_impaired': counts[1].astype(int),
+        'count_normal': counts[0].astype(int),
+        'log_odds_ratio': delta,
+        'z_score': z
+    }).sort_values('z_score', ascending=False)
+    
+    print(f"\n--- Impaired vs Normal ({len(vocabulary)} word types) ---")
+    print("  Most typical of Impaired:")
+    print(binary_df.head(10)[['word', 'z_score']].to_string(index=False))
+    print("  Most typical of Normal:")
+    print(binary_df.tail(10)[::-1][['word', 'z_score']].to_string(index=False))
+    
+    binary_df.to_csv('differential_vocabulary_binary.csv', index=False)
+    print("\n✓ Saved: differential_vocabulary_binary.csv")
+    
+    # Three-class split: each DX1 group against all other participants
+    groups = sorted(corpus_df['DX1'].dropna().unique())
+    vocabulary, counts = group_term_counts(texts, corpus_df['DX1'], groups, vectorizer)
+    pooled = counts.sum(axis=0)
+    prior = prior_size * pooled / pooled.sum()
+    
+    frames = []
+    for g, group in enumerate(groups):
+        delta, z = log_odds_dirichlet(counts[g], pooled - counts[g], prior)
+        frames.append(pd.DataFrame({
+            'group': group,
+            'word': vocabulary,
+            'count_group': counts[g].astype(int),
+            'count_rest': (pooled - counts[g]).astype(int),
+            'log_odds_ratio': delta,
+            'z_score': z
+        }).sort_values('z_score', ascending=False))
+        print(f"\n--- {group} vs rest: top words ---")
+        print(f"  {', '.join(frames[-1]['word'].head(10))}")
+    
+    multiclass_df = pd.concat(frames, ignore_index=True)
+    multiclass_df.to_csv('differential_vocabulary_multiclass.csv', index=False)
+    print("\n✓ Saved: differential_vocabulary_multiclass.csv")
+    
+    return binary_df, multiclass_df
+
+
 # ============================================================================
 # 6. TOPIC MODELING (LDA)
 # ============================================================================
@@ -590,40 +685,159 @@ def perform_topic_modeling(corpus_df, n_topics=5):
     return lda, vectorizer
 
 
-# ============================================================================
-# 7. MAIN EXECUTION
-# ============================================================================
+FILLER_WORDS = {'uh', 'um', 'uhm', 'er', 'ah', 'hmm'}
 
-def main():
+
+def window_spans(n_tokens, window_size=100, step=50):
     """
-    Main execution function
+    (start, stop) token spans of the sliding windows over one transcript.
+    When the full windows stop short of the end, a final shorter window
+    covers the remaining tokens, so the last utterances count too
+    """
+    spans = [(start, min(start + window_size, n_tokens))
+             for start in range(0, max(n_tokens - window_size, 0) + 1, step)]
+    if spans[-1][1] < n_tokens:
+        spans.append((spans[-1][0] + step, n_tokens))
+    return spans
+
+
+def compute_topic_trajectories(lda, vectorizer, data_path='../public/data.csv',
+                               window_size=100, step=50,
+                               output_path='topic_trajectories.json'):
+    """
+    Split each participant's utterance into fixed-size token windows and
+    score every window's topic mixture and lexical measures, giving one
+    trajectory per participant for TopicEvolutionStream. The last window
+    can be shorter (see window_spans); each window's token count is saved
+    so that it can be weighted by its length
     """
     print("\n" + "=" * 70)
-    print("WORD CLOUD ANALYSIS - ALZHEIMER'S DISEASE SPEECH")
+    print("STEP 8: Topic Trajectories (Sliding Windows)")
     print("=" * 70)
     
-    # Step 1: Load data
-    utterance, liwc, linguistic = load_speech_data()
-    if utterance is None:
-        return
-    
-    # Step 2: Prepare corpus
-    corpus_df = prepare_corpus(utterance)
+    data = pd.read_csv(data_path).dropna(subset=['utterance'])
+    
+    window_texts = []
+    lexical = []
+    owners = []
+    for row_idx, utterance in enumerate(data['utterance']):
+        tokens = re.sub(r'[^a-zA-Z\s]', '', str(utterance).lower()).split()
+        for start, stop in window_spans(len(tokens), window_size, step):
+            window = tokens[start:stop]
+            window_texts.append(preprocess_text(' '.join(window)))
+            lexical.append((
+                len(set(window)) / max(len(window), 1),
+                sum(t in FILLER_WORDS for t in window) / max(len(window), 1),
+                len(window)
+            ))
+            owners.append(row_idx)
+    
+    # One batched transform for every window of every participant
+    mixtures = lda.transform(vectorizer.transform(window_texts))
+    lexical = np.array(lexical)
+    owners = np.array(owners)
     
-    # Step 3: Frequency analysis
-    freq_results = analyze_word_frequencies(corpus_df)
-    
-    # Step 4: TF-IDF analysis
-    tfidf_results = compute_tfidf(corpus_df)
+    feature_names = vectorizer.get_feature_names_out()
+    topics = [
+        ', '.join(feature_names[i] for i in topic.argsort()[-3:][::-1])
+        for topic in lda.components_
+    ]
+    
+    participants = []
+    for row_idx, (_, row) in enumerate(data.iterrows()):
+        mine = owners == row_idx
+        participants.append({
+            'REGTRYID': int(row['REGTRYID']),
+            'DX1': row['DX1'],
+            'topics': np.round(mixtures[mine], 4).tolist(),
+            'ttr': np.round(lexical[mine, 0], 4).tolist(),
+            'filler_rate': np.round(lexical[mine, 1], 4).tolist(),
+            'tokens': lexical[mine, 2].astype(int).tolist()
+        })
     
-    # Step 5: Generate word clouds
-    generate_wordclouds(freq_results, tfidf_results)
+    trajectories = {
+        'window_size': window_size,
+        'step': step,
+        'topics': topics,
+        'participants': participants
+    }
+    with open(output_path, 'w') as f:
+        json.dump(trajectories, f, separators=(',', ':'))
     
-    # Step 6: Comparative analysis
-    comparative_word_analysis(freq_results, tfidf_results)
+    print(f"✓ Scored {len(window_texts)} windows for {len(participants)} participants")
+    print(f"✓ Saved: {output_path}")
     
-    # Step 7: Topic modeling
-    lda_model, vectorizer = perform_topic_modeling(corpus_df, n_topics=5)
+    return trajectories
+
+
+# ============================================================================
+# 7. PIPELINE
+# ============================================================================
+
+SPEECH_FILES = [
+    '../utterance_data.xlsx',
+    '../LIWC-22 Results - participant - LIWC Analysis(1).xlsx',
+    '../linguistic_outcomes.xlsx',
+]
+TIMING_REPORT = 'wordcloud_analysis_timings.json'
+
+
+def load_utterances():
+    utterance, liwc, linguistic = load_speech_data()
+    return utterance
+
+
+def build_pipeline(n_topics=5, max_workers=None, profile_dir=None):
+    """
+    The analysis as a DAG of cached stages (see pipeline.py). Changing
+    n_topics only reruns topic modeling and the trajectories built on it.
+    """
+    pipeline = Pipeline('wordcloud_analysis', max_workers=max_workers, profile_dir=profile_dir)
+    pipeline.add('load', load_utterances, outputs=['utterance'], files=SPEECH_FILES)
+    pipeline.add('corpus', prepare_corpus, inputs=['utterance'], outputs=['corpus_df'])
+    pipeline.add('frequencies', analyze_word_frequencies, inputs=['corpus_df'],
+                 outputs=['freq_results'])
+    pipeline.add('tfidf', compute_tfidf, inputs=['corpus_df'], outputs=['tfidf_results'],
+                 products=['tfidf_scores_normal.csv', 'tfidf_scores_impaired.csv'])
+    pipeline.add('wordclouds', generate_wordclouds, inputs=['freq_results', 'tfidf_results'],
+                 products=['wordcloud_analysis.png', 'wordcloud_normal.png',
+                           'wordcloud_impaired.png'])
+    pipeline.add('comparative', comparative_word_analysis,
+                 inputs=['freq_results', 'tfidf_results'],
+                 products=['word_comparison.csv', 'word_frequency_comparison.png'])
+    pipeline.add('differential', differential_vocabulary_analysis, inputs=['corpus_df'],
+                 outputs=['differential_binary', 'differential_multiclass'],
+                 products=['differential_vocabulary_binary.csv',
+                           'differential_vocabulary_multiclass.csv'],
+                 depends=[group_term_counts])
+    pipeline.add('topics', perform_topic_modeling, inputs=['corpus_df'],
+                 outputs=['lda_model', 'topic_vectorizer'],
+                 params={'n_topics': n_topics}, products=['discovered_topics.csv'])
+    pipeline.add('trajectories', compute_topic_trajectories,
+                 inputs=['lda_model', 'topic_vectorizer'], outputs=['trajectories'],
+                 files=['../public/data.csv'], products=['topic_trajectories.json'])
+    return pipeline
+
+
+# ============================================================================
+# 8. MAIN EXECUTION
+# ============================================================================
+
+def main(n_topics=5, profile=False):
+    """
+    Main execution function
+    """
+    print("\n" + "=" * 70)
+    print("WORD CLOUD ANALYSIS - ALZHEIMER'S DISEASE SPEECH")
+    print("=" * 70)
+
+    pipeline = build_pipeline(n_topics=n_topics, profile_dir=PROFILE_DIR if profile else None)
+    try:
+        pipeline.run()
+    except PipelineError as e:
+        print(f"Error: {e}")
+        return
+    pipeline.timer.write_report(TIMING_REPORT)
     
     print("\n" + "=" * 70)
     print("ANALYSIS COMPLETE!")
@@ -636,9 +850,18 @@ def main():
     print("  5. tfidf_scores_normal.csv - TF-IDF scores for Normal group")
     print("  6. tfidf_scores_impaired.csv - TF-IDF scores for Impaired group")
     print("  7. word_comparison.csv - Unique and shared word analysis")
-    print("  8. discovered_topics.csv - LDA topic modeling results")
+    print("  8. differential_vocabulary_binary.csv - Log-odds ranking, Impaired vs Normal")
+    print("  9. differential_vocabulary_multiclass.csv - Log-odds ranking, each group vs rest")
+    print(" 10. discovered_topics.csv - LDA topic modeling results")
+    print(" 11. topic_trajectories.json - Per-participant topic and lexical trajectories")
+    print(f" 12. {TIMING_REPORT} - Per-stage wall and CPU time")
     print("\n" + "=" * 70)
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--n-topics", type=int, default=5)
+    parser.add_argument("--profile", action="store_true",
+                        help=f"stack-sample every stage into {PROFILE_DIR}/")
+    args = parser.parse_args()
+    main(n_topics=args.n_topics, profile=args.profile)
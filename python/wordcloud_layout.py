@@ -0,0 +1,130 @@
+"""
+Server-side word cloud layouts
+==============================
+Computes word positions, font sizes and rotations with the same WordCloud
+library wordcloud_analysis.py uses, but returns them as JSON coordinates
+instead of rasterizing to PNG, so the browser only has to draw them.
+
+Layouts are cached on disk by (group, top_k, canvas size) together with
+the data version, and are deterministic for a given key.
+"""
+
+import hashlib
+import json
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from PIL import ImageFont
+from sklearn.feature_extraction.text import CountVectorizer
+from wordcloud import WordCloud
+
+from radial_wordcloud_data import DATA_PATH, STOP_WORDS, group_term_counts, normalize_text
+
+LAYOUT_CACHE_DIR = "layout_cache"
+# Bump when the layout parameters below change, to invalidate old cache files
+LAYOUT_VERSION = 1
+
+DX_GROUPS = ["Normal", "Prob AD", "MCI"]
+LAYOUT_GROUPS = ["All", "Normal", "Impaired", "Prob AD", "MCI"]
+
+
+def data_version(data_path=DATA_PATH):
+    return "%x-%x" % (int(os.path.getmtime(data_path)), os.path.getsize(data_path))
+
+
+@lru_cache(maxsize=4)
+def group_frequencies(data_path=DATA_PATH, version=None):
+    """
+    Word counts for every layout group, {group: {word: count}}.
+    version only keys the cache, so a changed data file is re-read.
+    """
+    df = pd.read_csv(data_path).dropna(subset=['utterance', 'DX1'])
+    vectorizer = CountVectorizer(
+        preprocessor=normalize_text,
+        token_pattern=r"(?u)\b[a-z]{2,}\b",
+        stop_words=STOP_WORDS,
+    )
+    vocabulary, counts = group_term_counts(df['utterance'], df['DX1'], DX_GROUPS, vectorizer)
+
+    by_group = dict(zip(DX_GROUPS, counts))
+    by_group["Impaired"] = by_group["Prob AD"] + by_group["MCI"]
+    by_group["All"] = counts.sum(axis=0)
+
+    return {
+        group: {str(vocabulary[i]): float(c[i]) for i in np.flatnonzero(c)}
+        for group, c in by_group.items()
+    }
+
+
+def compute_layout(frequencies, top_k, width, height, random_state=42):
+    """
+    Lay out the top_k most frequent words on a width x height canvas.
+    Each word gets its top-left corner, box size, font size and rotation.
+    """
+    wordcloud = WordCloud(
+        width=width, height=height,
+        max_words=top_k,
+        relative_scaling=0.5,
+        min_font_size=10,
+        random_state=random_state,
+    ).generate_from_frequencies(frequencies)
+
+    layout = []
+    for (word, weight), font_size, (y, x), orientation, color in wordcloud.layout_:
+        font = ImageFont.truetype(wordcloud.font_path, font_size)
+        left, top, right, bottom = font.getbbox(word)
+        w, h = right - left, bottom - top
+        rotated = orientation is not None
+        layout.append({
+            "word": word,
+            "weight": float(weight),
+            "x": int(x),
+            "y": int(y),
+            "width": int(h if rotated else w),
+            "height": int(w if rotated else h),
+            "font_size": int(font_size),
+            "rotate": 90 if rotated else 0,
+            "color": color,
+        })
+    return layout
+
+
+def layout_path(group, top_k, width, height, version, cache_dir=LAYOUT_CACHE_DIR):
+    key = json.dumps([LAYOUT_VERSION, version, group, top_k, width, height])
+    return os.path.join(cache_dir, hashlib.sha256(key.encode("utf-8")).hexdigest()[:16] + ".json")
+
+
+def cached_layout(group, top_k, width, height, data_path=DATA_PATH, cache_dir=LAYOUT_CACHE_DIR):
+    """
+    The layout from the disk cache, or None if it has not been computed.
+    """
+    path = layout_path(group, top_k, width, height, data_version(data_path), cache_dir)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def get_layout(group, top_k, width, height, data_path=DATA_PATH, cache_dir=LAYOUT_CACHE_DIR):
+    """
+    Cached layout for one (group, top_k, canvas size) combination.
+    """
+    cached = cached_layout(group, top_k, width, height, data_path, cache_dir)
+    if cached is not None:
+        return cached
+
+    version = data_version(data_path)
+    path = layout_path(group, top_k, width, height, version, cache_dir)
+    words = compute_layout(group_frequencies(data_path, version)[group], top_k, width, height)
+    result = {"group": group, "top_k": top_k, "width": width, "height": height, "words": words}
+
+    # write to a temporary file first so concurrent readers never see half a layout
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(result, f)
+    os.replace(tmp_path, path)
+
+    return result